@@ -8,13 +8,10 @@ from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, Ou
 from rest_framework.permissions import IsAuthenticated
 from .models import CustomUser
 from django.conf import settings
-import os
 import base64
-import numpy as np
-import cv2
-import face_recognition
-import face_recognition_models
+# Le moteur facial importe cv2 / face_recognition à la demande : ce module reste léger
 from .face_validation import compare_faces
+from electeur_auth.face_pool import executer
 from django.core.files.uploadedfile import InMemoryUploadedFile
 from .temp_tokens import generate_temp_token
 from .temp_tokens import validate_temp_token, delete_temp_token
@@ -99,24 +96,16 @@ class FacialAuthView(APIView):
             print("❌ Aucun visage de référence enregistré")
             return Response({"detail": "Aucune photo enregistrée"}, status=404)
 
-        # 🔄 Traitement de l’image capturée
+        # 🔄 Traitement de l’image capturée (décodée en mémoire, aucun fichier temporaire)
         try:
             img_data = base64.b64decode(image_base64.split(',')[1])
-            os.makedirs("temp", exist_ok=True)
-            temp_filename = os.path.join("temp", f"{admin.id}_temp.jpg")
-
-            with open(temp_filename, "wb") as f:
-                f.write(img_data)
-            print(f"📸 Image temporaire enregistrée à : {temp_filename}")
+            print(f"📸 Image capturée décodée ({len(img_data)} octets)")
         except Exception as e:
             print(f"❌ Erreur lors du traitement de l'image capturée : {e}")
             return Response({"detail": "Erreur dans le traitement de l'image"}, status=400)
 
         print("🔍 Début de la comparaison faciale...")
-        match, distance = compare_faces(admin.photo_admin.path, temp_filename, threshold=0.6)
-
-        os.remove(temp_filename)
-        print("🧹 Image temporaire supprimée.")
+        match, distance = executer(compare_faces, admin.photo_admin.path, img_data, 0.6)
 
         if match:
             print(f"✅ Visage reconnu. Distance : {distance:.4f}")
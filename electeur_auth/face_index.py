@@ -0,0 +1,137 @@
+import fcntl
+import glob
+import os
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+
+# Index d'identification 1:N : un fichier .npy par fokontany, ouvert en mmap (pages partagées
+# entre workers via le cache du système). Une ligne = 128 float32 d'encodage, |e|², puis
+# l'id de l'électeur (int64 stocké sur deux colonnes float32).
+# Réécriture atomique (fichier temporaire + os.replace) ; les lecteurs rechargent au changement de fichier.
+COLONNES = 131
+
+_shards = {}
+_verrou = threading.Lock()
+
+
+def _dossier():
+    return getattr(settings, "FACE_INDEX_DIR", "face_index")
+
+
+def _chemin(fokontany_id):
+    return os.path.join(_dossier(), f"fokontany_{fokontany_id}.npy")
+
+
+def _lignes(ids, encodages):
+    encodages = np.asarray(encodages, dtype=np.float32).reshape(-1, 128)
+    lignes = np.empty((len(encodages), COLONNES), dtype=np.float32)
+    lignes[:, :128] = encodages
+    lignes[:, 128] = np.einsum("ij,ij->i", encodages, encodages)
+    lignes[:, 129:] = np.asarray(ids, dtype=np.int64).reshape(-1, 1).view(np.float32)
+    return lignes
+
+
+def _ids(lignes):
+    return np.ascontiguousarray(lignes[:, 129:]).view(np.int64).ravel()
+
+
+@contextmanager
+def _verrou_fichier(fokontany_id):
+    # Sérialise les écrivains d'un même fokontany, y compris entre processus
+    os.makedirs(_dossier(), exist_ok=True)
+    with open(f"{_chemin(fokontany_id)}.lock", "w") as verrou:
+        fcntl.flock(verrou, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(verrou, fcntl.LOCK_UN)
+
+
+def _ecrire(fokontany_id, lignes):
+    chemin = _chemin(fokontany_id)
+    if not len(lignes):
+        if os.path.exists(chemin):
+            os.remove(chemin)
+        return
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "wb") as f:
+        np.save(f, np.ascontiguousarray(lignes, dtype=np.float32))
+    os.replace(temporaire, chemin)
+
+
+def _shard(fokontany_id):
+    chemin = _chemin(fokontany_id)
+    try:
+        etat = os.stat(chemin)
+    except FileNotFoundError:
+        return None
+    version = (etat.st_ino, etat.st_mtime_ns)
+    courant = _shards.get(fokontany_id)
+    if courant is None or courant[0] != version:
+        with _verrou:
+            courant = (version, np.load(chemin, mmap_mode="r"))
+            _shards[fokontany_id] = courant
+    return courant[1]
+
+
+def charger():
+    """Ouvre tous les shards présents (à appeler au démarrage d'un worker d'identification)."""
+    for chemin in glob.glob(os.path.join(_dossier(), "fokontany_*.npy")):
+        _shard(int(os.path.basename(chemin)[len("fokontany_"):-len(".npy")]))
+    return len(_shards)
+
+
+def mettre_a_jour(electeur_id, fokontany_id, donnees):
+    """Remplace (ou retire si donnees est None) l'encodage d'un électeur dans le shard de son fokontany."""
+    with _verrou_fichier(fokontany_id):
+        actuel = _shard(fokontany_id)
+        lignes = np.empty((0, COLONNES), dtype=np.float32) if actuel is None else actuel[_ids(actuel) != electeur_id]
+        if donnees is not None:
+            lignes = np.concatenate([lignes, _lignes([electeur_id], np.frombuffer(bytes(donnees), dtype=np.float32))])
+        _ecrire(fokontany_id, lignes)
+
+
+def reconstruire(fokontany_ids=None):
+    """Reconstruit les shards depuis les encodages stockés (tous, ou seulement les fokontany donnés)."""
+    from electeurs.models import Electeur
+
+    electeurs = Electeur.objects.exclude(face_encoding=None)
+    if fokontany_ids is None:
+        a_traiter = set(Electeur.objects.values_list("fokontany_id", flat=True).distinct())
+        for chemin in glob.glob(os.path.join(_dossier(), "fokontany_*.npy")):
+            a_traiter.add(int(os.path.basename(chemin)[len("fokontany_"):-len(".npy")]))
+    else:
+        a_traiter = set(fokontany_ids)
+        electeurs = electeurs.filter(fokontany_id__in=a_traiter)
+
+    par_fokontany = {fid: ([], []) for fid in a_traiter}
+    for pk, fokontany_id, donnees in electeurs.values_list("pk", "fokontany_id", "face_encoding").iterator(chunk_size=5000):
+        ids, encodages = par_fokontany.setdefault(fokontany_id, ([], []))
+        ids.append(pk)
+        encodages.append(np.frombuffer(bytes(donnees), dtype=np.float32))
+
+    for fokontany_id, (ids, encodages) in par_fokontany.items():
+        with _verrou_fichier(fokontany_id):
+            _ecrire(fokontany_id, _lignes(ids, encodages) if ids else np.empty((0, COLONNES), dtype=np.float32))
+    return len(par_fokontany)
+
+
+def rechercher(encodage, fokontany_ids, k=5):
+    """Top-k [(electeur_id, fokontany_id, distance)] dans les shards des fokontany donnés (recherche exacte)."""
+    q = np.asarray(encodage, dtype=np.float32)
+    qq = float(q @ q)
+    candidats = []
+    for fokontany_id in fokontany_ids:
+        shard = _shard(fokontany_id)
+        if shard is None or not len(shard):
+            continue
+        # |e - q|² = |e|² - 2 e·q + |q|² : un seul produit matrice-vecteur par shard
+        d2 = shard[:, 128] - 2 * (shard[:, :128] @ q) + qq
+        m = min(k, len(d2))
+        meilleurs = np.argpartition(d2, m - 1)[:m]
+        for electeur_id, distance in zip(_ids(shard[meilleurs]), np.sqrt(np.maximum(d2[meilleurs], 0))):
+            candidats.append((int(electeur_id), fokontany_id, float(distance)))
+    return sorted(candidats, key=lambda c: c[2])[:k]
@@ -0,0 +1,156 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .face_validation import ImageInutilisable, mesurer, prechauffer
+
+# Pool de processus pour le travail dlib (détection / encodage), propre à chaque worker web.
+# Le thread de la requête attend le résultat sans occuper le CPU ; un sémaphore borne
+# workers + file d'attente, et tout dépassement est refusé immédiatement (503 + Retry-After).
+
+
+class MoteurVisageSature(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Reconnaissance faciale saturée, veuillez réessayer dans quelques secondes."
+    default_code = "face_engine_busy"
+
+    def __init__(self, detail=None, code=None):
+        super().__init__(detail, code)
+        # Lu par le gestionnaire d'exceptions DRF pour l'en-tête Retry-After
+        self.wait = getattr(settings, "FACE_POOL_RETRY_AFTER", 2)
+
+
+class DelaiVisageDepasse(MoteurVisageSature):
+    default_detail = "La reconnaissance faciale a pris trop de temps, veuillez réessayer."
+    default_code = "face_engine_timeout"
+
+
+class CaptureRefusee(APIException):
+    """Capture rejetée par le contrôle qualité du moteur : 400 avec un code, pour que le client reprenne la photo."""
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Image inutilisable, veuillez reprendre la photo."
+    default_code = "capture_refusee"
+
+    def __init__(self, erreur):
+        super().__init__({"detail": erreur.message, "code": erreur.code}, erreur.code)
+
+
+_verrou = threading.Lock()
+_pool = None
+_places = None
+
+
+def _nb_workers():
+    return getattr(settings, "FACE_POOL_WORKERS", 1)
+
+
+def _obtenir_pool():
+    global _pool, _places
+    with _verrou:
+        if _pool is None:
+            # spawn : pas de fork d'un processus web multi-thread ; les enfants n'importent que le moteur
+            # Chaque processus charge et exerce les modèles dlib dès son démarrage
+            _pool = ProcessPoolExecutor(max_workers=_nb_workers(), mp_context=multiprocessing.get_context("spawn"),
+                                        initializer=prechauffer)
+            _places = threading.BoundedSemaphore(_nb_workers() + getattr(settings, "FACE_POOL_QUEUE", 8))
+        return _pool, _places
+
+
+def _reinitialiser(pool_casse):
+    global _pool
+    with _verrou:
+        if _pool is pool_casse:
+            _pool = None
+    pool_casse.shutdown(wait=False, cancel_futures=True)
+    print("[FACE POOL] ⚠️ Pool cassé (worker tué ?), recréé à la prochaine demande")
+
+
+def demarrer():
+    """Démarre et préchauffe tous les processus du pool, avant que le worker web n'accepte du trafic.
+
+    Appelé depuis wsgi.py / asgi.py quand FACE_PRECHAUFFAGE est activé. Ouvre aussi les shards
+    de l'index d'identification.
+    """
+    from . import face_index
+
+    debut = time.perf_counter()
+    if _nb_workers() <= 0:
+        prechauffer()
+    else:
+        pool, _ = _obtenir_pool()
+        # Soumises d'un coup, aucune tâche ne trouve de processus libre : un processus est lancé par tâche.
+        # Un processus encore en préchauffage laisse sa tâche à un autre : on recommence jusqu'à
+        # avoir vu répondre chacun d'eux (ou jusqu'au délai).
+        pids = set()
+        limite = time.monotonic() + getattr(settings, "FACE_POOL_TIMEOUT", 10) * 3
+        while len(pids) < _nb_workers() and time.monotonic() < limite:
+            taches = [pool.submit(time.sleep, 0.05) for _ in range(_nb_workers())]
+            pids.update(f.result() for f in [pool.submit(os.getpid) for _ in range(_nb_workers())])
+            for tache in taches:
+                tache.result()
+        print(f"[FACE POOL] {len(pids)}/{_nb_workers()} processus prêt(s)")
+    nb_shards = face_index.charger()
+    print(f"[FACE POOL] 🔥 Démarrage terminé en {(time.perf_counter() - debut) * 1000:.0f} ms "
+          f"({nb_shards} shard(s) d'index ouverts)")
+
+
+def _publier(fonction, temps):
+    """Transmet les durées par étape (ms) au hook FACE_METRICS_HOOK(operation, temps), s'il est configuré."""
+    chemin = getattr(settings, "FACE_METRICS_HOOK", "")
+    if not chemin:
+        return
+    try:
+        import_string(chemin)(fonction.__name__, temps)
+    except Exception as e:
+        print(f"[FACE POOL] ⚠️ Hook de métriques en échec : {e}")
+
+
+def executer(fonction, *args):
+    """Exécute fonction(*args) dans le pool (fonction et arguments doivent être picklables)."""
+    if _nb_workers() <= 0:
+        try:
+            resultat, temps = mesurer(fonction, *args)
+        except ImageInutilisable as e:
+            raise CaptureRefusee(e)
+        _publier(fonction, temps)
+        return resultat
+
+    pool, places = _obtenir_pool()
+    if not places.acquire(blocking=False):
+        print("[FACE POOL] ⛔ Saturé, demande refusée")
+        raise MoteurVisageSature()
+    debut = time.perf_counter()
+    try:
+        future = pool.submit(mesurer, fonction, *args)
+    except (BrokenProcessPool, RuntimeError):
+        places.release()
+        _reinitialiser(pool)
+        raise MoteurVisageSature()
+    # La place n'est rendue qu'à la fin réelle du calcul, même si la requête a abandonné
+    future.add_done_callback(lambda _: places.release())
+
+    try:
+        resultat, temps = future.result(timeout=getattr(settings, "FACE_POOL_TIMEOUT", 10))
+    except FuturesTimeout:
+        future.cancel()
+        print(f"[FACE POOL] ⏱️ {fonction.__name__} a dépassé le délai")
+        raise DelaiVisageDepasse()
+    except BrokenProcessPool:
+        _reinitialiser(pool)
+        raise MoteurVisageSature()
+    except ImageInutilisable as e:
+        print(f"[FACE POOL] 📷 Capture refusée ({e.code})")
+        raise CaptureRefusee(e)
+    # Mesuré dans l'enfant, publié ici : le hook (statsd, Prometheus…) vit dans le processus web.
+    # "total" inclut l'attente dans la file et les allers-retours de pickling.
+    temps["total"] = (time.perf_counter() - debut) * 1000
+    _publier(fonction, temps)
+    return resultat
@@ -1,9 +1,92 @@
-import cv2
-import face_recognition
+import os
+import threading
+import time
+from contextlib import contextmanager
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+
+# Moteur de reconnaissance faciale partagé (électeurs et administrateurs).
+# Sans dépendance à l'app registry : il tourne aussi dans les processus du pool.
+# cv2 et face_recognition (qui charge les modèles dlib) ne sont importés qu'au premier usage :
+# les workers qui ne servent jamais de visage ne paient ni l'import ni les ~100 Mo de modèles.
+
+_mesures = threading.local()
+
+
+def _reglage(nom, defaut):
+    # Les processus du pool n'ont pas forcément de settings Django configurés
+    try:
+        from django.conf import settings
+        return getattr(settings, nom, defaut)
+    except Exception:
+        return defaut
+
+
+def mode_debug():
+    """FACE_DEBUG : dessins de landmarks, similarité cosinus et traces détaillées (inutile en production)."""
+    return bool(_reglage("FACE_DEBUG", False))
+
+
+class ImageInutilisable(ValueError):
+    """Capture rejetée par le contrôle qualité ; code est renvoyé au client pour qu'il reprenne la photo."""
+
+    def __init__(self, code, message):
+        super().__init__(code, message)
+        self.code = code
+        self.message = message
+
+    def __str__(self):
+        return self.message
+
+
+@contextmanager
+def etape(nom):
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        temps = getattr(_mesures, "temps", None)
+        if temps is not None:
+            temps[nom] = temps.get(nom, 0.0) + (time.perf_counter() - debut) * 1000
+
+
+def mesurer(fonction, *args):
+    """Exécute fonction(*args) et relève la durée (ms) de chaque étape : (résultat, {étape: ms})."""
+    _mesures.temps = {}
+    try:
+        resultat = fonction(*args)
+        return resultat, _mesures.temps
+    finally:
+        _mesures.temps = None
+
+
+def charger_image(source):
+    """Image BGR depuis un chemin, des octets, un fichier (upload Django, BytesIO…) ou un ndarray.
+
+    Les octets sont décodés en mémoire par cv2.imdecode : aucun fichier temporaire.
+    """
+    import cv2
+    if isinstance(source, np.ndarray) and source.ndim > 1:
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        return cv2.imread(os.fspath(source))
+    if hasattr(source, "read"):
+        if hasattr(source, "seek"):
+            source.seek(0)
+        source = source.read()
+    if isinstance(source, (bytes, bytearray, memoryview, np.ndarray)):
+        return cv2.imdecode(np.frombuffer(source, dtype=np.uint8), cv2.IMREAD_COLOR)
+    return None
+
+
+def decrire_source(source):
+    if isinstance(source, (str, os.PathLike)):
+        return os.fspath(source)
+    return getattr(source, "name", None) or type(source).__name__
+
 
 def resize_image(image, width=500):
+    import cv2
     h, w = image.shape[:2]
     ratio = width / w
     resized = cv2.resize(image, (width, int(h * ratio)), interpolation=cv2.INTER_AREA)
@@ -11,6 +94,7 @@ def resize_image(image, width=500):
 
 
 def preprocess_image(image):
+    import cv2
     # Normalisation de la luminosité
     lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
     l, a, b = cv2.split(lab)
@@ -21,6 +105,7 @@ def preprocess_image(image):
 
 
 def align_face(image, landmarks):
+    import cv2
     if 'left_eye' not in landmarks or 'right_eye' not in landmarks:
         return image
 
@@ -42,6 +127,7 @@ def align_face(image, landmarks):
 
 
 def draw_landmarks(image, landmarks_list):
+    import cv2
     for landmarks in landmarks_list:
         for feature, points in landmarks.items():
             for i in range(1, len(points)):
@@ -49,70 +135,266 @@ def draw_landmarks(image, landmarks_list):
             for point in points:
                 cv2.circle(image, point, 2, (0, 255, 0), -1)
 
-def compare_faces(img1_path, img2_path, threshold=0.2):
-    print(f"\n🔄 Fonction compare_faces lancée")
-    print(f"   - Image 1 : {img1_path}")
-    print(f"   - Image 2 : {img2_path}")
+def _boite_valide(boite, h, w):
+    top, right, bottom, left = (int(v) for v in boite)
+    top, left = max(0, top), max(0, left)
+    bottom, right = min(h, bottom), min(w, right)
+    if bottom - top < 8 or right - left < 8:
+        return None
+    return top, right, bottom, left
 
-    # Chargement
-    img1 = cv2.imread(img1_path)
-    img2 = cv2.imread(img2_path)
 
-    if img1 is None or img2 is None:
-        print("❌ Erreur de chargement d'une ou des images")
-        return False, 0.0
+def detecter_visages(rgb, roi=None):
+    """Boîtes (top, right, bottom, left) des visages de rgb, dans les coordonnées de rgb.
 
-    print("✅ Images chargées correctement")
+    Sans roi, la détection tourne sur une copie réduite à FACE_DETECTION_WIDTH (l'étape la plus
+    coûteuse, en O(pixels)) et les boîtes sont ramenées à la résolution de rgb. Avec une roi
+    (boîte fournie par le client ou trouvée par le contrôle qualité), seule la zone autour est
+    examinée, à pleine résolution. Modèle (hog / cnn) et suréchantillonnage : FACE_DETECTION_MODEL
+    et FACE_DETECTION_UPSAMPLE.
+    """
+    import cv2
+    import face_recognition
 
-    # Pré-traitement
-    img1 = preprocess_image(img1)
-    img2 = preprocess_image(img2)
-    print("🔧 Images prétraitées")
+    modele = _reglage("FACE_DETECTION_MODEL", "hog")
+    upsample = _reglage("FACE_DETECTION_UPSAMPLE", 1)
+    h, w = rgb.shape[:2]
+    zone, dy, dx = rgb, 0, 0
+    if roi is not None and _boite_valide(roi, h, w):
+        # Marge d'une demi-boîte : une boîte client approximative contient quand même tout le visage
+        top, right, bottom, left = _boite_valide(roi, h, w)
+        marge_y, marge_x = (bottom - top) // 2, (right - left) // 2
+        dy, dx = max(0, top - marge_y), max(0, left - marge_x)
+        zone = rgb[dy:min(h, bottom + marge_y), dx:min(w, right + marge_x)]
+        echelle_y = echelle_x = 1.0
+    else:
+        largeur = _reglage("FACE_DETECTION_WIDTH", 250)
+        echelle_y = echelle_x = 1.0
+        if largeur and w > largeur:
+            hauteur = max(1, round(h * largeur / w))
+            zone = cv2.resize(rgb, (largeur, hauteur), interpolation=cv2.INTER_AREA)
+            echelle_y, echelle_x = h / hauteur, w / largeur
 
-    img1 = resize_image(img1)
-    img2 = resize_image(img2)
-    print("📏 Images redimensionnées")
+    boites = face_recognition.face_locations(np.ascontiguousarray(zone),
+                                             number_of_times_to_upsample=upsample, model=modele)
+    ramenees = []
+    for top, right, bottom, left in boites:
+        boite = _boite_valide((top * echelle_y + dy, right * echelle_x + dx,
+                               bottom * echelle_y + dy, left * echelle_x + dx), h, w)
+        if boite:
+            ramenees.append(boite)
+    return ramenees
 
-    rgb1 = cv2.cvtColor(img1, cv2.COLOR_BGR2RGB)
-    rgb2 = cv2.cvtColor(img2, cv2.COLOR_BGR2RGB)
 
-    loc1 = face_recognition.face_locations(rgb1)
-    loc2 = face_recognition.face_locations(rgb2)
+def controler_qualite(image, boite=None):
+    """Rejette en quelques millisecondes une capture inexploitable, avant le pipeline dlib complet.
 
-    print(f"📌 Visages détectés : {len(loc1)} dans image1, {len(loc2)} dans image2")
+    Contrôles, du moins au plus coûteux : résolution minimale, luminosité (histogramme des gris),
+    netteté (variance du laplacien) et détection sur une image réduite (ou dans la boîte fournie).
+    Lève ImageInutilisable avec un code précis ; sinon retourne la boîte du plus grand visage
+    (coordonnées de image), réutilisable par encoder_image.
+    """
+    import cv2
 
-    if not loc1 or not loc2:
-        print("❌ Aucun visage détecté dans l'une des images")
+    with etape("qualite"):
+        if image is None:
+            raise ImageInutilisable("image_illisible", "Image illisible, veuillez reprendre la photo.")
+        h, w = image.shape[:2]
+        if min(h, w) < _reglage("FACE_QUALITE_RESOLUTION_MIN", 240):
+            raise ImageInutilisable("resolution_insuffisante",
+                                    "Résolution insuffisante, rapprochez-vous de la caméra.")
+
+        # Mesures sur une version réduite : indépendantes de la résolution de la caméra, et rapides
+        largeur = _reglage("FACE_QUALITE_LARGEUR", 320)
+        reduite = cv2.resize(image, (largeur, max(1, int(h * largeur / w))), interpolation=cv2.INTER_AREA)
+        gris = cv2.cvtColor(reduite, cv2.COLOR_BGR2GRAY)
+
+        histogramme = np.bincount(gris.ravel(), minlength=256)
+        total = histogramme.sum()
+        moyenne = float(histogramme @ np.arange(256)) / total
+        if moyenne < _reglage("FACE_QUALITE_LUMINOSITE_MIN", 40) or histogramme[:16].sum() > 0.6 * total:
+            raise ImageInutilisable("image_sombre", "Image trop sombre, placez-vous face à la lumière.")
+        if moyenne > _reglage("FACE_QUALITE_LUMINOSITE_MAX", 220) or histogramme[240:].sum() > 0.6 * total:
+            raise ImageInutilisable("image_surexposee", "Image surexposée, évitez la lumière directe.")
+
+        if cv2.Laplacian(gris, cv2.CV_64F).var() < _reglage("FACE_QUALITE_NETTETE_MIN", 60):
+            raise ImageInutilisable("image_floue", "Image floue, restez immobile pendant la capture.")
+
+        boites = detecter_visages(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), boite)
+        if not boites:
+            raise ImageInutilisable("aucun_visage", "Aucun visage détecté, centrez votre visage dans le cadre.")
+        return max(boites, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+
+
+def encoder_image(image, boite=None):
+    """Encodage 128-d du premier visage d'une image BGR.
+
+    boite : (top, right, bottom, left) dans les coordonnées de image (boîte client ou issue du
+    contrôle qualité) ; la détection se limite alors à cette zone.
+    Retourne (encodage, nb_visages) ; encodage vaut None si aucun visage n'est détecté.
+    """
+    import cv2
+    import face_recognition
+    largeur_origine = image.shape[1]
+    with etape("clahe"):
+        image = preprocess_image(image)
+    with etape("resize"):
+        # Landmarks et encodage restent calculés à FACE_WORKING_WIDTH (500 px) : encodages stockés compatibles
+        image = resize_image(image, _reglage("FACE_WORKING_WIDTH", 500))
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    with etape("detect"):
+        ratio = rgb.shape[1] / largeur_origine
+        roi = tuple(v * ratio for v in boite) if boite is not None else None
+        loc = detecter_visages(rgb, roi)
+        if not loc and roi is not None:
+            loc = detecter_visages(rgb)
+        largeur = _reglage("FACE_DETECTION_WIDTH", 250)
+        if not loc and largeur and rgb.shape[1] > largeur:
+            # Visage trop petit pour l'image réduite : dernière tentative à la résolution de travail
+            loc = face_recognition.face_locations(rgb, number_of_times_to_upsample=_reglage("FACE_DETECTION_UPSAMPLE", 1),
+                                                  model=_reglage("FACE_DETECTION_MODEL", "hog"))
+    if not loc:
+        return None, 0
+    with etape("landmarks"):
+        landmarks = face_recognition.face_landmarks(rgb, loc[:1])
+    with etape("align"):
+        aligned = align_face(rgb, landmarks[0])
+    with etape("encode"):
+        encodage = face_recognition.face_encodings(aligned, known_face_locations=[loc[0]])[0]
+    return encodage, len(loc)
+
+
+def encoder_fichier(source, controle=False, boite=None):
+    """controle=True pour une capture en direct : contrôle qualité avant l'encodage (ImageInutilisable).
+
+    boite : (top, right, bottom, left) du visage dans l'image, fournie par le client (optionnelle).
+    """
+    with etape("decode"):
+        image = charger_image(source)
+    if controle:
+        boite = controler_qualite(image, boite)
+    if image is None:
+        print(f"❌ Erreur de chargement de l'image {decrire_source(source)}")
+        return None, 0
+    return encoder_image(image, boite)
+
+
+# Stockage compact : 128 float32 = 512 octets (l'écart avec le float64 de dlib est négligeable)
+def encodage_vers_bytes(encodage):
+    return np.asarray(encodage, dtype=np.float32).tobytes()
+
+
+def bytes_vers_encodage(donnees):
+    return np.frombuffer(bytes(donnees), dtype=np.float32).astype(np.float64)
+
+
+def encoder_lot(elements):
+    """[(cle, source)] -> [(cle, encodage en octets ou None, nb_visages, erreur)].
+
+    Unité de travail des traitements de masse : un appel par lot, exécuté dans un processus du pool.
+    """
+    resultats = []
+    for cle, source in elements:
+        try:
+            with etape("decode"):
+                image = charger_image(source)
+            if image is None:
+                resultats.append((cle, None, 0, "Image illisible"))
+                continue
+            encodage, nb_visages = encoder_image(image)
+            resultats.append((cle, encodage_vers_bytes(encodage) if encodage is not None else None, nb_visages, ""))
+        except Exception as e:
+            resultats.append((cle, None, 0, str(e)))
+    return resultats
+
+
+def comparer_a_reference(encodage_reference, image, threshold=0.2, boite=None):
+    """Comme compare_faces, mais la référence est déjà encodée : seule l'image capturée passe par dlib."""
+    import face_recognition
+    encodage, nb_visages = encoder_fichier(image, controle=True, boite=boite)
+    if encodage is None:
+        print("❌ Aucun visage détecté dans l'image capturée")
         return False, 0.0
 
-    landmarks1 = face_recognition.face_landmarks(rgb1, loc1)
-    landmarks2 = face_recognition.face_landmarks(rgb2, loc2)
-    print("🗺️ Landmarks détectés")
+    distance = face_recognition.face_distance([encodage_reference], encodage)[0]
+    match = distance < threshold
+    if mode_debug():
+        print(f"🔍 Distance à la référence : {distance:.4f} (seuil {threshold}) -> {'✅ OUI' if match else '❌ NON'}")
+    return match, distance
+
 
-    aligned1 = align_face(rgb1, landmarks1[0])
-    aligned2 = align_face(rgb2, landmarks2[0])
-    print("📐 Visages alignés")
+def compare_faces(img1_path, img2_path, threshold=0.2, controle=True, boite=None):
+    """img1 : image de référence ; img2 : capture, soumise au contrôle qualité si controle.
 
-    encoding1 = face_recognition.face_encodings(aligned1, known_face_locations=[loc1[0]])[0]
-    encoding2 = face_recognition.face_encodings(aligned2, known_face_locations=[loc2[0]])[0]
-    print("🧬 Encodage des visages terminé")
+    boite : (top, right, bottom, left) du visage dans la capture, fournie par le client (optionnelle).
+    """
+    import cv2
+    import face_recognition
+    debug = mode_debug()
+    if debug:
+        print(f"\n🔄 Fonction compare_faces lancée")
+        print(f"   - Image 1 : {decrire_source(img1_path)}")
+        print(f"   - Image 2 : {decrire_source(img2_path)}")
+
+    # Chargement (chemin, octets, fichier uploadé ou ndarray)
+    with etape("decode"):
+        img1 = charger_image(img1_path)
+        img2 = charger_image(img2_path)
+
+    if controle:
+        boite = controler_qualite(img2, boite)
+
+    if img1 is None or img2 is None:
+        print("❌ Erreur de chargement d'une ou des images")
+        return False, 0.0
+
+    # Pré-traitement, détection, landmarks, alignement et encodage : une seule passe par image
+    encoding1, nb1 = encoder_image(img1)
+    encoding2, nb2 = encoder_image(img2, boite)
+    if debug:
+        print(f"📌 Visages détectés : {nb1} dans image1, {nb2} dans image2")
+
+    if encoding1 is None or encoding2 is None:
+        print("❌ Aucun visage détecté dans l'une des images")
+        return False, 0.0
 
     distance = face_recognition.face_distance([encoding1], encoding2)[0]
-    cosine_sim = cosine_similarity([encoding1], [encoding2])[0][0]
     match = distance < threshold
 
-    print("\n🔍 Résultats détaillés :")
-    print(f"   - Seuil de tolérance: {threshold}")
-    print(f"   - Correspondance: {'✅ OUI' if match else '❌ NON'}")
-    print(f"   - Distance euclidienne: {distance:.4f}")
-    print(f"   - Similarité cosinus: {cosine_sim * 100:.2f}%")
+    if debug:
+        cosine_sim = float(np.dot(encoding1, encoding2) / (np.linalg.norm(encoding1) * np.linalg.norm(encoding2)))
+        print("\n🔍 Résultats détaillés :")
+        print(f"   - Seuil de tolérance: {threshold}")
+        print(f"   - Correspondance: {'✅ OUI' if match else '❌ NON'}")
+        print(f"   - Distance euclidienne: {distance:.4f}")
+        print(f"   - Similarité cosinus: {cosine_sim * 100:.2f}%")
 
-    draw_landmarks(img1, face_recognition.face_landmarks(rgb1))
-    draw_landmarks(img2, face_recognition.face_landmarks(rgb2))
-
-    # cv2.imshow('Image 1 (avec landmarks)', img1)
-    # cv2.imshow('Image 2 (avec landmarks)', img2)
-    # cv2.waitKey(0)
-    # cv2.destroyAllWindows()
+        for image in (img1, img2):
+            image = resize_image(preprocess_image(image))
+            draw_landmarks(image, face_recognition.face_landmarks(cv2.cvtColor(image, cv2.COLOR_BGR2RGB)))
 
     return match, distance
+
+
+def prechauffer():
+    """Charge cv2 et les modèles dlib puis les exerce une fois (détection, landmarks, encodage).
+
+    Sert d'initializer aux processus du pool : la première vraie requête ne paie plus le chargement.
+    Retourne les durées (ms) de chaque phase.
+    """
+    temps = {}
+    debut = time.perf_counter()
+    import cv2  # noqa: F401
+    import face_recognition
+    temps["import"] = (time.perf_counter() - debut) * 1000
+
+    debut = time.perf_counter()
+    image = np.full((200, 200, 3), 128, dtype=np.uint8)
+    face_recognition.face_locations(image)
+    boite = (50, 150, 150, 50)
+    face_recognition.face_landmarks(image, [boite])
+    face_recognition.face_encodings(image, known_face_locations=[boite])
+    temps["exercice"] = (time.perf_counter() - debut) * 1000
+    print(f"[FACE] 🔥 Moteur préchauffé (pid {os.getpid()}) : import {temps['import']:.0f} ms, "
+          f"exercice {temps['exercice']:.0f} ms")
+    return temps
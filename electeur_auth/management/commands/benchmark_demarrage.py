@@ -0,0 +1,72 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+# Chaque scénario tourne dans un interpréteur neuf (comme un worker gunicorn/uvicorn qui démarre)
+# et affiche ses mesures en JSON sur une ligne préfixée par MESURES.
+SCENARIOS = {
+    "boot": """
+import json, sys, time
+debut = time.perf_counter()
+import django
+django.setup()
+from django.conf import settings
+from django.urls import get_resolver
+get_resolver(settings.ROOT_URLCONF).url_patterns
+lourds = [m for m in ("cv2", "face_recognition", "dlib", "pandas") if m in sys.modules]
+print("MESURES", json.dumps({"ms": (time.perf_counter() - debut) * 1000, "lourds": lourds}))
+""",
+    "premiere_requete": """
+import json, time
+import django
+django.setup()
+from electeur_auth.face_validation import prechauffer
+debut = time.perf_counter()
+temps = prechauffer()
+print("MESURES", json.dumps({"ms": (time.perf_counter() - debut) * 1000, **temps}))
+""",
+    "pool": """
+import json, time
+import django
+django.setup()
+from electeur_auth import face_pool
+debut = time.perf_counter()
+face_pool.demarrer()
+print("MESURES", json.dumps({"ms": (time.perf_counter() - debut) * 1000, "workers": face_pool._nb_workers()}))
+""",
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le coût de démarrage d'un worker : chargement des URLs (imports lourds évités ?), "
+        "préchauffage du moteur facial et démarrage du pool, chacun dans un processus neuf."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repetitions", type=int, default=3)
+        parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append",
+                            help="Scénario(s) à mesurer (défaut : tous)")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [os.getcwd(), os.environ.get("PYTHONPATH")]))}
+        for nom in options["scenario"] or SCENARIOS:
+            mesures = [self._executer(nom, env) for _ in range(max(1, options["repetitions"]))]
+            duree = statistics.median(m["ms"] for m in mesures)
+            details = {k: round(v) if isinstance(v, float) else v for k, v in mesures[-1].items() if k != "ms"}
+            self.stdout.write(f"{nom:<18} médiane {duree:8.0f} ms  {details}")
+            if nom == "boot" and details.get("lourds"):
+                self.stdout.write(self.style.WARNING(
+                    f"   ⚠️ Modules lourds importés au démarrage : {', '.join(details['lourds'])}"
+                ))
+
+    def _executer(self, nom, env):
+        resultat = subprocess.run([sys.executable, "-c", SCENARIOS[nom]], env=env, capture_output=True, text=True)
+        if resultat.returncode != 0:
+            raise CommandError(f"Scénario {nom} en échec :\n{resultat.stderr.strip()}")
+        ligne = next(l for l in resultat.stdout.splitlines() if l.startswith("MESURES "))
+        return json.loads(ligne[len("MESURES "):])
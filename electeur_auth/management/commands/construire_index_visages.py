@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from electeur_auth import face_index
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index d'identification faciale (un shard .npy par fokontany) depuis les encodages stockés."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fokontany", type=int, nargs="*", help="Limiter à ces fokontany")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        nb = face_index.reconstruire(options["fokontany"] or None)
+        self.stdout.write(self.style.SUCCESS(f"{nb} shard(s) reconstruit(s) en {time.perf_counter() - debut:.1f}s"))
@@ -0,0 +1,112 @@
+import csv
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from electeurs.models import Electeur
+
+
+class Command(BaseCommand):
+    help = (
+        "Détecte les électeurs dont les visages sont quasi identiques (même personne inscrite sous deux CIN) "
+        "à partir des encodages stockés : matrice de distances calculée par blocs, mémoire bornée."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seuil", type=float, default=0.4,
+                            help="Distance euclidienne en dessous de laquelle une paire est suspecte")
+        parser.add_argument("--bloc", type=int, default=4096,
+                            help="Lignes par bloc (mémoire de travail ≈ bloc² × 5 octets)")
+        parser.add_argument("--rapport", default="doublons_visages.csv", help="CSV des paires suspectes")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        electeurs = Electeur.objects.exclude(face_encoding=None)
+        n = electeurs.count()
+        taille_bloc = max(1, options["bloc"])
+        seuil2 = options["seuil"] ** 2
+
+        # Les encodages sont copiés dans un .npy mappé en mémoire : la RAM ne dépend que de la taille des blocs
+        with tempfile.TemporaryDirectory() as dossier, \
+                open(options["rapport"], "w", newline="", encoding="utf-8") as sortie:
+            ids = np.empty(n, dtype=np.int64)
+            encodages = np.lib.format.open_memmap(os.path.join(dossier, "encodages.npy"), mode="w+",
+                                                  dtype=np.float32, shape=(max(n, 1), 128))
+            n = self._charger(electeurs, ids, encodages)
+            self.stdout.write(f"{n} encodage(s) chargé(s) en {time.perf_counter() - debut:.1f}s")
+
+            # Colonnes augmentées : [a, |a|², 1] · [-2b, 1, |b|²] = |a - b|², entièrement calculé par BLAS
+            cote_b = np.lib.format.open_memmap(os.path.join(dossier, "cote_b.npy"), mode="w+",
+                                               dtype=np.float32, shape=(max(n, 1), 130))
+            for i in range(0, n, taille_bloc):
+                bloc = encodages[i:i + taille_bloc]
+                cote_b[i:i + taille_bloc, :128] = bloc * -2
+                cote_b[i:i + taille_bloc, 128] = 1
+                cote_b[i:i + taille_bloc, 129] = np.einsum("ij,ij->i", bloc, bloc)
+
+            rapport = csv.writer(sortie)
+            rapport.writerow(["electeur_a", "cin_a", "nom_a", "fokontany_a",
+                              "electeur_b", "cin_b", "nom_b", "fokontany_b", "distance"])
+            nb_paires = 0
+            for i in range(0, n, taille_bloc):
+                bloc = encodages[i:i + taille_bloc]
+                a = np.empty((len(bloc), 130), dtype=np.float32)
+                a[:, :128] = bloc
+                a[:, 128] = cote_b[i:i + taille_bloc, 129]
+                a[:, 129] = 1
+                paires = []
+                for j in range(i, n, taille_bloc):
+                    d2 = a @ cote_b[j:j + taille_bloc].T
+                    suspects = d2 < seuil2
+                    if i == j:
+                        suspects = np.triu(suspects, k=1)
+                    for ligne, colonne in zip(*np.nonzero(suspects)):
+                        distance = math.sqrt(max(float(d2[ligne, colonne]), 0.0))
+                        paires.append((int(ids[i + ligne]), int(ids[j + colonne]), distance))
+                nb_paires += self._ecrire(rapport, paires)
+                self.stdout.write(f"\r{min(i + taille_bloc, n)}/{n} ligne(s), {nb_paires} paire(s) suspecte(s)",
+                                  ending="")
+
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"{nb_paires} paire(s) suspecte(s) sur {n} électeur(s) en {time.perf_counter() - debut:.1f}s "
+            f"(rapport : {options['rapport']})."
+        ))
+
+    def _charger(self, electeurs, ids, encodages, page=10000):
+        n, curseur = 0, 0
+        while n < len(ids):
+            lignes = list(electeurs.filter(pk__gt=curseur).order_by("pk")
+                          .values_list("pk", "face_encoding")[:min(page, len(ids) - n)])
+            if not lignes:
+                break
+            for pk, donnees in lignes:
+                ids[n] = pk
+                encodages[n] = np.frombuffer(bytes(donnees), dtype=np.float32)
+                n += 1
+            curseur = lignes[-1][0]
+        return n
+
+    def _ecrire(self, rapport, paires):
+        if not paires:
+            return 0
+        concernes = {pk for a, b, _ in paires for pk in (a, b)}
+        details = {
+            row["pk"]: row for row in Electeur.objects.filter(pk__in=concernes).values(
+                "pk", "numCIN", "nom_electeur", "prenom_electeur", "fokontany__nom_fokontany"
+            )
+        }
+        for a, b, distance in sorted(paires, key=lambda p: p[2]):
+            da, db = details.get(a, {}), details.get(b, {})
+            rapport.writerow([
+                a, da.get("numCIN"), f"{da.get('nom_electeur')} {da.get('prenom_electeur')}",
+                da.get("fokontany__nom_fokontany"),
+                b, db.get("numCIN"), f"{db.get('nom_electeur')} {db.get('prenom_electeur')}",
+                db.get("fokontany__nom_fokontany"),
+                f"{distance:.4f}",
+            ])
+        return len(paires)
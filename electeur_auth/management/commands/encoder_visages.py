@@ -0,0 +1,131 @@
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from electeurs.models import Electeur
+from electeur_auth import face_index
+from electeur_auth.face_validation import encoder_lot
+
+
+class Command(BaseCommand):
+    help = (
+        "Calcule en parallèle l'encodage facial de référence des électeurs (photos non encodées), "
+        "avec reprise sur point de contrôle et rapport des photos sans visage ou à plusieurs visages."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tous", action="store_true", help="Réencoder toutes les photos")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--lot", type=int, default=50, help="Photos par tâche envoyée à un worker")
+        parser.add_argument("--reprise", default="encoder_visages.reprise.json",
+                            help="Fichier de point de contrôle (repris automatiquement s'il existe)")
+        parser.add_argument("--rapport", default="encoder_visages.rapport.csv",
+                            help="CSV des photos sans visage, à plusieurs visages ou illisibles")
+
+    def handle(self, *args, **options):
+        electeurs = Electeur.objects.exclude(image="").exclude(image__isnull=True)
+        if not options["tous"]:
+            electeurs = electeurs.exclude(face_encoding_image=F("image"))
+
+        dernier_id = self._lire_reprise(options["reprise"], options["tous"])
+        if dernier_id:
+            self.stdout.write(f"Reprise après l'électeur {dernier_id}")
+        stockage = Electeur._meta.get_field("image").storage
+        taille_lot = max(1, options["lot"])
+        workers = max(1, options["workers"])
+
+        stats = {"ok": 0, "sans_visage": 0, "multiples": 0, "erreurs": 0}
+        debut = time.perf_counter()
+        mode = "a" if dernier_id and os.path.exists(options["rapport"]) else "w"
+        with open(options["rapport"], mode, newline="", encoding="utf-8") as sortie, \
+                ProcessPoolExecutor(max_workers=workers) as pool:
+            rapport = csv.writer(sortie)
+            if mode == "w":
+                rapport.writerow(["electeur_id", "image", "nb_visages", "erreur"])
+
+            # Lots dans l'ordre des pk ; le point de contrôle n'avance que sur un préfixe entièrement traité
+            en_cours = deque()
+            noms = {}
+            fokontany_modifies = set()
+            curseur = dernier_id
+            epuise = False
+            while True:
+                # Pagination par pk (une requête indexée par lot, aucun curseur ouvert pendant les UPDATE)
+                while not epuise and len(en_cours) < workers * 2:
+                    lot = list(electeurs.filter(pk__gt=curseur).order_by("pk")
+                               .values_list("pk", "image", "fokontany_id")[:taille_lot])
+                    if not lot:
+                        epuise = True
+                        break
+                    noms.update((pk, (nom, fokontany_id)) for pk, nom, fokontany_id in lot)
+                    curseur = lot[-1][0]
+                    en_cours.append((curseur, pool.submit(encoder_lot, [(pk, stockage.path(nom)) for pk, nom, _ in lot])))
+                if not en_cours:
+                    break
+
+                # Les autres lots continuent dans le pool pendant qu'on attend le plus ancien
+                wait([en_cours[0][1]])
+                while en_cours and en_cours[0][1].done():
+                    fin_lot, future = en_cours.popleft()
+                    self._enregistrer(future.result(), noms, stats, rapport, fokontany_modifies)
+                    dernier_id = fin_lot
+                    self._ecrire_reprise(options["reprise"], dernier_id, options["tous"])
+                    sortie.flush()
+
+                traites = sum(stats.values())
+                self.stdout.write(f"\r{traites} photo(s) traitée(s), "
+                                  f"{traites / (time.perf_counter() - debut):.1f}/s", ending="")
+
+        # Index d'identification : un shard réécrit par fokontany touché, pas un par photo
+        if fokontany_modifies:
+            face_index.reconstruire(fokontany_modifies)
+
+        if os.path.exists(options["reprise"]):
+            os.remove(options["reprise"])
+        duree = time.perf_counter() - debut
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['ok']} encodage(s) en {duree:.1f}s avec {workers} worker(s) : "
+            f"{stats['sans_visage']} sans visage, {stats['multiples']} à plusieurs visages, "
+            f"{stats['erreurs']} erreur(s) (rapport : {options['rapport']})."
+        ))
+
+    def _enregistrer(self, resultats, noms, stats, rapport, fokontany_modifies):
+        with transaction.atomic():
+            for pk, donnees, nb_visages, erreur in resultats:
+                nom, fokontany_id = noms.pop(pk)
+                if erreur:
+                    stats["erreurs"] += 1
+                    rapport.writerow([pk, nom, nb_visages, erreur])
+                    continue
+                # Filtré sur le nom du fichier : une photo remplacée pendant le traitement est ignorée
+                if Electeur.objects.filter(pk=pk, image=nom).update(face_encoding=donnees, face_encoding_image=nom):
+                    fokontany_modifies.add(fokontany_id)
+                if nb_visages == 0:
+                    stats["sans_visage"] += 1
+                    rapport.writerow([pk, nom, 0, "Aucun visage détecté"])
+                elif nb_visages > 1:
+                    stats["multiples"] += 1
+                    rapport.writerow([pk, nom, nb_visages, "Plusieurs visages, le premier a été retenu"])
+                else:
+                    stats["ok"] += 1
+
+    def _lire_reprise(self, chemin, tous):
+        if not os.path.exists(chemin):
+            return 0
+        with open(chemin, encoding="utf-8") as f:
+            etat = json.load(f)
+        return etat["dernier_id"] if etat.get("tous") == tous else 0
+
+    def _ecrire_reprise(self, chemin, dernier_id, tous):
+        temporaire = f"{chemin}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as f:
+            json.dump({"dernier_id": dernier_id, "tous": tous}, f)
+        os.replace(temporaire, chemin)
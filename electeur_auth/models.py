@@ -1,5 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
 from django.utils import timezone
 from django.contrib.auth.hashers import make_password, check_password
 from django.core.exceptions import ValidationError
@@ -80,3 +82,20 @@ class ElecteurAuth(models.Model):
         stale_threshold = now - timedelta(minutes=5)
         ElecteurAuth.objects.filter(is_valid=False, date_auth__lt=stale_threshold).delete()
         ElecteurAuth.objects.filter(is_valid=True, expired_at__lt=now).delete()
+
+
+# Photo d’électeur ajoutée ou remplacée → encodage de référence recalculé par un worker
+@receiver(post_save, sender=Electeur)
+def encoder_visage_si_image_changee(sender, instance: Electeur, **kwargs):
+    nom_image = instance.image.name if instance.image else ''
+    if nom_image == instance.face_encoding_image:
+        return
+    if not nom_image:
+        Electeur.objects.filter(pk=instance.pk).update(face_encoding=None, face_encoding_image='')
+        from .utils import indexer_visage
+        electeur_id, fokontany_id = instance.pk, instance.fokontany_id
+        transaction.on_commit(lambda: indexer_visage(electeur_id, fokontany_id, None))
+        return
+    from .utils import lancer_encodage_visage
+    electeur_id = instance.pk
+    transaction.on_commit(lambda: lancer_encodage_visage(electeur_id))
@@ -7,11 +7,10 @@ from django.conf import settings
 
 from .models import ElecteurAuth
 from electeurs.models import Electeur
-from .face_validation import compare_faces  # ton fichier
-
-import os
-from django.core.files.storage import default_storage
-from django.conf import settings
+from .face_validation import comparer_a_reference, encoder_fichier
+from . import face_index
+from .face_pool import executer, CaptureRefusee, MoteurVisageSature
+from .utils import encodage_reference
 
 # 1) Démarrer l'authentification avec nom+prenom+cin
 class StartAuthSerializer(serializers.Serializer):
@@ -53,10 +52,25 @@ class StartAuthSerializer(serializers.Serializer):
 
 
 
+def champ_boite_visage():
+    # Boîte du visage détectée côté client, [x, y, largeur, hauteur] en pixels de la capture (optionnelle)
+    return serializers.ListField(child=serializers.IntegerField(min_value=0), min_length=4, max_length=4,
+                                 required=False, write_only=True)
+
+
+def boite_moteur(face_box):
+    """[x, y, largeur, hauteur] du client -> (top, right, bottom, left) attendu par le moteur."""
+    if not face_box:
+        return None
+    x, y, largeur, hauteur = face_box
+    return (y, x + largeur, y + hauteur, x)
+
+
 # 2) Étape faciale
 class FaceAuthSerializer(serializers.Serializer):
     auth_id = serializers.IntegerField()
     captured_image = serializers.ImageField(write_only=True)
+    face_box = champ_boite_visage()
 
     def validate(self, data):
         print("[FaceAuthSerializer] 🔍 Validation démarrée avec données :", data)
@@ -90,30 +104,31 @@ class FaceAuthSerializer(serializers.Serializer):
         auth: ElecteurAuth = validated['auth']
         up = validated['captured_image']
 
-        # Sauvegarde temporaire
-        temp_dir = os.path.join(settings.MEDIA_ROOT, 'temp_faces')
-        os.makedirs(temp_dir, exist_ok=True)
-        temp_path = default_storage.save(os.path.join('temp_faces', up.name), up)
-        abs_temp_path = default_storage.path(temp_path)
-        print(f"[FaceAuthSerializer] 📸 Image capturée sauvegardée en {abs_temp_path}")
+        print(f"[FaceAuthSerializer] 📸 Image capturée reçue : {up.name} ({up.size} octets), décodée en mémoire")
 
         # Image de référence
         ref_path = auth.electeur.image.path
         print(f"[FaceAuthSerializer] 📂 Image de référence : {ref_path}")
 
-        # Comparaison faciale
+        # Comparaison faciale (référence encodée une seule fois, stockée sur l'électeur)
         try:
-            match, distance = compare_faces(ref_path, abs_temp_path, threshold=0.7)
+            reference = encodage_reference(auth.electeur)
+            if reference is None:
+                print("[FaceAuthSerializer] ❌ Aucun visage détecté sur l'image de référence")
+                match, distance = False, 0.0
+            else:
+                # Octets bruts (picklables) vers le pool ; seule la capture passe par dlib
+                up.seek(0)
+                match, distance = executer(comparer_a_reference, reference, up.read(), 0.7,
+                                           boite_moteur(validated.get('face_box')))
             print(f"[FaceAuthSerializer] 🔍 Résultat comparaison : match={match}, distance={distance}")
+        except (MoteurVisageSature, CaptureRefusee):
+            # 503 + Retry-After, ou 400 avec un code (photo floue, sombre…) : le client reprend
+            # la capture, la session reste utilisable
+            raise
         except Exception as e:
             print("[FaceAuthSerializer] ❌ Erreur lors de la comparaison faciale :", str(e))
             raise serializers.ValidationError("Erreur lors de la comparaison faciale")
-        finally:
-            try:
-                default_storage.delete(temp_path)
-                print(f"[FaceAuthSerializer] 🧹 Fichier temporaire {temp_path} supprimé")
-            except Exception as e:
-                print("[FaceAuthSerializer] ⚠️ Erreur suppression fichier temp :", str(e))
 
         if not match:
             print("[FaceAuthSerializer] ❌ Reconnaissance faciale échouée")
@@ -182,3 +197,55 @@ class VerifyOTPSerializer(serializers.Serializer):
         auth.save(update_fields=['is_valid', 'expired_at'])
 
         return {"status": "valid", "expires_at": auth.expired_at}
+
+
+# 4) Identification 1:N (bureau de vote assisté) : visage seul, recherche limitée aux fokontany du bureau
+class IdentifierVisageSerializer(serializers.Serializer):
+    captured_image = serializers.ImageField(write_only=True)
+    fokontany = serializers.ListField(child=serializers.IntegerField(), required=False)
+    commune = serializers.IntegerField(required=False)
+    k = serializers.IntegerField(default=5, min_value=1, max_value=20)
+    face_box = champ_boite_visage()
+
+    def validate(self, data):
+        fokontany_ids = set(data.get('fokontany') or [])
+        if data.get('commune'):
+            from electeurs.models import Fokontany
+            fokontany_ids.update(
+                Fokontany.objects.filter(commune_id=data['commune']).values_list('id_fokontany', flat=True)
+            )
+        if not fokontany_ids:
+            raise serializers.ValidationError("Préciser au moins un fokontany ou une commune.")
+        data['fokontany_ids'] = sorted(fokontany_ids)
+        return data
+
+    def create(self, validated):
+        up = validated['captured_image']
+        up.seek(0)
+        encodage, nb_visages = executer(encoder_fichier, up.read(), True, boite_moteur(validated.get('face_box')))
+        if encodage is None:
+            raise serializers.ValidationError("Aucun visage détecté sur l'image capturée.")
+
+        trouves = face_index.rechercher(encodage, validated['fokontany_ids'], validated['k'])
+        # Vérification en base : un électeur déplacé depuis la construction du shard est ignoré
+        electeurs = Electeur.objects.only(
+            'id', 'nom_electeur', 'prenom_electeur', 'numCIN', 'fokontany_id'
+        ).in_bulk([electeur_id for electeur_id, _, _ in trouves])
+        seuil = getattr(settings, 'FACE_IDENTIFICATION_SEUIL', 0.6)
+
+        candidats = []
+        for electeur_id, fokontany_id, distance in trouves:
+            electeur = electeurs.get(electeur_id)
+            if electeur is None or electeur.fokontany_id != fokontany_id:
+                continue
+            candidats.append({
+                "electeur_id": electeur.id,
+                "nom": electeur.nom_electeur,
+                "prenom": electeur.prenom_electeur,
+                "numCIN": electeur.numCIN,
+                "fokontany": fokontany_id,
+                "distance": round(distance, 4),
+                "correspond": distance < seuil,
+            })
+        print(f"[IdentifierVisage] 🔎 {len(candidats)} candidat(s) sur {len(validated['fokontany_ids'])} fokontany")
+        return {"nb_visages": nb_visages, "candidats": candidats}
@@ -0,0 +1,13 @@
+from celery import shared_task
+
+from electeurs.models import Electeur
+from .utils import encoder_visage_electeur
+
+
+@shared_task
+def encoder_visage(electeur_id):
+    electeur = Electeur.objects.filter(pk=electeur_id).only("id", "image", "fokontany_id").first()
+    if electeur is None or not electeur.image:
+        return None
+    _, nb_visages = encoder_visage_electeur(electeur)
+    return nb_visages
@@ -1,3 +1,572 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import CustomUser
+from electeurs.models import Region, District, Commune, Fokontany, Electeur
+
+from . import face_index, face_pool, face_validation, utils
+from .face_validation import ImageInutilisable
+from .models import ElecteurAuth
+
+
+def encodage_test(graine):
+    return np.random.default_rng(graine).normal(size=128)
+
+
+class VisageTestCase(TestCase):
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        # FACE_POOL_WORKERS=0 : le moteur tourne dans le processus du test (mocks visibles)
+        reglages = override_settings(MEDIA_ROOT=self.dossier, FACE_INDEX_DIR=self.dossier, FACE_POOL_WORKERS=0)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        region = Region.objects.create(nom_region="Analamanga")
+        district = District.objects.create(nom_district="Antananarivo", region=region)
+        commune = Commune.objects.create(nom_commune="Antananarivo I", district=district)
+        self.fokontany = Fokontany.objects.create(nom_fokontany="Isotry", commune=commune)
+
+    def creer_electeur(self, i=0, image="images/electeurs/photo.jpg"):
+        electeur = Electeur.objects.create(
+            nom_electeur=f"Rabe{i}", prenom_electeur="Hery", dateNaissance=date(1990, 1, 1),
+            lieuNaissance="Antananarivo", numCIN=f"{i:012d}", adresse="Lot test", profession="Test",
+            email=f"electeur{i}@example.mg", numTel=f"03{i:08d}", fokontany=self.fokontany,
+        )
+        # Photo posée sans passer par save() : pas d'encodage planifié par le test
+        Electeur.objects.filter(pk=electeur.pk).update(image=image)
+        return Electeur.objects.get(pk=electeur.pk)
+
+
+class EncodageReferenceTests(VisageTestCase):
+    def test_photo_illisible_non_marquee_et_retentee(self):
+        electeur = self.creer_electeur(image="images/electeurs/absent.jpg")
+
+        self.assertEqual(utils.encoder_visage_electeur(electeur), (None, 0))
+        electeur.refresh_from_db()
+        self.assertEqual((electeur.face_encoding, electeur.face_encoding_image), (None, ""))
+
+        # La photo redevient lisible : le login suivant l'encode
+        reference = encodage_test(1)
+        with mock.patch.object(face_validation, "charger_image", return_value=np.zeros((8, 8, 3), np.uint8)), \
+                mock.patch.object(face_validation, "encoder_image", return_value=(reference, 1)):
+            encodage = utils.encodage_reference(electeur)
+        np.testing.assert_allclose(encodage, reference.astype(np.float32))
+        electeur.refresh_from_db()
+        self.assertEqual(electeur.face_encoding_image, "images/electeurs/absent.jpg")
+
+    def test_photo_sans_visage_non_reencodee(self):
+        electeur = self.creer_electeur()
+        with mock.patch.object(face_validation, "charger_image", return_value=np.zeros((8, 8, 3), np.uint8)), \
+                mock.patch.object(face_validation, "encoder_image", return_value=(None, 0)):
+            self.assertEqual(utils.encoder_visage_electeur(electeur), (None, 0))
+        electeur.refresh_from_db()
+        self.assertEqual((electeur.face_encoding, electeur.face_encoding_image), (None, "images/electeurs/photo.jpg"))
+
+        with mock.patch.object(utils, "encoder_visage_electeur") as encoder:
+            self.assertIsNone(utils.encodage_reference(electeur))
+        encoder.assert_not_called()
+
+    def test_encodage_stocke_reutilise_tant_que_la_photo_ne_change_pas(self):
+        electeur = self.creer_electeur()
+        Electeur.objects.filter(pk=electeur.pk).update(
+            face_encoding=face_validation.encodage_vers_bytes(encodage_test(2)),
+            face_encoding_image="images/electeurs/photo.jpg",
+        )
+        electeur.refresh_from_db()
+        with mock.patch.object(utils, "encoder_visage_electeur") as encoder:
+            np.testing.assert_allclose(utils.encodage_reference(electeur), encodage_test(2).astype(np.float32))
+        encoder.assert_not_called()
+
+        # Photo remplacée : l'encodage stocké est périmé
+        electeur.image = "images/electeurs/nouvelle.jpg"
+        with mock.patch.object(utils, "encoder_visage_electeur", return_value=(None, 0)) as encoder:
+            utils.encodage_reference(electeur)
+        encoder.assert_called_once()
+
+
+class ChargementImageTests(SimpleTestCase):
+    def setUp(self):
+        import cv2
+        self.image = np.random.default_rng(0).integers(0, 256, size=(24, 32, 3), dtype=np.uint8)
+        self.png = cv2.imencode(".png", self.image)[1].tobytes()
+
+    def test_capture_decodee_en_memoire(self):
+        np.testing.assert_array_equal(face_validation.charger_image(self.png), self.image)
+        np.testing.assert_array_equal(face_validation.charger_image(memoryview(self.png)), self.image)
+
+        # Upload déjà lu en partie (validation du serializer) : relu depuis le début
+        upload = SimpleUploadedFile("capture.png", self.png, content_type="image/png")
+        upload.read(10)
+        np.testing.assert_array_equal(face_validation.charger_image(upload), self.image)
+        np.testing.assert_array_equal(face_validation.charger_image(io.BytesIO(self.png)), self.image)
+        self.assertIs(face_validation.charger_image(self.image), self.image)
+
+    def test_octets_invalides(self):
+        self.assertIsNone(face_validation.charger_image(b"pas une image"))
+        self.assertIsNone(face_validation.charger_image(None))
+        self.assertEqual(face_validation.encoder_fichier(b"pas une image"), (None, 0))
+
+
+def capture_png():
+    tampon = io.BytesIO()
+    Image.new("RGB", (32, 32), (120, 110, 100)).save(tampon, format="PNG")
+    return SimpleUploadedFile("capture.png", tampon.getvalue(), content_type="image/png")
+
+
+class PoolTest:
+    """Pool factice : les tâches soumises restent en attente jusqu'à ce que le test les termine."""
+
+    def __init__(self):
+        self.futures = []
+
+    def submit(self, fonction, *args):
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self.futures.append(future)
+        return future
+
+
+@override_settings(FACE_POOL_WORKERS=1, FACE_POOL_QUEUE=1, FACE_POOL_TIMEOUT=0.05)
+class FacePoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = PoolTest()
+        self.places = threading.BoundedSemaphore(2)
+        patch = mock.patch.object(face_pool, "_obtenir_pool", return_value=(self.pool, self.places))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_file_pleine_refusee_sans_attendre(self):
+        for _ in range(2):
+            with self.assertRaises(face_pool.DelaiVisageDepasse):
+                face_pool.executer(len, "abc")
+        with self.assertRaises(face_pool.MoteurVisageSature) as refus:
+            face_pool.executer(len, "abc")
+        self.assertEqual(refus.exception.status_code, 503)
+        self.assertEqual(refus.exception.wait, 2)
+        self.assertEqual(len(self.pool.futures), 2)
+
+        # Une place n'est rendue qu'à la fin réelle du calcul abandonné
+        self.pool.futures[0].set_result((3, {}))
+        self.pool.futures.pop(0)
+        self.assertTrue(self.places.acquire(blocking=False))
+
+    def test_capture_refusee_par_le_moteur(self):
+        self.pool.submit = mock.Mock(return_value=Future())
+        self.pool.submit.return_value.set_exception(ImageInutilisable("image_floue", "Image floue."))
+        with self.assertRaises(face_pool.CaptureRefusee) as refus:
+            face_pool.executer(len, "abc")
+        self.assertEqual(refus.exception.detail["code"], "image_floue")
+        self.assertEqual(refus.exception.status_code, 400)
+        # Place rendue
+        self.assertTrue(self.places.acquire(blocking=False))
+        self.assertTrue(self.places.acquire(blocking=False))
+
+
+class FaceAuthTests(VisageTestCase):
+    def setUp(self):
+        super().setUp()
+        electeur = self.creer_electeur()
+        Electeur.objects.filter(pk=electeur.pk).update(
+            face_encoding=face_validation.encodage_vers_bytes(encodage_test(3)),
+            face_encoding_image="images/electeurs/photo.jpg",
+        )
+        self.auth = ElecteurAuth.objects.create(electeur=electeur, is_identifiant_valid=True)
+
+    def authentifier(self):
+        return self.client.post(reverse("electeur-auth-face"),
+                                {"auth_id": self.auth.pk, "captured_image": capture_png()})
+
+    @override_settings(FACE_POOL_WORKERS=1)
+    def test_moteur_sature_503_avec_retry_after(self):
+        pool, places = mock.Mock(), threading.BoundedSemaphore(1)
+        places.acquire()
+        with mock.patch.object(face_pool, "_obtenir_pool", return_value=(pool, places)):
+            reponse = self.authentifier()
+        pool.submit.assert_not_called()
+        self.assertEqual(reponse.status_code, 503)
+        self.assertEqual(reponse["Retry-After"], "2")
+        self.auth.refresh_from_db()
+        self.assertFalse(self.auth.is_facial_valid)
+
+    def test_capture_floue_400_avec_code(self):
+        refus = ImageInutilisable("image_floue", "Image floue, restez immobile pendant la capture.")
+        with mock.patch.object(face_validation, "controler_qualite", side_effect=refus):
+            reponse = self.authentifier()
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(reponse.json()["code"], "image_floue")
+
+    def test_visage_reconnu(self):
+        with mock.patch.object(face_validation, "charger_image", return_value=np.zeros((8, 8, 3), np.uint8)), \
+                mock.patch.object(face_validation, "controler_qualite", return_value=None), \
+                mock.patch.object(face_validation, "encoder_image", return_value=(encodage_test(3), 1)), \
+                mock.patch("face_recognition.face_distance", return_value=np.array([0.1]), create=True):
+            reponse = self.authentifier()
+        self.assertEqual(reponse.status_code, 200)
+        self.auth.refresh_from_db()
+        self.assertTrue(self.auth.is_facial_valid)
+
+
+def encoder_lot_test(elements):
+    # Résultat choisi d'après le nom de la photo, comme le ferait encoder_lot
+    resultats = []
+    for cle, chemin in elements:
+        nom = os.path.basename(chemin)
+        if nom == "absent.jpg":
+            resultats.append((cle, None, 0, "Image illisible"))
+        elif nom == "paysage.jpg":
+            resultats.append((cle, None, 0, ""))
+        else:
+            encodage = face_validation.encodage_vers_bytes(encodage_test(cle))
+            resultats.append((cle, encodage, 2 if nom == "groupe.jpg" else 1, ""))
+    return resultats
+
+
+class EncoderVisagesTests(VisageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Threads au lieu de processus : le moteur factice reste visible
+        for nom, valeur in [("ProcessPoolExecutor", ThreadPoolExecutor), ("encoder_lot", encoder_lot_test)]:
+            patch = mock.patch(f"electeur_auth.management.commands.encoder_visages.{nom}", valeur)
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.reprise = os.path.join(self.dossier, "reprise.json")
+        self.rapport = os.path.join(self.dossier, "rapport.csv")
+        photos = ["photo.jpg", "paysage.jpg", "groupe.jpg", "absent.jpg", "photo.jpg"]
+        self.electeurs = [self.creer_electeur(i, f"images/electeurs/{nom}") for i, nom in enumerate(photos)]
+
+    def encoder(self, **options):
+        call_command("encoder_visages", workers=2, lot=2, reprise=self.reprise, rapport=self.rapport,
+                     stdout=io.StringIO(), **options)
+        with open(self.rapport, encoding="utf-8") as f:
+            return {int(ligne["electeur_id"]): ligne for ligne in csv.DictReader(f)}
+
+    def test_encodage_rapport_et_index(self):
+        rapport = self.encoder()
+        self.assertEqual(sorted(rapport), [self.electeurs[i].pk for i in (1, 2, 3)])
+        self.assertEqual(rapport[self.electeurs[3].pk]["erreur"], "Image illisible")
+
+        encodes = dict(Electeur.objects.exclude(face_encoding_image="").values_list("pk", "face_encoding"))
+        # Photo illisible : ni encodage ni marque, elle sera retentée
+        self.assertEqual(sorted(encodes), [self.electeurs[i].pk for i in (0, 1, 2, 4)])
+        self.assertIsNone(encodes[self.electeurs[1].pk])
+        self.assertFalse(os.path.exists(self.reprise))
+
+        trouves = face_index.rechercher(encodage_test(self.electeurs[4].pk), [self.fokontany.pk], k=1)
+        self.assertEqual(trouves[0][0], self.electeurs[4].pk)
+
+        # Deuxième passage : seules les photos non encodées sont reprises
+        with mock.patch("electeur_auth.management.commands.encoder_visages.encoder_lot",
+                        side_effect=encoder_lot_test) as encodeur:
+            self.encoder()
+        self.assertEqual([cle for appel in encodeur.call_args_list for cle, _ in appel.args[0]],
+                         [self.electeurs[3].pk])
+
+    def test_reprise_apres_point_de_controle(self):
+        with open(self.reprise, "w", encoding="utf-8") as f:
+            json.dump({"dernier_id": self.electeurs[1].pk, "tous": False}, f)
+        self.encoder()
+        encodes = set(Electeur.objects.exclude(face_encoding_image="").values_list("pk", flat=True))
+        self.assertEqual(encodes, {self.electeurs[i].pk for i in (2, 4)})
+
+        # Point de contrôle d'un passage --tous : ignoré par un passage normal
+        with open(self.reprise, "w", encoding="utf-8") as f:
+            json.dump({"dernier_id": self.electeurs[4].pk, "tous": True}, f)
+        self.encoder()
+        encodes = set(Electeur.objects.exclude(face_encoding_image="").values_list("pk", flat=True))
+        self.assertEqual(encodes, {self.electeurs[i].pk for i in (0, 1, 2, 4)})
+
+
+class DoublonsVisagesTests(VisageTestCase):
+    def test_paires_identiques_au_calcul_direct(self):
+        bruit = np.random.default_rng(0).normal(scale=0.01, size=(7, 128))
+        # Doublons dans un même bloc (0, 1) et entre deux blocs (2, 6) ; 5 sans encodage
+        encodages = [encodage_test(1), encodage_test(1), encodage_test(2), encodage_test(3),
+                     encodage_test(4), None, encodage_test(2)]
+        electeurs = []
+        for i, encodage in enumerate(encodages):
+            electeur = self.creer_electeur(i)
+            if encodage is not None:
+                Electeur.objects.filter(pk=electeur.pk).update(
+                    face_encoding=face_validation.encodage_vers_bytes(encodage + bruit[i]))
+            electeurs.append(electeur)
+
+        rapport = os.path.join(self.dossier, "doublons.csv")
+        call_command("detecter_doublons_visages", bloc=3, seuil=0.4, rapport=rapport, stdout=io.StringIO())
+        with open(rapport, encoding="utf-8") as f:
+            paires = {(int(ligne["electeur_a"]), int(ligne["electeur_b"])): ligne for ligne in csv.DictReader(f)}
+
+        self.assertEqual(set(paires), {(electeurs[0].pk, electeurs[1].pk), (electeurs[2].pk, electeurs[6].pk)})
+        ligne = paires[(electeurs[2].pk, electeurs[6].pk)]
+        self.assertEqual((ligne["cin_a"], ligne["fokontany_b"]), (electeurs[2].numCIN, "Isotry"))
+        stockes = [(encodages[i] + bruit[i]).astype(np.float32) for i in (2, 6)]
+        attendue = np.linalg.norm(stockes[0] - stockes[1])
+        self.assertAlmostEqual(float(ligne["distance"]), attendue, places=3)
+
+
+class IndexVisagesTests(VisageTestCase):
+    def setUp(self):
+        super().setUp()
+        # Shards ouverts par le processus : repartir d'un cache vide
+        shards = mock.patch.dict(face_index._shards, clear=True)
+        shards.start()
+        self.addCleanup(shards.stop)
+        self.voisin = Fokontany.objects.create(nom_fokontany="Mahamasina", commune=self.fokontany.commune)
+        self.electeurs = [self.creer_electeur(i) for i in range(6)]
+        for electeur in self.electeurs[4:]:
+            Electeur.objects.filter(pk=electeur.pk).update(fokontany=self.voisin)
+        for electeur in Electeur.objects.all():
+            Electeur.objects.filter(pk=electeur.pk).update(
+                face_encoding=face_validation.encodage_vers_bytes(encodage_test(electeur.pk)))
+
+    def test_recherche_exacte_limitee_aux_fokontany(self):
+        self.assertEqual(face_index.reconstruire(), 2)
+        requete = encodage_test(self.electeurs[1].pk) + 0.01
+        trouves = face_index.rechercher(requete, [self.fokontany.pk], k=3)
+        self.assertEqual([t[0] for t in trouves][:1], [self.electeurs[1].pk])
+        self.assertEqual(len(trouves), 3)
+        self.assertEqual([t[2] for t in trouves], sorted(t[2] for t in trouves))
+        attendue = np.linalg.norm(encodage_test(self.electeurs[1].pk).astype(np.float32) - requete.astype(np.float32))
+        self.assertAlmostEqual(trouves[0][2], attendue, places=3)
+
+        # Le fokontany voisin n'est examiné que s'il est demandé
+        cible = encodage_test(self.electeurs[5].pk)
+        self.assertNotIn(self.electeurs[5].pk, [t[0] for t in face_index.rechercher(cible, [self.fokontany.pk])])
+        self.assertEqual(face_index.rechercher(cible, [self.fokontany.pk, self.voisin.pk], k=1)[0][:2],
+                         (self.electeurs[5].pk, self.voisin.pk))
+
+    def test_mise_a_jour_incrementale(self):
+        face_index.reconstruire()
+        electeur = self.electeurs[0]
+        nouvel = face_validation.encodage_vers_bytes(encodage_test(100))
+        face_index.mettre_a_jour(electeur.pk, self.fokontany.pk, nouvel)
+        self.assertEqual(face_index.rechercher(encodage_test(100), [self.fokontany.pk], k=1)[0][0], electeur.pk)
+        self.assertEqual(len(face_index._shard(self.fokontany.pk)), 4)
+
+        face_index.mettre_a_jour(electeur.pk, self.fokontany.pk, None)
+        self.assertNotIn(electeur.pk, [t[0] for t in face_index.rechercher(encodage_test(100), [self.fokontany.pk])])
+
+    def test_identification_au_bureau_de_vote(self):
+        face_index.reconstruire()
+        url = reverse("electeur-auth-identifier")
+        self.assertEqual(self.client.post(url, {"captured_image": capture_png(),
+                                                "fokontany": [self.fokontany.pk]}).status_code, 401)
+
+        agent = CustomUser.objects.create_user("agent@example.mg", "secret", pseudo_admin="agent",
+                                               nom_admin="Agent", prenom_admin="Test")
+        entete = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(agent).access_token}"}
+        # Électeur déplacé depuis la construction du shard : ignoré
+        Electeur.objects.filter(pk=self.electeurs[2].pk).update(fokontany=self.voisin)
+        def identifier(electeur):
+            with mock.patch.object(face_validation, "charger_image", return_value=np.zeros((8, 8, 3), np.uint8)), \
+                    mock.patch.object(face_validation, "controler_qualite", return_value=None), \
+                    mock.patch.object(face_validation, "encoder_image", return_value=(encodage_test(electeur.pk), 1)):
+                reponse = self.client.post(url, {"captured_image": capture_png(), "k": 2,
+                                                 "commune": self.fokontany.commune_id}, **entete)
+            self.assertEqual(reponse.status_code, 200)
+            return reponse.json()["candidats"]
+
+        candidats = identifier(self.electeurs[5])
+        self.assertEqual((candidats[0]["electeur_id"], candidats[0]["fokontany"], candidats[0]["correspond"]),
+                         (self.electeurs[5].pk, self.voisin.pk, True))
+        candidats = identifier(self.electeurs[2])
+        self.assertNotIn(self.electeurs[2].pk, [c["electeur_id"] for c in candidats])
+        self.assertTrue(all(not c["correspond"] for c in candidats))
+
+        self.assertEqual(self.client.post(url, {"captured_image": capture_png()}, **entete).status_code, 400)
+
+
+mesures_publiees = []
+
+
+def hook_metriques(operation, temps):
+    mesures_publiees.append((operation, temps))
+
+
+def hook_en_panne(operation, temps):
+    raise RuntimeError("statsd injoignable")
+
+
+def etapes_test():
+    with face_validation.etape("decode"):
+        pass
+    with face_validation.etape("detect"):
+        pass
+    with face_validation.etape("detect"):
+        pass
+    return "ok"
+
+
+class MoteurVisageTestCase(SimpleTestCase):
+    """face_recognition simulé : la détection renvoie une boîte fixe, l'encodage un vecteur nul."""
+
+    boites = [(40, 160, 160, 40)]
+
+    def setUp(self):
+        import face_recognition
+        self.face_recognition = face_recognition
+        for nom, valeur in [("face_locations", lambda rgb, **options: list(self.boites)),
+                            ("face_landmarks", lambda rgb, boites: [{}] * len(boites)),
+                            ("face_encodings", lambda rgb, known_face_locations: [np.zeros(128)])]:
+            patch = mock.patch.object(face_recognition, nom, side_effect=valeur, create=True)
+            patch.start()
+            self.addCleanup(patch.stop)
+
+
+class ProfilageTests(MoteurVisageTestCase):
+    def test_duree_par_etape(self):
+        image = np.random.default_rng(0).integers(0, 256, size=(400, 600, 3), dtype=np.uint8)
+        (encodage, nb_visages), temps = face_validation.mesurer(face_validation.encoder_image, image)
+        self.assertEqual(nb_visages, 1)
+        self.assertEqual(set(temps), {"clahe", "resize", "detect", "landmarks", "align", "encode"})
+        self.assertTrue(all(duree >= 0 for duree in temps.values()))
+
+        # Hors mesure, les étapes ne sont pas relevées
+        with face_validation.etape("decode"):
+            pass
+        self.assertIsNone(face_validation._mesures.temps)
+
+    @override_settings(FACE_POOL_WORKERS=0, FACE_METRICS_HOOK="electeur_auth.tests.hook_metriques")
+    def test_hook_de_metriques(self):
+        mesures_publiees.clear()
+        self.assertEqual(face_pool.executer(etapes_test), "ok")
+        [(operation, temps)] = mesures_publiees
+        self.assertEqual(operation, "etapes_test")
+        self.assertEqual(set(temps), {"decode", "detect"})
+
+    @override_settings(FACE_POOL_WORKERS=0, FACE_METRICS_HOOK="electeur_auth.tests.hook_en_panne")
+    def test_hook_en_panne_sans_effet_sur_le_resultat(self):
+        self.assertEqual(face_pool.executer(etapes_test), "ok")
+
+
+class DemarrageTests(MoteurVisageTestCase):
+    def test_prechauffage_exerce_chaque_modele(self):
+        temps = face_validation.prechauffer()
+        self.assertEqual(set(temps), {"import", "exercice"})
+        for nom in ("face_locations", "face_landmarks", "face_encodings"):
+            getattr(self.face_recognition, nom).assert_called_once()
+
+    @override_settings(FACE_POOL_WORKERS=0)
+    def test_demarrer_sans_pool(self):
+        with mock.patch.object(face_pool, "prechauffer") as prechauffer, \
+                mock.patch.object(face_index, "charger", return_value=0) as charger:
+            face_pool.demarrer()
+        prechauffer.assert_called_once_with()
+        charger.assert_called_once_with()
+
+    def test_boot_sans_import_du_moteur(self):
+        # Interpréteur neuf : chargement des URLs sans cv2 / face_recognition / dlib
+        sortie = io.StringIO()
+        call_command("benchmark_demarrage", scenario=["boot"], repetitions=1, stdout=sortie)
+        self.assertIn("boot", sortie.getvalue())
+        self.assertNotIn("Modules lourds", sortie.getvalue())
+
+
+class ControleQualiteTests(MoteurVisageTestCase):
+    def image(self, valeur=None, taille=(480, 640)):
+        if valeur is None:
+            # Texture aléatoire : luminosité moyenne, laplacien élevé
+            return np.random.default_rng(0).integers(60, 200, size=(*taille, 3), dtype=np.uint8)
+        return np.full((*taille, 3), valeur, dtype=np.uint8)
+
+    def code(self, image):
+        with self.assertRaises(ImageInutilisable) as refus:
+            face_validation.controler_qualite(image)
+        return refus.exception.code
+
+    def test_codes_de_refus(self):
+        self.assertEqual(self.code(None), "image_illisible")
+        self.assertEqual(self.code(self.image(taille=(120, 160))), "resolution_insuffisante")
+        self.assertEqual(self.code(self.image(10)), "image_sombre")
+        self.assertEqual(self.code(self.image(250)), "image_surexposee")
+        self.assertEqual(self.code(self.image(128)), "image_floue")
+        self.boites = []
+        self.assertEqual(self.code(self.image()), "aucun_visage")
+
+    def test_plus_grand_visage_en_coordonnees_de_l_image(self):
+        # Détection sur une copie réduite à FACE_DETECTION_WIDTH (250 px) : boîtes ramenées à 640 px
+        self.boites = [(10, 30, 30, 10), (20, 120, 120, 20)]
+        top, right, bottom, left = face_validation.controler_qualite(self.image())
+        self.assertEqual((top, left), (51, 51))
+        self.assertAlmostEqual(right, 307, delta=1)
+        self.assertAlmostEqual(bottom, 307, delta=1)
+
+    @override_settings(FACE_QUALITE_NETTETE_MIN=0)
+    def test_seuils_configurables(self):
+        # Image uniforme acceptée quand le contrôle de netteté est désactivé
+        self.assertEqual(len(face_validation.controler_qualite(self.image(128))), 4)
+
+    def test_capture_refusee_avant_l_encodage(self):
+        with mock.patch.object(face_validation, "encoder_image") as encoder:
+            with self.assertRaises(ImageInutilisable):
+                face_validation.compare_faces(self.image(), self.image(10))
+        encoder.assert_not_called()
+
+
+class DetectionReduiteTests(MoteurVisageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.zones = []
+        self.face_recognition.face_locations.side_effect = self.detecter
+
+    def detecter(self, zone, **options):
+        self.zones.append((zone.shape[:2], options))
+        return list(self.boites)
+
+    def test_boite_client_vers_moteur(self):
+        from .serializers import boite_moteur
+        self.assertEqual(boite_moteur([100, 50, 80, 120]), (50, 180, 170, 100))
+        self.assertIsNone(boite_moteur(None))
+
+    @override_settings(FACE_DETECTION_MODEL="cnn", FACE_DETECTION_UPSAMPLE=0)
+    def test_detection_sur_copie_reduite(self):
+        rgb = np.zeros((500, 1000, 3), dtype=np.uint8)
+        self.boites = [(10, 60, 60, 10)]
+        [boite] = face_validation.detecter_visages(rgb)
+        self.assertEqual(self.zones, [((125, 250), {"number_of_times_to_upsample": 0, "model": "cnn"})])
+        self.assertEqual(boite, (40, 240, 240, 40))
+
+        with override_settings(FACE_DETECTION_WIDTH=0):
+            face_validation.detecter_visages(rgb)
+        self.assertEqual(self.zones[-1][0], (500, 1000))
+
+    def test_detection_dans_la_roi_a_pleine_resolution(self):
+        rgb = np.zeros((500, 1000, 3), dtype=np.uint8)
+        self.boites = [(5, 45, 45, 5)]
+        # Boîte 100 x 100 en (200, 400) : zone examinée avec une demi-boîte de marge
+        [boite] = face_validation.detecter_visages(rgb, roi=(200, 500, 300, 400))
+        self.assertEqual(self.zones[0][0], (200, 200))
+        self.assertEqual(boite, (155, 395, 195, 355))
+
+    def test_encodage_avec_boite_ramenee_a_la_largeur_de_travail(self):
+        image = np.random.default_rng(0).integers(0, 256, size=(600, 1000, 3), dtype=np.uint8)
+        self.boites = [(5, 45, 45, 5)]
+        face_validation.encoder_image(image, boite=(200, 500, 300, 400))
+        # Image ramenée à 500 px : la boîte (100 x 100) devient 50 x 50, zone 100 x 100
+        self.assertEqual(self.zones[0][0], (100, 100))
+
+        # Rien dans la boîte du client : nouvelle détection sur l'image entière réduite
+        def rien_dans_la_roi(zone, **options):
+            self.zones.append((zone.shape[:2], options))
+            return [] if len(self.zones) == 1 else [(10, 60, 60, 10)]
+
+        self.zones.clear()
+        self.face_recognition.face_locations.side_effect = rien_dans_la_roi
+        encodage, nb_visages = face_validation.encoder_image(image, boite=(200, 500, 300, 400))
+        self.assertEqual(nb_visages, 1)
+        self.assertEqual([taille for taille, _ in self.zones], [(100, 100), (150, 250)])
@@ -1,9 +1,10 @@
 from django.urls import path
-from .views import StartAuthView, FaceAuthView, VerifyOTPView, DeleteAuthSessionView
+from .views import StartAuthView, FaceAuthView, VerifyOTPView, DeleteAuthSessionView, IdentifierVisageView
 
 urlpatterns = [
     path('start/', StartAuthView.as_view(), name='electeur-auth-start'),
     path('face/', FaceAuthView.as_view(), name='electeur-auth-face'),
     path('verify-otp/', VerifyOTPView.as_view(), name='electeur-auth-verify'),
+    path('identifier/', IdentifierVisageView.as_view(), name='electeur-auth-identifier'),
     path("delete/<int:id>/", DeleteAuthSessionView.as_view(), name="delete_auth_session"),
 ]
\ No newline at end of file
@@ -1,6 +1,7 @@
 # electeur_auth/utils.py
 
 from django.utils import timezone
+from electeurs.models import Electeur
 from .models import ElecteurAuth
 
 def cleanup_expired_auths():
@@ -12,3 +13,68 @@ def cleanup_expired_auths():
         import traceback
         print("[CLEANUP][ERREUR]", str(e))
         traceback.print_exc()
+
+
+
+def encoder_visage_electeur(electeur, via_pool=False):
+    """Calcule et stocke l'encodage de référence de electeur.image. Retourne (encodage, nb_visages).
+
+    via_pool : calcul dans le pool de reconnaissance faciale (chemin requête) plutôt qu'en ligne.
+    Photo illisible (fichier absent, disque d'un autre service…) : rien n'est stocké, elle sera retentée ;
+    seule une photo lue sans visage est marquée comme telle.
+    """
+    from .face_validation import encoder_lot, bytes_vers_encodage
+
+    nom_image = electeur.image.name
+    if via_pool:
+        from .face_pool import executer
+        [(_, donnees, nb_visages, erreur)] = executer(encoder_lot, [(electeur.pk, electeur.image.path)])
+    else:
+        [(_, donnees, nb_visages, erreur)] = encoder_lot([(electeur.pk, electeur.image.path)])
+    if erreur:
+        print(f"[FACE] ⚠️ Photo de l'électeur {electeur.pk} non encodée ({nom_image}) : {erreur}")
+        return None, 0
+    encodage = bytes_vers_encodage(donnees) if donnees is not None else None
+    # Filtré sur le nom du fichier : une photo remplacée entre-temps ne reçoit pas un encodage périmé
+    if Electeur.objects.filter(pk=electeur.pk, image=nom_image).update(
+        face_encoding=donnees, face_encoding_image=nom_image,
+    ):
+        indexer_visage(electeur.pk, electeur.fokontany_id, donnees)
+    electeur.face_encoding_image = nom_image
+    return encodage, nb_visages
+
+
+def indexer_visage(electeur_id, fokontany_id, donnees):
+    # L'index d'identification n'est qu'un accélérateur : un échec ne bloque ni l'inscription ni le login
+    from . import face_index
+
+    try:
+        face_index.mettre_a_jour(electeur_id, fokontany_id, donnees)
+    except Exception as e:
+        print(f"[FACE INDEX] ⚠️ Électeur {electeur_id} non indexé : {e}")
+
+
+def encodage_reference(electeur):
+    """Encodage stocké s'il correspond à la photo actuelle, sinon calculé (et stocké) à la volée.
+
+    None si la photo actuelle a déjà été analysée sans visage exploitable : inutile de la ré-encoder.
+    """
+    from .face_validation import bytes_vers_encodage
+
+    if electeur.face_encoding_image and electeur.face_encoding_image == electeur.image.name:
+        if electeur.face_encoding is None:
+            return None
+        return bytes_vers_encodage(electeur.face_encoding)
+    print(f"[FACE] Encodage de référence absent pour l'électeur {electeur.pk}, calcul à la volée")
+    encodage, _ = encoder_visage_electeur(electeur, via_pool=True)
+    return encodage
+
+
+def lancer_encodage_visage(electeur_id):
+    from .tasks import encoder_visage
+
+    try:
+        encoder_visage.delay(electeur_id)
+    except Exception as e:
+        # Broker indisponible : l'encodage sera fait au premier login ou par la commande encoder_visages
+        print(f"[FACE] ⚠️ Encodage de l'électeur {electeur_id} non planifié : {e}")
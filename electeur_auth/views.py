@@ -2,7 +2,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 
-from .serializers import StartAuthSerializer, FaceAuthSerializer, VerifyOTPSerializer
+from .serializers import StartAuthSerializer, FaceAuthSerializer, VerifyOTPSerializer, IdentifierVisageSerializer
 from .models import ElecteurAuth
 from .utils import cleanup_expired_auths
 
@@ -64,6 +64,17 @@ class VerifyOTPView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class IdentifierVisageView(APIView):
+    # Réservé aux agents authentifiés des bureaux de vote assistés
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        serializer = IdentifierVisageSerializer(data=request.data)
+        if serializer.is_valid():
+            return Response(serializer.save(), status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
 # electeur_auth/views.py
 class DeleteAuthSessionView(APIView):
     def delete(self, request, id):   # <--- ici on met "id"
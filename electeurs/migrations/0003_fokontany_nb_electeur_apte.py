@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+def remplir_nb_electeur_apte(apps, schema_editor):
+    Fokontany = apps.get_model('electeurs', 'Fokontany')
+    Electeur = apps.get_model('electeurs', 'Electeur')
+    comptes = (
+        Electeur.objects.filter(is_apte_vote=True)
+        .values('fokontany_id')
+        .annotate(total=models.Count('id'))
+    )
+    for row in comptes:
+        Fokontany.objects.filter(id_fokontany=row['fokontany_id']).update(nb_electeur_apte=row['total'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electeurs', '0002_electeur_is_apte_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fokontany',
+            name='nb_electeur_apte',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(remplir_nb_electeur_apte, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electeurs', '0003_fokontany_nb_electeur_apte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='electeur',
+            name='face_encoding',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='electeur',
+            name='face_encoding_image',
+            field=models.CharField(blank=True, default='', editable=False, max_length=255),
+        ),
+    ]
@@ -35,6 +35,8 @@ class Fokontany(models.Model):
     id_fokontany = models.AutoField(primary_key=True)
     nom_fokontany = models.CharField(max_length=100)
     nb_electeur_inscrit = models.PositiveIntegerField(default=0)
+    # 🆕 Électeurs aptes à voter (dénominateur du taux de participation)
+    nb_electeur_apte = models.PositiveIntegerField(default=0)
     commune = models.ForeignKey(Commune, on_delete=models.CASCADE, related_name='fokontanys')
 
     class Meta:
@@ -51,6 +53,11 @@ class Fokontany(models.Model):
         self.nb_electeur_inscrit = models.F('nb_electeur_inscrit') - 1
         self.save(update_fields=['nb_electeur_inscrit'])
 
+    @staticmethod
+    def total_electeurs_aptes():
+        """Somme des compteurs par fokontany (pas de COUNT sur la table Electeur)."""
+        return Fokontany.objects.aggregate(total=models.Sum('nb_electeur_apte'))['total'] or 0
+
 
 
 class Electeur(models.Model):
@@ -74,6 +81,11 @@ class Electeur(models.Model):
     # 🆕 Champ pour savoir si l’électeur est apte à voter
     is_apte_vote = models.BooleanField(default=False)
 
+    # Encodage facial 128-d de `image` (float32, 512 octets), calculé une seule fois à l’upload ;
+    # face_encoding_image = fichier encodé, pour détecter une photo remplacée depuis
+    face_encoding = models.BinaryField(null=True, blank=True, editable=False)
+    face_encoding_image = models.CharField(max_length=255, blank=True, default='', editable=False)
+
     def __str__(self):
         return f"{self.nom_electeur} {self.prenom_electeur}"
 
@@ -85,6 +97,9 @@ class Electeur(models.Model):
 
     def save(self, *args, **kwargs):
         is_new = self._state.adding
+        ancien = None
+        if not is_new:
+            ancien = Electeur.objects.filter(pk=self.pk).values('fokontany_id', 'is_apte_vote').first()
 
         # 🆕 Au moment de la création, définir automatiquement is_apte_vote selon l’âge
         if is_new:
@@ -96,15 +111,28 @@ class Electeur(models.Model):
         super().save(*args, **kwargs)
 
         if is_new:
-            Fokontany.objects.filter(id_fokontany=self.fokontany.id_fokontany).update(
-                nb_electeur_inscrit=models.F('nb_electeur_inscrit') + 1
+            Fokontany.objects.filter(id_fokontany=self.fokontany_id).update(
+                nb_electeur_inscrit=models.F('nb_electeur_inscrit') + 1,
+                nb_electeur_apte=models.F('nb_electeur_apte') + int(self.is_apte_vote),
+            )
+        elif ancien and (ancien['fokontany_id'], ancien['is_apte_vote']) != (self.fokontany_id, self.is_apte_vote):
+            # Changement de fokontany ou d’aptitude : on déplace les compteurs
+            Fokontany.objects.filter(id_fokontany=ancien['fokontany_id']).update(
+                nb_electeur_inscrit=models.F('nb_electeur_inscrit') - 1,
+                nb_electeur_apte=models.F('nb_electeur_apte') - int(ancien['is_apte_vote']),
+            )
+            Fokontany.objects.filter(id_fokontany=self.fokontany_id).update(
+                nb_electeur_inscrit=models.F('nb_electeur_inscrit') + 1,
+                nb_electeur_apte=models.F('nb_electeur_apte') + int(self.is_apte_vote),
             )
 
     def delete(self, *args, **kwargs):
-        fokontany_id = self.fokontany.id_fokontany
+        fokontany_id = self.fokontany_id
+        etait_apte = self.is_apte_vote
         super().delete(*args, **kwargs)
         Fokontany.objects.filter(id_fokontany=fokontany_id).update(
-            nb_electeur_inscrit=models.F('nb_electeur_inscrit') - 1
+            nb_electeur_inscrit=models.F('nb_electeur_inscrit') - 1,
+            nb_electeur_apte=models.F('nb_electeur_apte') - int(etait_apte),
         )
 
 
@@ -28,4 +28,4 @@ class FokontanySerializer(serializers.ModelSerializer):
 class ElecteurSerializer(serializers.ModelSerializer):
     class Meta:
         model = Electeur
-        fields = '__all__'
+        exclude = ['face_encoding']
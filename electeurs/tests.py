@@ -1,3 +1,63 @@
+from datetime import date
+
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Region, District, Commune, Fokontany, Electeur
+
+
+class CompteursFokontanyTests(TestCase):
+    def setUp(self):
+        region = Region.objects.create(nom_region="Analamanga")
+        district = District.objects.create(nom_district="Antananarivo", region=region)
+        commune = Commune.objects.create(nom_commune="Antananarivo I", district=district)
+        self.isotry = Fokontany.objects.create(nom_fokontany="Isotry", commune=commune)
+        self.andohalo = Fokontany.objects.create(nom_fokontany="Andohalo", commune=commune)
+
+    def creer_electeur(self, i, fokontany, naissance=date(1990, 1, 1)):
+        return Electeur.objects.create(
+            nom_electeur=f"Rabe{i}", prenom_electeur="Hery", dateNaissance=naissance,
+            lieuNaissance="Antananarivo", numCIN=f"{i:012d}", adresse="Lot test", profession="Test",
+            email=f"electeur{i}@example.mg", numTel=f"03{i:08d}", fokontany=fokontany,
+        )
+
+    def compteurs(self, fokontany):
+        fokontany.refresh_from_db()
+        return fokontany.nb_electeur_inscrit, fokontany.nb_electeur_apte
+
+    def assertCompteursExacts(self):
+        # Les compteurs incrémentaux doivent rester égaux à un COUNT sur la table Electeur
+        for fokontany in Fokontany.objects.all():
+            electeurs = Electeur.objects.filter(fokontany=fokontany)
+            self.assertEqual(self.compteurs(fokontany), (electeurs.count(), electeurs.filter(is_apte_vote=True).count()))
+        self.assertEqual(Fokontany.total_electeurs_aptes(), Electeur.objects.filter(is_apte_vote=True).count())
+
+    def test_creation_compte_les_aptes_seulement(self):
+        self.creer_electeur(1, self.isotry)
+        self.creer_electeur(2, self.isotry, naissance=date.today().replace(year=date.today().year - 10))
+        self.assertEqual(self.compteurs(self.isotry), (2, 1))
+        self.assertCompteursExacts()
+
+    def test_changement_de_fokontany_et_d_aptitude(self):
+        electeur = self.creer_electeur(1, self.isotry)
+        mineur = self.creer_electeur(2, self.isotry, naissance=date.today().replace(year=date.today().year - 10))
+
+        electeur.fokontany = self.andohalo
+        electeur.save()
+        self.assertEqual((self.compteurs(self.isotry), self.compteurs(self.andohalo)), ((1, 0), (1, 1)))
+
+        mineur.is_apte_vote = True
+        mineur.save()
+        self.assertEqual(self.compteurs(self.isotry), (1, 1))
+
+        # Sauvegarde sans changement : compteurs inchangés
+        mineur.profession = "Étudiant"
+        mineur.save()
+        self.assertCompteursExacts()
+
+    def test_suppression(self):
+        electeur = self.creer_electeur(1, self.isotry)
+        self.creer_electeur(2, self.andohalo)
+        electeur.delete()
+        self.assertEqual(self.compteurs(self.isotry), (0, 0))
+        self.assertEqual(Fokontany.total_electeurs_aptes(), 1)
+        self.assertCompteursExacts()
@@ -4,7 +4,6 @@ from .serializers import *
 from django_filters.rest_framework import DjangoFilterBackend
 from datetime import datetime
 
-import pandas as pd
 from django.http import JsonResponse
 from rest_framework.decorators import api_view, parser_classes
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -44,7 +43,8 @@ class ElecteurViewSet(viewsets.ModelViewSet):
     ]
 
     def get_queryset(self):
-        queryset = Electeur.objects.all()
+        # L’encodage facial n’est jamais renvoyé par l’API : inutile de le charger
+        queryset = Electeur.objects.defer('face_encoding')
 
         region_id = self.request.query_params.get('region')
         district_id = self.request.query_params.get('district')
@@ -79,6 +79,8 @@ def preview_electeurs(request):
         print("⚠️ Aucun fichier reçu")
         return JsonResponse({"error": "Aucun fichier envoyé"}, status=400)
 
+    import pandas as pd  # import lourd, seulement pour l'aperçu d'import
+
     try:
         print(f"📂 Fichier reçu : {file.name}")
 
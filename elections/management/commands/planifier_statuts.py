@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = "Bascule le statut des élections à dateDebut / dateFin (une fois, ou en boucle avec --boucle)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true', help="Tourner en continu jusqu'à interruption.")
+        parser.add_argument('--intervalle', type=float, default=60,
+                            help="Attente max entre deux vérifications (secondes), pour voir les nouvelles élections.")
+
+    def handle(self, *args, **options):
+        while True:
+            nb = Election.appliquer_transitions_statut()
+            if nb:
+                self.stdout.write(f"[{timezone.now():%d/%m/%Y %H:%M:%S}] {nb} élection(s) basculée(s)")
+            if not options['boucle']:
+                return
+
+            # Dormir jusqu'à la prochaine bascule connue, sans dépasser l'intervalle
+            attente = options['intervalle']
+            prochaine = Election.prochaine_transition()
+            if prochaine is not None:
+                attente = min(attente, max((prochaine - timezone.now()).total_seconds(), 0))
+            time.sleep(attente)
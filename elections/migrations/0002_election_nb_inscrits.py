@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:58
+
+from django.db import migrations, models
+
+
+def figer_nb_inscrits(apps, schema_editor):
+    # Les élections déjà ouvertes reçoivent le nombre actuel d’électeurs aptes
+    Election = apps.get_model('elections', 'Election')
+    Fokontany = apps.get_model('electeurs', 'Fokontany')
+    total = Fokontany.objects.aggregate(total=models.Sum('nb_electeur_apte'))['total'] or 0
+    Election.objects.filter(status__in=['En cours', 'Terminée']).update(nb_inscrits=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0001_initial'),
+        ('electeurs', '0003_fokontany_nb_electeur_apte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='election',
+            name='nb_inscrits',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(figer_nb_inscrits, migrations.RunPython.noop),
+    ]
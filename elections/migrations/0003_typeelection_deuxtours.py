@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_election_nb_inscrits'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='typeelection',
+            name='deuxTours',
+            field=models.BooleanField(default=False),
+        ),
+    ]
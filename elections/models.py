@@ -1,10 +1,13 @@
 from django.db import models
+from django.db.models import Q, Min
 from django.utils import timezone
-from electeurs.models import Electeur  # on suppose que l'app s'appelle electeurs
+from electeurs.models import Electeur, Fokontany  # on suppose que l'app s'appelle electeurs
 
 class TypeElection(models.Model):
     id_type_election = models.AutoField(primary_key=True)
     titre = models.CharField(max_length=100, unique=True)
+    # Scrutin à deux tours : sans majorité absolue au premier tour, la finalisation attend le second
+    deuxTours = models.BooleanField(default=False)
 
     def __str__(self):
         return self.titre
@@ -26,6 +29,8 @@ class Election(models.Model):
     tourActuel = models.PositiveIntegerField(default=1, editable=False)
     seuilMajorite = models.PositiveIntegerField(default=50, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='En préparation')
+    # Nombre d’électeurs aptes figé à l’ouverture (dénominateur du taux de participation)
+    nb_inscrits = models.PositiveIntegerField(null=True, blank=True, editable=False)
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
@@ -37,8 +42,47 @@ class Election(models.Model):
         if self.status != "Annulée":
             self.update_status()
 
+        if self.status == 'En cours' and self.nb_inscrits is None:
+            self.nb_inscrits = Fokontany.total_electeurs_aptes()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'nb_inscrits' not in update_fields:
+                kwargs['update_fields'] = list(update_fields) + ['nb_inscrits']
+
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def appliquer_transitions_statut(now=None):
+        """Bascule les élections dont dateDebut / dateFin est atteinte.
+
+        Seules les élections concernées sont chargées ; save() recalcule le statut
+        et déclenche les signaux (gel de nb_inscrits, finalisation).
+        """
+        now = now or timezone.now()
+        a_basculer = Election.objects.filter(
+            Q(status='En préparation', dateDebut__lte=now) | Q(status='En cours', dateFin__lte=now)
+        )
+        nb = 0
+        for election in a_basculer:
+            election.save(update_fields=['status'])
+            nb += 1
+        return nb
+
+    @staticmethod
+    def prochaine_transition(now=None):
+        now = now or timezone.now()
+        dates = [
+            Election.objects.filter(status='En préparation', dateDebut__gt=now).aggregate(d=Min('dateDebut'))['d'],
+            Election.objects.filter(status='En cours', dateFin__gt=now).aggregate(d=Min('dateFin'))['d'],
+        ]
+        dates = [d for d in dates if d is not None]
+        return min(dates) if dates else None
+
+    def get_nb_inscrits(self):
+        # Avant l’ouverture, le dénominateur suit le registre en direct
+        if self.nb_inscrits is not None:
+            return self.nb_inscrits
+        return Fokontany.total_electeurs_aptes()
+
 
     def update_status(self):
         if self.status == "Annulée":
@@ -15,13 +15,12 @@ class ElectionSerializer(serializers.ModelSerializer):
             'dateFin',
             'tourActuel',
             'seuilMajorite',
+            'nb_inscrits',
             'status',  # ⬅️ REND LE STATUS NON MODIFIABLE
         ]
 
-    def to_representation(self, instance):
-        instance.update_status()
-        instance.save(update_fields=['status'])
-        return super().to_representation(instance)
+    # Le statut est basculé par le planificateur (elections.tasks / commande planifier_statuts) :
+    # la lecture ne fait plus d’UPDATE.
 
 class CandidatSerializer(serializers.ModelSerializer):
     class Meta:
@@ -0,0 +1,16 @@
+from datetime import timedelta
+
+from celery import shared_task
+from django.utils import timezone
+
+from .models import Election
+
+
+@shared_task
+def transitions_statut_elections():
+    nb = Election.appliquer_transitions_statut()
+    # Beat passe toutes les minutes ; une bascule plus proche est planifiée à l'heure exacte
+    prochaine = Election.prochaine_transition()
+    if prochaine is not None and prochaine - timezone.now() < timedelta(minutes=1):
+        transitions_statut_elections.apply_async(eta=prochaine)
+    return nb
@@ -1,3 +1,104 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from electeurs.models import Region, District, Commune, Fokontany, Electeur
+
+from .models import TypeElection, Election
+from .tasks import transitions_statut_elections
+
+
+class ElectionTestCase(TestCase):
+    def setUp(self):
+        region = Region.objects.create(nom_region="Analamanga")
+        district = District.objects.create(nom_district="Antananarivo", region=region)
+        commune = Commune.objects.create(nom_commune="Antananarivo I", district=district)
+        self.fokontany = Fokontany.objects.create(nom_fokontany="Isotry", commune=commune)
+        self.type_election = TypeElection.objects.create(titre="Présidentielle")
+
+    def creer_electeur(self, i):
+        return Electeur.objects.create(
+            nom_electeur=f"Rabe{i}", prenom_electeur="Hery", dateNaissance=date(1990, 1, 1),
+            lieuNaissance="Antananarivo", numCIN=f"{i:012d}", adresse="Lot test", profession="Test",
+            email=f"electeur{i}@example.mg", numTel=f"03{i:08d}", fokontany=self.fokontany,
+        )
+
+    def creer_election(self, debut):
+        return Election.objects.create(type_election=self.type_election, dateDebut=debut)
+
+
+class NbInscritsTests(ElectionTestCase):
+    def test_denominateur_fige_a_l_ouverture(self):
+        self.creer_electeur(1)
+        election = self.creer_election(timezone.now() + timedelta(hours=1))
+        self.assertIsNone(election.nb_inscrits)
+
+        # Avant l'ouverture, le dénominateur suit le registre
+        self.creer_electeur(2)
+        self.assertEqual(election.get_nb_inscrits(), 2)
+
+        Election.objects.filter(pk=election.pk).update(dateDebut=timezone.now() - timedelta(seconds=1))
+        Election.appliquer_transitions_statut()
+        election.refresh_from_db()
+        self.assertEqual((election.status, election.nb_inscrits), ("En cours", 2))
+
+        # Inscriptions pendant le scrutin : le dénominateur ne bouge plus
+        self.creer_electeur(3)
+        self.assertEqual(election.get_nb_inscrits(), 2)
+
+
+class TransitionsStatutTests(ElectionTestCase):
+    def test_bascule_seulement_les_elections_echues(self):
+        maintenant = timezone.now()
+        ouverte = self.creer_election(maintenant + timedelta(hours=1))
+        future = Election.objects.create(type_election=TypeElection.objects.create(titre="Municipale"),
+                                         dateDebut=maintenant + timedelta(days=3))
+        Election.objects.filter(pk=ouverte.pk).update(dateDebut=maintenant - timedelta(seconds=1))
+
+        self.assertEqual(Election.appliquer_transitions_statut(), 1)
+        self.assertEqual(Election.objects.get(pk=ouverte.pk).status, "En cours")
+        self.assertEqual(Election.objects.get(pk=future.pk).status, "En préparation")
+        self.assertEqual(Election.appliquer_transitions_statut(), 0)
+
+        # Prochaine bascule : la fin du scrutin ouvert, avant l'ouverture de l'autre élection
+        ouverte.refresh_from_db()
+        self.assertEqual(Election.prochaine_transition(), ouverte.dateFin)
+
+        Election.objects.filter(pk=ouverte.pk).update(dateFin=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Election.appliquer_transitions_statut(), 1)
+        self.assertEqual(Election.objects.get(pk=ouverte.pk).status, "Terminée")
+        self.assertEqual(Election.prochaine_transition(), future.dateDebut)
+
+    def test_lecture_ne_modifie_pas_le_statut(self):
+        election = self.creer_election(timezone.now() + timedelta(hours=1))
+        Election.objects.filter(pk=election.pk).update(dateDebut=timezone.now() - timedelta(seconds=1))
+
+        # COUNT de la pagination + page : aucune écriture
+        with self.assertNumQueries(2):
+            reponse = self.client.get(reverse("election-list"))
+        self.assertEqual(reponse.status_code, 200)
+        self.assertEqual(Election.objects.get(pk=election.pk).status, "En préparation")
+
+    def test_commande_planifier_statuts(self):
+        election = self.creer_election(timezone.now() + timedelta(hours=1))
+        Election.objects.filter(pk=election.pk).update(dateDebut=timezone.now() - timedelta(seconds=1))
+        sortie = StringIO()
+        call_command("planifier_statuts", stdout=sortie)
+        self.assertIn("1 élection(s) basculée(s)", sortie.getvalue())
+        self.assertEqual(Election.objects.get(pk=election.pk).status, "En cours")
+
+    def test_tache_planifie_la_bascule_proche_a_l_heure_exacte(self):
+        election = self.creer_election(timezone.now() + timedelta(seconds=30))
+        with mock.patch.object(transitions_statut_elections, "apply_async") as planifier:
+            self.assertEqual(transitions_statut_elections(), 0)
+        planifier.assert_called_once_with(eta=election.dateDebut)
 
-# Create your tests here.
+        Election.objects.filter(pk=election.pk).update(dateDebut=timezone.now() + timedelta(hours=1))
+        with mock.patch.object(transitions_statut_elections, "apply_async") as planifier:
+            transitions_statut_elections()
+        planifier.assert_not_called()
@@ -5,6 +5,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import status as drf_status
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 class TypeElectionViewSet(viewsets.ModelViewSet):
@@ -47,6 +48,35 @@ class ElectionViewSet(viewsets.ModelViewSet):
             "dateFin": election.dateFin,
         })
 
+    @action(detail=True, methods=['post'])
+    def second_tour(self, request, pk=None):
+        from vote.models import ouvrir_second_tour, SecondTourImpossible
+
+        election = self.get_object()
+        dates = {}
+        for champ in ('dateDebut', 'dateFin'):
+            valeur = request.data.get(champ)
+            if valeur:
+                dates[champ] = parse_datetime(valeur)
+                if dates[champ] is None:
+                    return Response({"error": f"{champ} invalide"}, status=drf_status.HTTP_400_BAD_REQUEST)
+                if timezone.is_naive(dates[champ]):
+                    dates[champ] = timezone.make_aware(dates[champ])
+
+        try:
+            qualifies = ouvrir_second_tour(election, dates.get('dateDebut'), dates.get('dateFin'))
+        except SecondTourImpossible as e:
+            return Response({"error": str(e)}, status=drf_status.HTTP_409_CONFLICT)
+
+        return Response({
+            "message": "Second tour ouvert",
+            "tourActuel": election.tourActuel,
+            "status": election.status,
+            "dateDebut": election.dateDebut,
+            "dateFin": election.dateFin,
+            "candidats_qualifies": qualifies,
+        })
+
 
 class CandidatViewSet(viewsets.ModelViewSet):
     queryset = Candidat.objects.all()
@@ -13,4 +13,18 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'i_fidy_back.settings')
 
-application = get_asgi_application()
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402  (après le setup Django)
+from vote.routing import websocket_urlpatterns  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, "FACE_PRECHAUFFAGE", False):
+    # Workers dédiés à la reconnaissance faciale : modèles dlib chargés avant le premier client
+    from electeur_auth.face_pool import demarrer  # noqa: E402
+    demarrer()
+
+application = ProtocolTypeRouter({
+    "http": django_asgi_app,
+    "websocket": URLRouter(websocket_urlpatterns),
+})
@@ -172,7 +172,7 @@ CSRF_COOKIE_SECURE = True
 
 
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", os.path.join(BASE_DIR, 'media'))
 
 
 
@@ -186,3 +186,104 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# Décompte des votes : "shards" (compteurs répartis, sans verrou) ou "verrou" (ancien décompte sérialisé)
+VOTE_TALLY_STRATEGY = os.environ.get("VOTE_TALLY_STRATEGY", "shards")
+VOTE_TALLY_SHARDS = int(os.environ.get("VOTE_TALLY_SHARDS", 16))
+
+# Ingestion asynchrone : le vote est inséré immédiatement, le décompte est appliqué par un worker Celery
+VOTE_INGESTION_ASYNC = env.bool("VOTE_INGESTION_ASYNC", default=False)
+
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_TASK_ALWAYS_EAGER = env.bool("CELERY_TASK_ALWAYS_EAGER", default=False)
+CELERY_TASK_IGNORE_RESULT = True
+CELERY_BEAT_SCHEDULE = {
+    # Filet de sécurité : décomptes dont la tâche a été perdue
+    "votes-decomptes-en-attente": {
+        "task": "vote.tasks.appliquer_decomptes_en_attente",
+        "schedule": 30.0,
+    },
+    "finalisations-en-attente": {
+        "task": "vote.tasks.finaliser_elections_en_attente",
+        "schedule": 60.0,
+    },
+    "transitions-statut-elections": {
+        "task": "elections.tasks.transitions_statut_elections",
+        "schedule": 60.0,
+    },
+}
+
+# Un job de finalisation "running" bat toutes les FINALISATION_JOB_HEARTBEAT secondes ;
+# sans signe de vie depuis FINALISATION_JOB_TIMEOUT secondes, il est considéré comme abandonné
+FINALISATION_JOB_HEARTBEAT = int(os.environ.get("FINALISATION_JOB_HEARTBEAT", 30))
+FINALISATION_JOB_TIMEOUT = int(os.environ.get("FINALISATION_JOB_TIMEOUT", 300))
+
+# Flux WebSocket des résultats : au plus un message par élection et par intervalle (secondes)
+RESULTATS_PUSH_INTERVAL = float(os.environ.get("RESULTATS_PUSH_INTERVAL", 2))
+
+# Cache des résultats : Redis si REDIS_URL est défini (partagé entre workers), sinon mémoire locale
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# Durée de vie max d'une version en cache (borne la dérive entre workers avec le cache local)
+RESULTATS_CACHE_TIMEOUT = int(os.environ.get("RESULTATS_CACHE_TIMEOUT", 60))
+
+# Largeur des tranches de la série de participation (minutes)
+PARTICIPATION_TRANCHE_MINUTES = int(os.environ.get("PARTICIPATION_TRANCHE_MINUTES", 1))
+
+# Archivage puis purge des votes à la finalisation : taille des lots lus et supprimés
+ARCHIVE_VOTES_LOT = int(os.environ.get("ARCHIVE_VOTES_LOT", 10000))
+# Dossier privé des archives de bulletins : surtout pas sous MEDIA_ROOT, servi publiquement
+ARCHIVE_VOTES_DIR = os.environ.get("ARCHIVE_VOTES_DIR", os.path.join(BASE_DIR, "archives_votes"))
+
+# Bitmap des votants (has-voted / participation en O(1)) : Redis partagé si défini, sinon mémoire par processus
+VOTE_BITMAP_REDIS_URL = os.environ.get("VOTE_BITMAP_REDIS_URL", os.environ.get("REDIS_URL", ""))
+
+# Reconnaissance faciale exécutée dans un pool de processus dédié (0 = dans le worker web, sans pool)
+FACE_POOL_WORKERS = int(os.environ.get("FACE_POOL_WORKERS", os.cpu_count() or 1))
+# Demandes en attente acceptées au-delà des workers occupés ; au-delà : 503 + Retry-After
+FACE_POOL_QUEUE = int(os.environ.get("FACE_POOL_QUEUE", 8))
+FACE_POOL_TIMEOUT = float(os.environ.get("FACE_POOL_TIMEOUT", 10))
+FACE_POOL_RETRY_AFTER = int(os.environ.get("FACE_POOL_RETRY_AFTER", 2))
+
+# Index d'identification faciale 1:N (un .npy par fokontany, ouvert en mmap)
+FACE_INDEX_DIR = os.environ.get("FACE_INDEX_DIR", os.path.join(BASE_DIR, "face_index"))
+# Distance en dessous de laquelle un candidat identifié est signalé comme correspondant
+FACE_IDENTIFICATION_SEUIL = float(os.environ.get("FACE_IDENTIFICATION_SEUIL", 0.6))
+
+# Traces détaillées de la comparaison faciale (dessin des landmarks, similarité cosinus) : désactivées en production
+FACE_DEBUG = env.bool("FACE_DEBUG", default=False)
+# Chemin pointé d'une fonction (operation, {étape: ms}) recevant les durées de chaque étape du moteur facial
+FACE_METRICS_HOOK = os.environ.get("FACE_METRICS_HOOK", "")
+# Préchargement des modèles dlib (et de l'index d'identification) au démarrage du worker web
+FACE_PRECHAUFFAGE = env.bool("FACE_PRECHAUFFAGE", default=False)
+
+# Contrôle qualité des captures avant l'encodage dlib (rejet en quelques ms, 400 avec un code)
+FACE_QUALITE_RESOLUTION_MIN = int(os.environ.get("FACE_QUALITE_RESOLUTION_MIN", 240))  # plus petit côté, en px
+FACE_QUALITE_LARGEUR = int(os.environ.get("FACE_QUALITE_LARGEUR", 320))  # largeur de l'image réduite analysée
+FACE_QUALITE_LUMINOSITE_MIN = int(os.environ.get("FACE_QUALITE_LUMINOSITE_MIN", 40))
+FACE_QUALITE_LUMINOSITE_MAX = int(os.environ.get("FACE_QUALITE_LUMINOSITE_MAX", 220))
+FACE_QUALITE_NETTETE_MIN = float(os.environ.get("FACE_QUALITE_NETTETE_MIN", 60))  # variance du laplacien
+
+# Détection des visages : sur une copie réduite (0 = à la résolution de travail), modèle hog (CPU) ou cnn (GPU)
+FACE_DETECTION_WIDTH = int(os.environ.get("FACE_DETECTION_WIDTH", 250))
+FACE_DETECTION_MODEL = os.environ.get("FACE_DETECTION_MODEL", "hog")
+FACE_DETECTION_UPSAMPLE = int(os.environ.get("FACE_DETECTION_UPSAMPLE", 1))
+# Résolution des landmarks et de l'encodage : la changer rend les encodages stockés incomparables
+FACE_WORKING_WIDTH = int(os.environ.get("FACE_WORKING_WIDTH", 500))
+
+# Slots par (région, tranche) du compteur de participation : borne la contention d'une région à la même minute
+PARTICIPATION_TRANCHE_SHARDS = int(os.environ.get("PARTICIPATION_TRANCHE_SHARDS", 8))
+# Slots par (candidat, fokontany) des résultats géographiques
+RESULTATS_FOKONTANY_SHARDS = int(os.environ.get("RESULTATS_FOKONTANY_SHARDS", 4))
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'i_fidy_back.settings')
 
 application = get_wsgi_application()
+
+from django.conf import settings  # noqa: E402  (après le setup Django)
+
+if getattr(settings, "FACE_PRECHAUFFAGE", False):
+    # Workers dédiés à la reconnaissance faciale : modèles dlib chargés avant le premier client
+    from electeur_auth.face_pool import demarrer  # noqa: E402
+    demarrer()
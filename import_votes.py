@@ -1,27 +1,29 @@
 import os
 import django
 import csv
+import argparse
 from django.db import transaction
 
 # Setup Django
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'i_fidy_back.settings')
 django.setup()
 
-from vote.models import Vote
+from vote.models import Vote, ResultatFinale, recalculer_resultats_depuis_votes
 from elections.models import Election, Candidat
 from electeurs.models import Electeur
 
 
 DATA_PATH = os.path.join(os.path.dirname(__file__), 'data')
+RAPPORT_COLONNES = ['ligne', 'election_id', 'electeur_id', 'candidat_id', 'tour', 'erreur']
 
 
-def import_votes():
+def import_votes(filename=None):
     """
     Importer un fichier CSV contenant des votes.
     Colonnes attendues :
         election_id, electeur_id, candidat_id, tour
     """
-    filename = os.path.join(DATA_PATH, 'votes.csv')
+    filename = filename or os.path.join(DATA_PATH, 'votes.csv')
     with open(filename, newline='', encoding='utf-8-sig') as file:
         reader = csv.DictReader(file)
         print("👉 Champs CSV détectés (votes):", reader.fieldnames)
@@ -47,12 +49,116 @@ def import_votes():
                 print(f"❌ Erreur ligne {row}: {e}")
 
 
+def import_votes_bulk(filename=None, rapport=None, batch_size=5000):
+    """
+    Import en masse : résolution des clés en mémoire, bulk_create par lots
+    (pas de signal post_save par ligne) puis un recalcul des résultats par
+    (élection, tour). Les lignes rejetées sont écrites dans le rapport CSV.
+    Seules les élections closes et pas encore finalisées acceptent un import :
+    le recalcul ne peut pas tourner pendant que des votes arrivent en direct.
+    """
+    filename = filename or os.path.join(DATA_PATH, 'votes.csv')
+    rapport = rapport or os.path.join(DATA_PATH, 'votes_import_erreurs.csv')
+
+    elections = {e.id_election: e for e in Election.objects.all()}
+    finalisees = set(ResultatFinale.objects.values_list('election_id', flat=True))
+    candidats = {
+        id_candidat: (election_id, qualifie)
+        for id_candidat, election_id, qualifie in Candidat.objects.values_list('id_candidat', 'election_id', 'estQualifieTour2')
+    }
+    electeurs = set(Electeur.objects.values_list('id', flat=True))
+    deja_votes = set(Vote.objects.values_list('election_id', 'electeur_id', 'tour'))
+
+    lot = []
+    touches = set()
+    nb_importes = nb_erreurs = 0
+
+    def flush():
+        with transaction.atomic():
+            Vote.objects.bulk_create(lot, batch_size=batch_size)
+        lot.clear()
+
+    with open(filename, newline='', encoding='utf-8-sig') as file, \
+            open(rapport, 'w', newline='', encoding='utf-8') as sortie:
+        reader = csv.DictReader(file)
+        erreurs = csv.DictWriter(sortie, fieldnames=RAPPORT_COLONNES, extrasaction='ignore')
+        erreurs.writeheader()
+        print("👉 Champs CSV détectés (votes):", reader.fieldnames)
+
+        for numero, row in enumerate(reader, start=2):
+            row = {k.strip(): (v or '').strip() for k, v in row.items()}
+            try:
+                election_id = int(row['election_id'])
+                electeur_id = int(row['electeur_id'])
+                candidat_id = int(row['candidat_id'])
+                tour = int(row['tour'])
+            except (KeyError, ValueError):
+                erreur = "Valeur manquante ou non numérique"
+            else:
+                election = elections.get(election_id)
+                if election is None:
+                    erreur = "Élection introuvable"
+                elif election.status == 'En cours':
+                    erreur = "Élection en cours : import possible après la clôture du scrutin"
+                elif election_id in finalisees:
+                    erreur = "Résultat final déjà établi pour cette élection"
+                elif electeur_id not in electeurs:
+                    erreur = "Électeur introuvable"
+                elif candidats.get(candidat_id, (None,))[0] != election_id:
+                    erreur = "Candidat introuvable ou hors de cette élection"
+                elif tour != election.tourActuel:
+                    erreur = "Le vote doit être au tour actuel de l’élection"
+                elif tour > 1 and not candidats[candidat_id][1]:
+                    erreur = "Candidat non qualifié pour le second tour"
+                elif (election_id, electeur_id, tour) in deja_votes:
+                    erreur = "Vote déjà enregistré pour cet électeur et ce tour"
+                else:
+                    erreur = None
+
+            if erreur:
+                erreurs.writerow({**row, 'ligne': numero, 'erreur': erreur})
+                nb_erreurs += 1
+                continue
+
+            deja_votes.add((election_id, electeur_id, tour))
+            touches.add((election_id, tour))
+            lot.append(Vote(
+                election_id=election_id,
+                electeur_id=electeur_id,
+                candidat_id=candidat_id,
+                tour=tour,
+                encrypted_candidat=f"enc:{candidat_id}",
+            ))
+            nb_importes += 1
+            if len(lot) >= batch_size:
+                flush()
+
+        if lot:
+            flush()
+
+    for election_id, tour in sorted(touches):
+        recalculer_resultats_depuis_votes(elections[election_id], tour)
+
+    print(f"✅ {nb_importes} votes importés, {nb_erreurs} rejetés (rapport : {rapport})")
+
+
 @transaction.atomic
-def run_import():
+def run_import(filename=None):
     print("📥 Importation des votes en cours...")
-    import_votes()
+    import_votes(filename)
     print("✅ Importation des votes terminée.")
 
 
 if __name__ == '__main__':
-    run_import()
+    parser = argparse.ArgumentParser(description="Importer des votes depuis un CSV.")
+    parser.add_argument('--fichier', help="CSV à importer (défaut : data/votes.csv)")
+    parser.add_argument('--bulk', action='store_true', help="Import en masse (bulk_create + recalcul unique)")
+    parser.add_argument('--rapport', help="CSV des lignes rejetées en mode bulk (défaut : data/votes_import_erreurs.csv)")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    args = parser.parse_args()
+
+    if args.bulk:
+        print("📥 Importation des votes en masse...")
+        import_votes_bulk(args.fichier, args.rapport, args.batch_size)
+    else:
+        run_import(args.fichier)
@@ -0,0 +1,14 @@
+#!/usr/bin/env bash
+# Démarrage du conteneur : web (gunicorn + uvicorn) et, si CELERY_EMBARQUE=True, worker Celery avec beat.
+# Les deux processus partagent le même disque (photos, archives des bulletins, index facial).
+# Si l'un des deux s'arrête, le conteneur s'arrête et la plateforme le relance.
+set -o errexit
+
+if [ "${CELERY_EMBARQUE:-False}" = "True" ]; then
+    celery -A i_fidy_back worker -B --loglevel=info --concurrency="${CELERY_CONCURRENCY:-2}" &
+fi
+
+gunicorn i_fidy_back.asgi:application -k uvicorn.workers.UvicornWorker --bind "0.0.0.0:${PORT:-8000}" --log-file - &
+
+wait -n
+exit $?
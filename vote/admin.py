@@ -1,6 +1,10 @@
 from django.contrib import admin
-from .models import Vote, Resultat, ResultatFinale
+from .models import Vote, Resultat, ResultatShard, ResultatFokontany, ParticipationTranche, ResultatFinale, FinalisationJob
 
 admin.site.register(Vote)
 admin.site.register(Resultat)
+admin.site.register(ResultatShard)
+admin.site.register(ResultatFokontany)
+admin.site.register(ParticipationTranche)
 admin.site.register(ResultatFinale)
+admin.site.register(FinalisationJob)
@@ -0,0 +1,149 @@
+import json
+import os
+import shutil
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+# Archive des bulletins d'une élection : une colonne .npy par champ, en types compacts
+# (~17 octets par vote) et lisible par memory-mapping. Aucun identifiant d'électeur n'y figure.
+# Stockée hors de MEDIA_ROOT (ARCHIVE_VOTES_DIR) : elle n'est lisible que par AuditArchiveView.
+# Heure de vote tronquée à l'heure et lignes triées par (tour, fokontany, candidat) : ni
+# l'horodatage ni l'ordre d'insertion ne permettent de relier un bulletin à un électeur.
+COLONNES = {
+    "candidat": np.uint32,
+    "tour": np.uint8,
+    "fokontany": np.uint32,
+    "date_vote": "datetime64[h]",
+}
+
+
+def _taille_lot():
+    return getattr(settings, "ARCHIVE_VOTES_LOT", 10000)
+
+
+def _racine():
+    return getattr(settings, "ARCHIVE_VOTES_DIR", None) or os.path.join(settings.BASE_DIR, "archives_votes")
+
+
+def chemin_archive(election_id):
+    return f"election_{election_id}"
+
+
+def archiver_votes(election, taille_lot=None):
+    """Écrit les votes de l'élection dans l'archive, par lots ordonnés sur la clé primaire.
+
+    Renvoie le chemin de l'archive relatif à ARCHIVE_VOTES_DIR.
+    """
+    from .models import Vote
+
+    taille_lot = taille_lot or _taille_lot()
+    votes = Vote.objects.filter(election=election)
+    nb_votes = votes.count()
+
+    relatif = chemin_archive(election.pk)
+    dossier = os.path.join(_racine(), relatif)
+    # Dossier de travail propre à cet appel : deux finalisations concurrentes ne s'écrasent pas
+    temporaire = f"{dossier}.tmp-{uuid.uuid4().hex[:12]}"
+    os.makedirs(temporaire)
+
+    colonnes = {
+        nom: np.lib.format.open_memmap(os.path.join(temporaire, f"{nom}.npy"), mode="w+", dtype=dtype, shape=(nb_votes,))
+        for nom, dtype in COLONNES.items()
+    }
+    position, dernier_id = 0, 0
+    while position < nb_votes:
+        lot = list(
+            votes.filter(pk__gt=dernier_id).order_by("pk")
+            .values_list("pk", "candidat_id", "tour", "electeur__fokontany_id", "date_vote")[:min(taille_lot, nb_votes - position)]
+        )
+        if not lot:
+            break
+        ids, candidats, tours, fokontanys, dates = zip(*lot)
+        fin = position + len(lot)
+        colonnes["candidat"][position:fin] = candidats
+        colonnes["tour"][position:fin] = tours
+        colonnes["fokontany"][position:fin] = fokontanys
+        colonnes["date_vote"][position:fin] = np.array([int(d.timestamp()) // 3600 for d in dates], dtype="int64")
+        position, dernier_id = fin, ids[-1]
+
+    # Tri final : l'ordre des lignes ne reflète plus l'ordre des votes
+    ordre = np.lexsort((colonnes["candidat"][:position], colonnes["fokontany"][:position], colonnes["tour"][:position]))
+    for colonne in colonnes.values():
+        colonne[:position] = colonne[:position][ordre]
+        colonne.flush()
+    del colonnes, ordre
+
+    with open(os.path.join(temporaire, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"election": election.pk, "nb_votes": position, "date_archivage": timezone.now().isoformat()}, f)
+
+    try:
+        shutil.rmtree(dossier, ignore_errors=True)
+        os.replace(temporaire, dossier)
+    except OSError:
+        # Archive déjà remplacée par une autre tentative entre-temps : même contenu, on garde la sienne
+        shutil.rmtree(temporaire, ignore_errors=True)
+        if not os.path.isdir(dossier):
+            raise
+    return relatif
+
+
+def purger_votes(election, taille_lot=None):
+    """Supprime les votes par lots bornés (une transaction courte par lot)."""
+    from .models import Vote
+
+    taille_lot = taille_lot or _taille_lot()
+    total = 0
+    while True:
+        ids = list(Vote.objects.filter(election=election).order_by("pk").values_list("pk", flat=True)[:taille_lot])
+        if not ids:
+            return total
+        with transaction.atomic():
+            Vote.objects.filter(pk__in=ids).delete()
+        total += len(ids)
+
+
+def charger_archive(relatif):
+    dossier = os.path.join(_racine(), relatif)
+    with open(os.path.join(dossier, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+    archive = {nom: np.load(os.path.join(dossier, f"{nom}.npy"), mmap_mode="r") for nom in COLONNES}
+    n = meta["nb_votes"]
+    return {nom: colonne[:n] for nom, colonne in archive.items()}
+
+
+def _masque_tour(archive, tour):
+    if tour is None:
+        return slice(None)
+    return archive["tour"] == tour
+
+
+def audit_par_candidat(archive, tour=None):
+    candidats, comptes = np.unique(archive["candidat"][_masque_tour(archive, tour)], return_counts=True)
+    return [{"candidat": int(c), "nb_votes": int(n)} for c, n in zip(candidats, comptes)]
+
+
+def audit_par_fokontany(archive, tour=None):
+    masque = _masque_tour(archive, tour)
+    # Clé composite (fokontany, candidat) sur 64 bits pour un seul np.unique
+    cles = (archive["fokontany"][masque].astype(np.uint64) << np.uint64(32)) | archive["candidat"][masque]
+    valeurs, comptes = np.unique(cles, return_counts=True)
+    return [
+        {"fokontany": int(v >> np.uint64(32)), "candidat": int(v & np.uint64(0xFFFFFFFF)), "nb_votes": int(n)}
+        for v, n in zip(valeurs, comptes)
+    ]
+
+
+def audit_par_heure(archive, tour=None):
+    heures, comptes = np.unique(archive["date_vote"][_masque_tour(archive, tour)].astype("datetime64[h]"), return_counts=True)
+    return [{"heure": f"{h}:00Z", "nb_votes": int(n)} for h, n in zip(heures, comptes)]
+
+
+AUDITS = {
+    "candidat": audit_par_candidat,
+    "fokontany": audit_par_fokontany,
+    "heure": audit_par_heure,
+}
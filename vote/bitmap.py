@@ -0,0 +1,163 @@
+import threading
+
+import numpy as np
+from django.conf import settings
+
+# Bitmap des votants par (élection, tour) : un bit par Electeur.id (bit 0 = bit de poids fort
+# du premier octet, même convention que SETBIT/GETBIT de Redis).
+#  - Redis (VOTE_BITMAP_REDIS_URL) : partagé entre workers, fait foi -> a_vote() et nb_votants() en O(1).
+#  - Mémoire locale : propre au processus ; un bit à 1 fait foi, un bit à 0 est confirmé en base.
+#    Elle ne voit pas les votes des autres processus : nb_votants() compte alors en base.
+# Une fois les votes archivés et purgés, le nombre de votants vient des résultats consolidés.
+
+
+def construire_bits(electeur_ids):
+    ids = np.fromiter(electeur_ids, dtype=np.int64)
+    if not len(ids):
+        return b""
+    presents = np.zeros(int(ids.max()) + 1, dtype=bool)
+    presents[ids] = True
+    return np.packbits(presents).tobytes()
+
+
+class BitmapMemoire:
+    autoritaire = False
+
+    def __init__(self):
+        self._bits = {}
+        # Clés reconstruites depuis la base : un bitmap seulement marqué ne compte que les votes de ce processus
+        self._prets = set()
+        self._verrou = threading.Lock()
+
+    def est_pret(self, cle):
+        return cle in self._prets
+
+    def marquer(self, cle, electeur_id):
+        octet = electeur_id >> 3
+        with self._verrou:
+            bits = self._bits.setdefault(cle, bytearray())
+            if octet >= len(bits):
+                bits.extend(bytes(octet + 1 - len(bits)))
+            bits[octet] |= 0x80 >> (electeur_id & 7)
+
+    def contient(self, cle, electeur_id):
+        bits = self._bits.get(cle, b"")
+        octet = electeur_id >> 3
+        return octet < len(bits) and bool(bits[octet] & (0x80 >> (electeur_id & 7)))
+
+    def compter(self, cle):
+        return int.from_bytes(self._bits.get(cle, b""), "big").bit_count()
+
+    def fusionner(self, cle, nouveaux):
+        # OU bit à bit : les votes marqués pendant la reconstruction ne sont pas perdus
+        with self._verrou:
+            bits = self._bits.setdefault(cle, bytearray())
+            if len(nouveaux) > len(bits):
+                bits.extend(bytes(len(nouveaux) - len(bits)))
+            fusion = np.frombuffer(bits, dtype=np.uint8)[:len(nouveaux)] | np.frombuffer(nouveaux, dtype=np.uint8)
+            bits[:len(nouveaux)] = fusion.tobytes()
+            self._prets.add(cle)
+
+
+class BitmapRedis:
+    autoritaire = True
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def est_pret(self, cle):
+        return bool(self.client.exists(f"{cle}:pret"))
+
+    def marquer(self, cle, electeur_id):
+        self.client.setbit(cle, electeur_id, 1)
+
+    def contient(self, cle, electeur_id):
+        return bool(self.client.getbit(cle, electeur_id))
+
+    def compter(self, cle):
+        return self.client.bitcount(cle)
+
+    def fusionner(self, cle, nouveaux):
+        temporaire = f"{cle}:reconstruction"
+        pipe = self.client.pipeline()
+        pipe.set(temporaire, nouveaux)
+        pipe.bitop("OR", cle, cle, temporaire)
+        pipe.delete(temporaire)
+        pipe.set(f"{cle}:pret", 1)
+        pipe.execute()
+
+
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        url = getattr(settings, "VOTE_BITMAP_REDIS_URL", "")
+        _backend = BitmapRedis(url) if url else BitmapMemoire()
+    return _backend
+
+
+def _cle(election_id, tour):
+    return f"votants:{election_id}:{tour}"
+
+
+def reconstruire(election_id, tour):
+    from .models import Vote
+
+    ids = Vote.objects.filter(election_id=election_id, tour=tour).values_list("electeur_id", flat=True)
+    backend().fusionner(_cle(election_id, tour), construire_bits(ids.iterator(chunk_size=10000)))
+
+
+def marquer(election_id, tour, electeur_id):
+    # Appelé après commit : le vote est enregistré, un bitmap indisponible ne doit pas le faire échouer.
+    # Un bit manquant n'autorise pas de second vote (contrainte unique en base).
+    try:
+        backend().marquer(_cle(election_id, tour), electeur_id)
+    except Exception as e:
+        print(f"[BITMAP] ⚠️ Électeur {electeur_id} non marqué (élection {election_id}, tour {tour}) : {e}")
+
+
+def a_vote(election_id, tour, electeur_id):
+    from .models import Vote
+
+    bitmap, cle = backend(), _cle(election_id, tour)
+    if not bitmap.est_pret(cle):
+        reconstruire(election_id, tour)
+    if bitmap.contient(cle, electeur_id):
+        return True
+    if bitmap.autoritaire:
+        return False
+    existe = Vote.objects.filter(election_id=election_id, tour=tour, electeur_id=electeur_id).exists()
+    if existe:
+        bitmap.marquer(cle, electeur_id)
+    return existe
+
+
+def _nb_votants_archives(election_id, tour):
+    from django.db.models import Max
+
+    from .models import Resultat, ResultatFinale
+
+    if not ResultatFinale.objects.filter(election_id=election_id).exclude(archive_votes="").exists():
+        return None
+    return Resultat.objects.filter(election_id=election_id, tour=tour).aggregate(
+        total=Max("total_votes_election")
+    )["total"] or 0
+
+
+def nb_votants(election_id, tour):
+    from .models import Vote
+
+    bitmap, cle = backend(), _cle(election_id, tour)
+    if bitmap.autoritaire and bitmap.est_pret(cle):
+        return bitmap.compter(cle)
+    archives = _nb_votants_archives(election_id, tour)
+    if archives is not None:
+        return archives
+    if not bitmap.autoritaire:
+        # Bitmap local : comptage sur l'index unique (élection, électeur, tour), sans charger les ids
+        return Vote.objects.filter(election_id=election_id, tour=tour).count()
+    reconstruire(election_id, tour)
+    return bitmap.compter(cle)
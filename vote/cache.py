@@ -0,0 +1,68 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+def _cle_version(election_id):
+    return f"resultats:version:{election_id}"
+
+
+def version_resultats(election_id):
+    version = cache.get(_cle_version(election_id))
+    if version is None:
+        # Clé absente (démarrage ou éviction) : nouvelle version jamais utilisée
+        cache.add(_cle_version(election_id), time.time_ns(), timeout=None)
+        version = cache.get(_cle_version(election_id))
+    return version
+
+
+def _incrementer(election_id):
+    try:
+        try:
+            cache.incr(_cle_version(election_id))
+        except ValueError:
+            cache.add(_cle_version(election_id), time.time_ns(), timeout=None)
+    except Exception as e:
+        # La version n'est qu'un indice de fraîcheur : cache indisponible = résultats servis au plus
+        # RESULTATS_CACHE_TIMEOUT secondes en retard, jamais un vote enregistré transformé en erreur
+        print(f"[CACHE] ⚠️ Version des résultats de l'élection {election_id} non incrémentée : {e}")
+
+
+def incrementer_version_resultats(election_id):
+    # Après commit, sinon un lecteur pourrait mettre en cache l'ancien état sous la nouvelle version
+    transaction.on_commit(lambda: _incrementer(election_id))
+
+
+def cle_resultats(election_id, tour, version):
+    return f"resultats:{election_id}:{tour or 'tous'}:{version}"
+
+
+def cle_resultat_finale(election_id):
+    return f"resultat_finale:{election_id}"
+
+
+def lire_ou_calculer(cle, calcul, timeout=None):
+    data = cache.get(cle)
+    if data is None:
+        data = calcul()
+        cache.set(cle, data, timeout)
+    return data
+
+
+def delai_resultats():
+    return getattr(settings, "RESULTATS_CACHE_TIMEOUT", 60)
+
+
+def cache_partage():
+    # LocMemCache / DummyCache : propres à chaque processus, une invalidation faite ailleurs n'y arrive pas
+    backend = settings.CACHES.get("default", {}).get("BACKEND", "")
+    return not backend.endswith(("LocMemCache", "DummyCache"))
+
+
+def delai_resultat_finale():
+    """Sans expiration seulement si le cache est partagé : la finalisation et la publication
+    tournent souvent dans un autre processus (worker Celery, commande), dont l'invalidation
+    n'atteint pas le cache local des workers web."""
+    return None if cache_partage() else delai_resultats()
@@ -0,0 +1,15 @@
+from channels.generic.websocket import AsyncWebsocketConsumer
+
+from .diffusion import abonner, desabonner
+
+
+# Flux des résultats en direct : un premier message avec les totaux,
+# puis uniquement les candidats dont le nombre de voix a changé.
+class ResultatsConsumer(AsyncWebsocketConsumer):
+    async def connect(self):
+        self.election_id = self.scope["url_route"]["kwargs"]["election_id"]
+        await self.accept()
+        await abonner(self.election_id, self)
+
+    async def disconnect(self, code):
+        desabonner(self.election_id, self)
@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from .models import Resultat, annoter_resultats
+
+
+# Un diffuseur par élection et par processus : une seule agrégation par intervalle,
+# quel que soit le nombre d'abonnés connectés.
+_diffuseurs = {}
+
+
+def lire_totaux(election_id):
+    rows = annoter_resultats(Resultat.objects.filter(election_id=election_id)).values_list(
+        "candidat", "tour", "nb_votes_live", "total_votes_live"
+    )
+    totaux, total_par_tour = {}, {}
+    for candidat_id, tour, nb_votes, total in rows:
+        totaux[(tour, candidat_id)] = nb_votes
+        total_par_tour[tour] = total
+    return totaux, total_par_tour
+
+
+def _message(type_message, election_id, totaux, total_par_tour):
+    return json.dumps({
+        "type": type_message,
+        "election": election_id,
+        "resultats": [
+            {"tour": tour, "candidat": candidat_id, "nb_votes": nb_votes}
+            for (tour, candidat_id), nb_votes in sorted(totaux.items())
+        ],
+        "total_votes": {str(tour): total for tour, total in total_par_tour.items()},
+    })
+
+
+class DiffuseurResultats:
+    def __init__(self, election_id):
+        self.election_id = election_id
+        self.abonnes = set()
+        self.totaux = {}
+        self.total_par_tour = {}
+        self.tache = None
+
+    async def abonner(self, consumer):
+        self.abonnes.add(consumer)
+        if self.tache is None:
+            self.tache = asyncio.ensure_future(self._boucle())
+        # Totaux courants lus pour le nouvel abonné : les deltas suivants s'y appliquent,
+        # qu'il arrive avant la première agrégation ou entre deux intervalles
+        try:
+            totaux, total_par_tour = await database_sync_to_async(lire_totaux)(self.election_id)
+        except Exception as e:
+            print(f"[DIFFUSION] ⚠️ Totaux de l'élection {self.election_id} non lus : {e}")
+            totaux, total_par_tour = self.totaux, self.total_par_tour
+        await consumer.send(text_data=_message("snapshot", self.election_id, totaux, total_par_tour))
+
+    def desabonner(self, consumer):
+        self.abonnes.discard(consumer)
+        if not self.abonnes and self.tache is not None:
+            self.tache.cancel()
+            self.tache = None
+            _diffuseurs.pop(self.election_id, None)
+
+    async def _boucle(self):
+        intervalle = getattr(settings, "RESULTATS_PUSH_INTERVAL", 2.0)
+        while self.abonnes:
+            try:
+                await self._diffuser()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Base momentanément indisponible : la diffusion reprend à l'intervalle suivant
+                print(f"[DIFFUSION] ⚠️ Élection {self.election_id} : {e}")
+            await asyncio.sleep(intervalle)
+
+    async def _diffuser(self):
+        totaux, total_par_tour = await database_sync_to_async(lire_totaux)(self.election_id)
+        delta = {cle: nb for cle, nb in totaux.items() if self.totaux.get(cle) != nb}
+        if delta:
+            self.totaux, self.total_par_tour = totaux, total_par_tour
+            # Message sérialisé une seule fois pour tous les abonnés
+            texte = _message("delta", self.election_id, delta, total_par_tour)
+            await asyncio.gather(
+                *(abonne.send(text_data=texte) for abonne in list(self.abonnes)),
+                return_exceptions=True,
+            )
+
+
+async def abonner(election_id, consumer):
+    diffuseur = _diffuseurs.get(election_id)
+    if diffuseur is None:
+        diffuseur = _diffuseurs[election_id] = DiffuseurResultats(election_id)
+    await diffuseur.abonner(consumer)
+
+
+def desabonner(election_id, consumer):
+    diffuseur = _diffuseurs.get(election_id)
+    if diffuseur is not None:
+        diffuseur.desabonner(consumer)
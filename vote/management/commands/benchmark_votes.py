@@ -0,0 +1,266 @@
+import json
+import logging
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Sum
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from electeurs.models import Region, District, Commune, Fokontany, Electeur
+from electeur_auth.models import ElecteurAuth
+from elections.models import TypeElection, Election, Candidat
+from vote.models import Vote, Resultat, consolider_resultats
+
+
+class EchantillonneurVerrous(threading.Thread):
+    """Sur PostgreSQL, compte à intervalle régulier les connexions bloquées sur un verrou."""
+
+    def __init__(self, intervalle=0.02):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.echantillons = []
+        self._stop = threading.Event()
+
+    def run(self):
+        try:
+            with connection.cursor() as cursor:
+                while not self._stop.is_set():
+                    cursor.execute(
+                        "SELECT count(*) FROM pg_stat_activity "
+                        "WHERE datname = current_database() AND wait_event_type = 'Lock'"
+                    )
+                    self.echantillons.append(cursor.fetchone()[0])
+                    time.sleep(self.intervalle)
+        finally:
+            connection.close()
+
+    def arreter(self):
+        self._stop.set()
+        self.join()
+        return {
+            "attente_verrou_ms": round(sum(self.echantillons) * self.intervalle * 1000, 1),
+            "max_connexions_bloquees": max(self.echantillons, default=0),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark du chemin de vote (POST /api/votes/voter/) sur une base de test jetable : "
+        "débit, latences p50/p95/p99, requêtes SQL par vote, attente de verrous et exactitude du décompte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--electeurs", type=int, default=1000, help="Nombre d'électeurs (= votes) générés")
+        parser.add_argument("--candidats", type=int, default=5)
+        parser.add_argument("--fokontany", type=int, default=20)
+        parser.add_argument("--concurrence", type=int, default=8, help="Nombre de clients simultanés")
+        parser.add_argument("--strategie", choices=["shards", "verrou", "toutes"], default="toutes",
+                            help="Stratégie de décompte (VOTE_TALLY_STRATEGY) à mesurer")
+        parser.add_argument("--seed", type=int, default=42, help="Graine du choix des candidats (reproductible)")
+        parser.add_argument("--json", help="Écrire le rapport dans ce fichier (comparaison entre versions)")
+        parser.add_argument("--keepdb", action="store_true", help="Conserver la base de test après le benchmark")
+
+    def handle(self, *args, **options):
+        ancien_nom = connection.settings_dict["NAME"]
+        if connection.vendor == "sqlite" and not connection.settings_dict["TEST"].get("NAME"):
+            # Base en mémoire partagée = verrous de table sans attente : on mesure sur fichier
+            connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.gettempdir(), "benchmark_votes.sqlite3")
+        # Les erreurs 500 sont comptées dans le rapport, pas tracées une par une
+        logging.getLogger("django.request").setLevel(logging.CRITICAL)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False,
+                                           keepdb=options["keepdb"])
+        try:
+            self.stdout.write(f"Base : {connection.vendor} ({connection.settings_dict['NAME']})")
+            electeur_ids, auth_ids = self._peupler(options["electeurs"], options["fokontany"])
+            strategies = ["shards", "verrou"] if options["strategie"] == "toutes" else [options["strategie"]]
+
+            rapports = []
+            for numero, strategie in enumerate(strategies):
+                # Le client de test parle à "testserver" en HTTP : ni ALLOWED_HOSTS ni redirection HTTPS de la prod
+                with override_settings(VOTE_TALLY_STRATEGY=strategie, VOTE_INGESTION_ASYNC=False,
+                                       ALLOWED_HOSTS=["testserver"], SECURE_SSL_REDIRECT=False):
+                    rapport = self._mesurer(strategie, numero, electeur_ids, auth_ids, options)
+                rapports.append(rapport)
+                self._afficher(rapport)
+
+            if options["json"]:
+                with open(options["json"], "w", encoding="utf-8") as f:
+                    json.dump(rapports, f, indent=2, ensure_ascii=False)
+                self.stdout.write(f"Rapport écrit dans {options['json']}")
+        finally:
+            connections.close_all()
+            connection.creation.destroy_test_db(ancien_nom, verbosity=0, keepdb=options["keepdb"])
+
+        en_echec = [r["strategie"] for r in rapports if not r["decompte_exact"]]
+        if en_echec:
+            raise CommandError(f"Décompte incohérent ou votes refusés : {', '.join(en_echec)}")
+
+    # --- Données ---
+
+    def _generer_electeurs(self, n, fokontany_ids):
+        naissance = date(1990, 1, 1)
+        for i in range(n):
+            yield Electeur(
+                nom_electeur=f"Bench{i}", prenom_electeur="Electeur", dateNaissance=naissance,
+                lieuNaissance="Antananarivo", numCIN=f"{i:012d}", adresse="Lot bench", profession="Test",
+                email=f"bench{i}@example.mg", numTel=f"03{i:08d}", is_apte_vote=True,
+                fokontany_id=fokontany_ids[i % len(fokontany_ids)],
+            )
+
+    def _peupler(self, n, nb_fokontany):
+        debut = time.perf_counter()
+        region = Region.objects.create(nom_region="Bench")
+        district = District.objects.create(nom_district="Bench", region=region)
+        commune = Commune.objects.create(nom_commune="Bench", district=district)
+        Fokontany.objects.bulk_create(
+            [Fokontany(nom_fokontany=f"Bench {i}", commune=commune) for i in range(nb_fokontany)]
+        )
+        fokontany_ids = list(Fokontany.objects.filter(commune=commune).values_list("pk", flat=True))
+
+        # bulk_create contourne Electeur.save : compteurs du fokontany remis à jour ensuite
+        Electeur.objects.bulk_create(self._generer_electeurs(n, fokontany_ids), batch_size=2000)
+        par_fokontany = Electeur.objects.values("fokontany").annotate(total=Count("id"))
+        for row in par_fokontany:
+            Fokontany.objects.filter(pk=row["fokontany"]).update(
+                nb_electeur_inscrit=row["total"], nb_electeur_apte=row["total"]
+            )
+
+        electeur_ids = list(Electeur.objects.order_by("pk").values_list("pk", flat=True))
+        expiration = timezone.now() + timedelta(hours=2)
+        ElecteurAuth.objects.bulk_create([
+            ElecteurAuth(electeur_id=eid, is_identifiant_valid=True, is_facial_valid=True,
+                         is_valid=True, expired_at=expiration)
+            for eid in electeur_ids
+        ], batch_size=2000)
+        auths = dict(ElecteurAuth.objects.values_list("electeur_id", "pk"))
+        self.stdout.write(f"{n} électeurs et sessions générés en {time.perf_counter() - debut:.2f}s")
+        return electeur_ids, [auths[eid] for eid in electeur_ids]
+
+    def _ouvrir_election(self, numero, electeur_ids, nb_candidats):
+        type_election = TypeElection.objects.create(titre=f"Benchmark {numero}")
+        election = Election.objects.create(type_election=type_election,
+                                           dateDebut=timezone.now() + timedelta(days=1))
+        # Les candidats sont pris parmi les électeurs (OneToOne), distincts d'une stratégie à l'autre
+        candidats = electeur_ids[numero * nb_candidats:(numero + 1) * nb_candidats]
+        for rang, eid in enumerate(candidats, start=1):
+            Candidat.objects.create(election=election, id_electeur_id=eid, numCandidat=rang,
+                                    biographie="Benchmark", photo_candidat="images/candidats/bench.jpg")
+        election.dateDebut = timezone.now() - timedelta(minutes=1)
+        election.save()
+        return election, list(election.candidats.values_list("pk", flat=True))
+
+    # --- Mesure ---
+
+    def _mesurer(self, strategie, numero, electeur_ids, auth_ids, options):
+        election, candidat_ids = self._ouvrir_election(numero, electeur_ids, options["candidats"])
+        hasard = random.Random(options["seed"])
+        charges = [
+            {"election": election.pk, "candidat": hasard.choice(candidat_ids), "auth_id": auth_id}
+            for auth_id in auth_ids
+        ]
+
+        concurrence = max(1, options["concurrence"])
+        resultats = [[] for _ in range(concurrence)]
+        depart = threading.Barrier(concurrence + 1)
+
+        def client(indice):
+            navigateur = Client(raise_request_exception=False)
+            depart.wait()
+            try:
+                for charge in charges[indice::concurrence]:
+                    with CaptureQueriesContext(connection) as requetes:
+                        t0 = time.perf_counter()
+                        reponse = navigateur.post("/api/votes/voter/", charge, content_type="application/json")
+                        duree = time.perf_counter() - t0
+                    resultats[indice].append((duree, reponse.status_code, len(requetes)))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(concurrence)]
+        for t in threads:
+            t.start()
+        echantillonneur = EchantillonneurVerrous() if connection.vendor == "postgresql" else None
+        if echantillonneur:
+            echantillonneur.start()
+        depart.wait()
+        t0 = time.perf_counter()
+        for t in threads:
+            t.join()
+        duree_totale = time.perf_counter() - t0
+        verrous = echantillonneur.arreter() if echantillonneur else {}
+
+        mesures = [m for par_client in resultats for m in par_client]
+        reussis = [m for m in mesures if m[1] in (201, 202)]
+        latences = sorted(m[0] * 1000 for m in reussis)
+        statuts = {}
+        for _, code, _ in mesures:
+            statuts[str(code)] = statuts.get(str(code), 0) + 1
+
+        t0 = time.perf_counter()
+        consolider_resultats(election, election.tourActuel)
+        duree_consolidation = time.perf_counter() - t0
+
+        # Exactitude : les lignes Resultat doivent refléter exactement la table Vote
+        attendus = dict(Vote.objects.filter(election=election).values("candidat")
+                        .annotate(n=Count("id_vote")).values_list("candidat", "n"))
+        obtenus = dict(Resultat.objects.filter(election=election).values_list("candidat", "nb_votes"))
+        ecarts = {cid: obtenus.get(cid, 0) - n for cid, n in attendus.items() if obtenus.get(cid, 0) != n}
+        total_resultats = Resultat.objects.filter(election=election).aggregate(t=Sum("nb_votes"))["t"] or 0
+        # Chaque vote envoyé doit être accepté (électeurs distincts) et compté une fois
+        exact = not ecarts and len(reussis) == len(mesures) == total_resultats
+
+        quantiles = statistics.quantiles(latences, n=100) if len(latences) >= 2 else latences * 99 or [0] * 99
+        return {
+            "strategie": strategie,
+            "base": connection.vendor,
+            "votes_envoyes": len(mesures),
+            "votes_acceptes": len(reussis),
+            "statuts": statuts,
+            "concurrence": concurrence,
+            "duree_s": round(duree_totale, 3),
+            "debit_votes_s": round(len(reussis) / duree_totale, 1) if duree_totale else 0,
+            "latence_ms": {
+                "p50": round(quantiles[49], 2),
+                "p95": round(quantiles[94], 2),
+                "p99": round(quantiles[98], 2),
+                "max": round(latences[-1], 2) if latences else 0,
+            },
+            "requetes_par_vote": {
+                "moyenne": round(statistics.mean(m[2] for m in reussis), 2) if reussis else 0,
+                "max": max((m[2] for m in reussis), default=0),
+            },
+            "consolidation_ms": round(duree_consolidation * 1000, 2),
+            "total_resultats": total_resultats,
+            "ecarts_decompte": ecarts,
+            "decompte_exact": exact,
+            **verrous,
+        }
+
+    def _afficher(self, r):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\nStratégie « {r['strategie']} » ({r['base']}, "
+                                                     f"{r['concurrence']} clients)"))
+        self.stdout.write(f"  Votes acceptés : {r['votes_acceptes']}/{r['votes_envoyes']}  statuts={r['statuts']}")
+        self.stdout.write(f"  Débit : {r['debit_votes_s']} votes/s en {r['duree_s']}s")
+        lat = r["latence_ms"]
+        self.stdout.write(f"  Latence : p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms max={lat['max']}ms")
+        self.stdout.write(f"  Requêtes SQL par vote : {r['requetes_par_vote']['moyenne']} "
+                          f"(max {r['requetes_par_vote']['max']})")
+        self.stdout.write(f"  Consolidation : {r['consolidation_ms']}ms")
+        if "attente_verrou_ms" in r:
+            self.stdout.write(f"  Attente de verrous : ~{r['attente_verrou_ms']}ms cumulés, "
+                              f"{r['max_connexions_bloquees']} connexion(s) bloquée(s) au maximum")
+        if not r["decompte_exact"]:
+            self.stdout.write(self.style.ERROR(f"  ❌ Décompte incohérent : écarts {r['ecarts_decompte']}, "
+                                               f"{r['total_resultats']} voix pour {r['votes_acceptes']} votes "
+                                               f"acceptés sur {r['votes_envoyes']} envoyés"))
+        else:
+            self.stdout.write(self.style.SUCCESS("  ✅ Décompte exact"))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from vote.models import FinalisationJob, executer_finalisation, reprendre_jobs_bloques
+
+
+class Command(BaseCommand):
+    help = (
+        "Exécute les jobs de finalisation en attente (sans passer par Celery), "
+        "après avoir remis en attente ceux sans signe de vie depuis FINALISATION_JOB_TIMEOUT."
+    )
+
+    def handle(self, *args, **options):
+        reprendre_jobs_bloques()
+        job_ids = list(FinalisationJob.objects.filter(statut="pending").values_list("pk", flat=True))
+        for job_id in job_ids:
+            ok = executer_finalisation(job_id)
+            job = FinalisationJob.objects.get(pk=job_id)
+            self.stdout.write(f"Élection {job.election_id} : {job.statut}" + ("" if ok else f" {job.erreur}"))
+        self.stdout.write(self.style.SUCCESS(f"{len(job_ids)} job(s) traité(s)."))
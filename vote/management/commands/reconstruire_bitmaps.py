@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from elections.models import Election
+from vote import bitmap
+
+
+class Command(BaseCommand):
+    help = "Reconstruit les bitmaps des votants depuis la table Vote (au démarrage ou après une purge Redis)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--election", type=int, help="Limiter à une élection (défaut : élections En cours)")
+        parser.add_argument("--tour", type=int, help="Tour à reconstruire (défaut : tour actuel)")
+
+    def handle(self, *args, **options):
+        elections = Election.objects.all()
+        if options["election"]:
+            elections = elections.filter(pk=options["election"])
+        else:
+            elections = elections.filter(status="En cours")
+
+        for election_id, tour_actuel in elections.values_list("pk", "tourActuel"):
+            tour = options["tour"] or tour_actuel
+            bitmap.reconstruire(election_id, tour)
+            self.stdout.write(f"Élection {election_id} tour {tour} : {bitmap.nb_votants(election_id, tour)} votant(s)")
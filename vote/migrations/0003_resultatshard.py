@@ -0,0 +1,45 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def amorcer_shards(apps, schema_editor):
+    # Les voix déjà comptées dans Resultat deviennent le slot 0 : dès qu'un shard existe pour un
+    # candidat, les lectures ne somment plus que les shards
+    Resultat = apps.get_model('vote', 'Resultat')
+    ResultatShard = apps.get_model('vote', 'ResultatShard')
+    ResultatShard.objects.bulk_create([
+        ResultatShard(election_id=r.election_id, candidat_id=r.candidat_id, tour=r.tour, slot=0, nb_votes=r.nb_votes)
+        for r in Resultat.objects.filter(nb_votes__gt=0).only('election_id', 'candidat_id', 'tour', 'nb_votes')
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0001_initial'),
+        ('vote', '0002_resultatfinale_is_publish'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='resultat',
+            unique_together={('election', 'candidat', 'tour')},
+        ),
+        migrations.CreateModel(
+            name='ResultatShard',
+            fields=[
+                ('id_shard', models.AutoField(primary_key=True, serialize=False)),
+                ('tour', models.PositiveIntegerField()),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('nb_votes', models.PositiveIntegerField(default=0)),
+                ('candidat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultat_shards', to='elections.candidat')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultat_shards', to='elections.election')),
+            ],
+            options={
+                'unique_together': {('election', 'candidat', 'tour', 'slot')},
+            },
+        ),
+        migrations.RunPython(amorcer_shards, migrations.RunPython.noop),
+    ]
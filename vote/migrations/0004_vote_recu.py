@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:01
+
+import uuid
+from django.db import migrations, models
+
+
+def generer_recus(apps, schema_editor):
+    Vote = apps.get_model('vote', 'Vote')
+    for vote in Vote.objects.filter(recu__isnull=True).only('pk'):
+        vote.recu = uuid.uuid4()
+        vote.save(update_fields=['recu'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0003_resultatshard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='decompte_applique',
+            field=models.BooleanField(default=True, editable=False),
+        ),
+        # Ajout en trois temps : chaque vote existant doit recevoir un reçu distinct
+        migrations.AddField(
+            model_name='vote',
+            name='recu',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(generer_recus, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='recu',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(condition=models.Q(('decompte_applique', False)), fields=['decompte_applique'], name='vote_decompte_en_attente'),
+        ),
+    ]
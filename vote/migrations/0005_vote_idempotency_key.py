@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0004_vote_recu'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
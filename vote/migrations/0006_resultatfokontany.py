@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electeurs', '0003_fokontany_nb_electeur_apte'),
+        ('elections', '0002_election_nb_inscrits'),
+        ('vote', '0005_vote_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResultatFokontany',
+            fields=[
+                ('id_resultat_fokontany', models.AutoField(primary_key=True, serialize=False)),
+                ('tour', models.PositiveIntegerField()),
+                ('nb_votes', models.PositiveIntegerField(default=0)),
+                ('candidat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats_fokontany', to='elections.candidat')),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats_fokontany', to='elections.election')),
+                ('fokontany', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resultats', to='electeurs.fokontany')),
+            ],
+            options={
+                'unique_together': {('election', 'candidat', 'tour', 'fokontany')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electeurs', '0003_fokontany_nb_electeur_apte'),
+        ('elections', '0002_election_nb_inscrits'),
+        ('vote', '0006_resultatfokontany'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ParticipationTranche',
+            fields=[
+                ('id_tranche', models.AutoField(primary_key=True, serialize=False)),
+                ('tour', models.PositiveIntegerField()),
+                ('debut', models.DateTimeField()),
+                ('nb_votes', models.PositiveIntegerField(default=0)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participation_tranches', to='elections.election')),
+                ('region', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participation_tranches', to='electeurs.region')),
+            ],
+            options={
+                'unique_together': {('election', 'tour', 'region', 'debut')},
+            },
+        ),
+    ]
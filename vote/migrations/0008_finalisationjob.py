@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0002_election_nb_inscrits'),
+        ('vote', '0007_participationtranche'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinalisationJob',
+            fields=[
+                ('id_job', models.AutoField(primary_key=True, serialize=False)),
+                ('statut', models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminée'), ('failed', 'Échec')], default='pending', max_length=10)),
+                ('erreur', models.TextField(blank=True, default='')),
+                ('tentatives', models.PositiveIntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_debut', models.DateTimeField(blank=True, null=True)),
+                ('date_fin', models.DateTimeField(blank=True, null=True)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='finalisation_job', to='elections.election')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0008_finalisationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resultatfinale',
+            name='archive_votes',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+    ]
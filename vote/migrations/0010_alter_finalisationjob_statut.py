@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0009_resultatfinale_archive_votes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='finalisationjob',
+            name='statut',
+            field=models.CharField(choices=[('pending', 'En attente'), ('running', 'En cours'), ('done', 'Terminée'), ('failed', 'Échec'), ('tour2', 'Second tour requis')], default='pending', max_length=10),
+        ),
+    ]
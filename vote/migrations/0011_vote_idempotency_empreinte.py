@@ -0,0 +1,31 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:35
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def calculer_empreintes(apps, schema_editor):
+    # Votes déjà soumis avec une clé : leurs rejeux doivent rester acceptés
+    Vote = apps.get_model('vote', 'Vote')
+    for vote in Vote.objects.exclude(idempotency_key=None).only('pk', 'electeur_id', 'election_id', 'candidat_id'):
+        vote.idempotency_empreinte = hashlib.sha256(
+            f"{vote.electeur_id}|{vote.election_id}|{vote.candidat_id}".encode()
+        ).hexdigest()
+        vote.save(update_fields=['idempotency_empreinte'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0010_alter_finalisationjob_statut'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='idempotency_empreinte',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.RunPython(calculer_empreintes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('electeurs', '0004_electeur_face_encoding'),
+        ('elections', '0002_election_nb_inscrits'),
+        ('vote', '0012_participationtranche_slot'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='resultatfokontany',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='resultatfokontany',
+            name='slot',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AlterUniqueTogether(
+            name='resultatfokontany',
+            unique_together={('election', 'candidat', 'tour', 'fokontany', 'slot')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vote', '0013_resultatfokontany_slot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='finalisationjob',
+            name='date_heartbeat',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,19 +1,32 @@
-from django.db import models, transaction
-from django.db.models import F, Q
+import hashlib
+import random
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import models, transaction, connection, IntegrityError
+from django.db.models import F, Q, Sum, Count, OuterRef, Subquery, Case, When, Value
+from django.db.models.functions import Coalesce, TruncMinute
 from django.core.exceptions import ValidationError
 from django.dispatch import receiver
 from django.utils import timezone
 from django.core.files.base import ContentFile
+from django.core.cache import cache
 import io
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
 
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet
 
-from electeurs.models import Electeur
+from electeurs.models import Electeur, Fokontany, Region
 from elections.models import Election, Candidat
 from electeur_auth.models import ElecteurAuth
+from .cache import incrementer_version_resultats, cle_resultat_finale
+from .archives import archiver_votes, purger_votes
+from . import bitmap
 
 
 class Vote(models.Model):
@@ -26,8 +39,24 @@ class Vote(models.Model):
     date_vote = models.DateTimeField(auto_now_add=True)
     encrypted_candidat = models.TextField(editable=False)
 
+    # Reçu remis à l’électeur ; False tant que le worker n’a pas appliqué le décompte
+    recu = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    decompte_applique = models.BooleanField(default=True, editable=False)
+    # Clé fournie par le client (en-tête Idempotency-Key) pour rejouer une soumission
+    idempotency_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
+    # Empreinte (électeur, élection, candidat) de la requête d'origine : un rejeu doit la reproduire
+    idempotency_empreinte = models.CharField(max_length=64, blank=True, default="", editable=False)
+
     class Meta:
         unique_together = ('election', 'electeur', 'tour')  # un seul vote par électeur/tour
+        indexes = [
+            models.Index(fields=['decompte_applique'], condition=Q(decompte_applique=False),
+                         name='vote_decompte_en_attente'),
+        ]
+
+    @staticmethod
+    def empreinte(electeur_id, election_id, candidat_id):
+        return hashlib.sha256(f"{electeur_id}|{election_id}|{candidat_id}".encode()).hexdigest()
 
     def clean(self):
         # Vérifier que l'élection est en cours
@@ -42,6 +71,10 @@ class Vote(models.Model):
         if self.tour != self.election.tourActuel:
             raise ValidationError("Le vote doit être au tour actuel de l’élection.")
 
+        # Au second tour, seuls les candidats qualifiés peuvent recevoir des voix
+        if self.tour > 1 and not self.candidat.estQualifieTour2:
+            raise ValidationError("Ce candidat n’est pas qualifié pour le second tour.")
+
         # Vérifier que l’électeur est bien authentifié
         now = timezone.now()
         session = ElecteurAuth.objects.filter(
@@ -80,6 +113,55 @@ class Resultat(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        unique_together = ('election', 'candidat', 'tour')
+
+
+class ResultatShard(models.Model):
+    # Compteur réparti sur N slots par (élection, candidat, tour) :
+    # chaque vote incrémente un slot tiré au hasard, la lecture fait la somme.
+    id_shard = models.AutoField(primary_key=True)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name="resultat_shards")
+    candidat = models.ForeignKey(Candidat, on_delete=models.CASCADE, related_name="resultat_shards")
+    tour = models.PositiveIntegerField()
+    slot = models.PositiveSmallIntegerField()
+    nb_votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('election', 'candidat', 'tour', 'slot')
+
+
+class ResultatFokontany(models.Model):
+    # Décompte par fokontany, maintenu à chaque vote ; les niveaux commune/district/région
+    # s'obtiennent en agrégeant ces lignes (indépendant de la table Vote, purgée à la fin).
+    # Réparti sur RESULTATS_FOKONTANY_SHARDS slots, comme ResultatShard.
+    id_resultat_fokontany = models.AutoField(primary_key=True)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name="resultats_fokontany")
+    candidat = models.ForeignKey(Candidat, on_delete=models.CASCADE, related_name="resultats_fokontany")
+    tour = models.PositiveIntegerField()
+    fokontany = models.ForeignKey(Fokontany, on_delete=models.CASCADE, related_name="resultats")
+    slot = models.PositiveSmallIntegerField(default=0)
+    nb_votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('election', 'candidat', 'tour', 'fokontany', 'slot')
+
+
+class ParticipationTranche(models.Model):
+    # Nombre de votes par tranche de temps (PARTICIPATION_TRANCHE_MINUTES) et par région,
+    # réparti sur PARTICIPATION_TRANCHE_SHARDS slots comme ResultatShard : tous les votes
+    # d'une région dans la même minute ne se disputent pas une seule ligne
+    id_tranche = models.AutoField(primary_key=True)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE, related_name="participation_tranches")
+    tour = models.PositiveIntegerField()
+    region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name="participation_tranches")
+    debut = models.DateTimeField()
+    slot = models.PositiveSmallIntegerField(default=0)
+    nb_votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('election', 'tour', 'region', 'debut', 'slot')
+
 
 class ResultatFinale(models.Model):
     id_resultatFinale = models.AutoField(primary_key=True)
@@ -91,6 +173,8 @@ class ResultatFinale(models.Model):
     date_finalisation = models.DateTimeField(default=timezone.now)
 
     archive_pdf = models.FileField(upload_to="archives_resultats/", null=True, blank=True)
+    # Dossier (relatif à ARCHIVE_VOTES_DIR, hors MEDIA_ROOT) de l'archive colonnaire des bulletins, cf. vote/archives.py
+    archive_votes = models.CharField(max_length=255, blank=True, default="")
 
     # ✅ Nouveau champ
     is_publish = models.BooleanField(default=False)
@@ -99,6 +183,30 @@ class ResultatFinale(models.Model):
         return f"Résultat final de {self.election}"
 
 
+class FinalisationJob(models.Model):
+    STATUT_CHOICES = [
+        ('pending', 'En attente'),
+        ('running', 'En cours'),
+        ('done', 'Terminée'),
+        ('failed', 'Échec'),
+        ('tour2', 'Second tour requis'),
+    ]
+
+    id_job = models.AutoField(primary_key=True)
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name="finalisation_job")
+    statut = models.CharField(max_length=10, choices=STATUT_CHOICES, default='pending')
+    erreur = models.TextField(blank=True, default="")
+    tentatives = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+    date_debut = models.DateTimeField(null=True, blank=True)
+    date_fin = models.DateTimeField(null=True, blank=True)
+    # Signe de vie du worker pendant l'exécution (FINALISATION_JOB_HEARTBEAT) : un job lent n'est pas repris
+    date_heartbeat = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Finalisation de {self.election} ({self.statut})"
+
+
 
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -107,39 +215,177 @@ from django.dispatch import receiver
 # Quand un vote est créé → mettre à jour les résultats
 @receiver(post_save, sender=Vote)
 def update_results_on_vote_created(sender, instance: Vote, created, **kwargs):
-    if created:
-        _recompute_and_update_resultats(instance.election, instance.tour, instance.candidat)
-
-
-# Quand une élection se termine → figer résultats + PDF
+    if not created:
+        return
+    election_id, tour, electeur_id = instance.election_id, instance.tour, instance.electeur_id
+    transaction.on_commit(lambda: bitmap.marquer(election_id, tour, electeur_id))
+    if instance.decompte_applique:
+        _comptabiliser_vote(instance)
+    else:
+        vote_id = instance.pk
+        transaction.on_commit(lambda: lancer_decompte(vote_id))
+
+
+def lancer_decompte(vote_id: int):
+    from .tasks import appliquer_decompte_vote
+    try:
+        appliquer_decompte_vote.delay(vote_id)
+    except Exception as e:
+        # Broker indisponible : le vote est enregistré (decompte_applique=False) et sera compté
+        # par la tâche de rattrapage appliquer_decomptes_en_attente
+        print(f"[VOTE] ⚠️ Décompte du vote {vote_id} non planifié : {e}")
+
+
+# Résultat final modifié (publication, archive) → invalider son cache
+@receiver(post_save, sender=ResultatFinale)
+def invalidate_resultat_finale_cache(sender, instance: ResultatFinale, **kwargs):
+    election_id = instance.election_id
+    transaction.on_commit(lambda: cache.delete(cle_resultat_finale(election_id)))
+
+
+# Quand une élection se termine → job de finalisation (résultats figés + PDF + purge)
+# exécuté par un worker, hors de la requête qui a changé le statut
 @receiver(post_save, sender=Election)
 def finalize_results_on_election_end(sender, instance: Election, **kwargs):
     if instance.status != "Terminée":
         return
-    if hasattr(instance, "resultat_final"):
-        return
+    job, created = FinalisationJob.objects.get_or_create(election=instance)
+    if created:
+        transaction.on_commit(lambda: lancer_finalisation(job.pk))
+
+
+def lancer_finalisation(job_id: int):
+    from .tasks import finaliser_election
+    try:
+        finaliser_election.delay(job_id)
+    except Exception as e:
+        # Broker indisponible : le job reste "pending" et sera repris (beat ou commande finaliser_elections)
+        print(f"[FINALISATION] ⚠️ Job {job_id} non planifié : {e}")
 
-    tour_final = instance.tourActuel
-    resultats = Resultat.objects.filter(election=instance, tour=tour_final).order_by("-nb_votes")
-    if not resultats.exists():
-        return
 
-    gagnant_res = resultats.first()
-    final = ResultatFinale.objects.create(
-        election=instance,
-        candidat_elu=gagnant_res.candidat,
-        nb_vote_total_obtenu=gagnant_res.nb_votes,
-        taux_participation=gagnant_res.taux_participation,
-        tour_finale=tour_final,
-        date_finalisation=timezone.now(),
+def reprendre_jobs_bloques(election_id=None) -> int:
+    """Remet en attente les jobs "running" sans signe de vie depuis FINALISATION_JOB_TIMEOUT secondes
+    (worker tué en cours de route) ; chaque étape de la finalisation peut être rejouée.
+
+    UPDATE conditionnel sur date_heartbeat : un job lent mais vivant continue de battre et n'est pas repris.
+    """
+    limite = timezone.now() - timezone.timedelta(seconds=getattr(settings, "FINALISATION_JOB_TIMEOUT", 300))
+    jobs = FinalisationJob.objects.filter(statut="running").filter(
+        Q(date_heartbeat__lt=limite) | Q(date_heartbeat__isnull=True, date_debut__lt=limite)
     )
+    if election_id is not None:
+        jobs = jobs.filter(election_id=election_id)
+    nb = jobs.update(statut="pending", erreur="Job sans signe de vie, remis en attente")
+    if nb:
+        print(f"[FINALISATION] ⚠️ {nb} job(s) bloqué(s) remis en attente")
+    return nb
+
+
+class _Heartbeat(threading.Thread):
+    """Met à jour date_heartbeat du job tant que cette tentative en est propriétaire."""
+
+    def __init__(self, job_id: int, tentative: int):
+        super().__init__(daemon=True)
+        self.job_id, self.tentative = job_id, tentative
+        self._arret = threading.Event()
+
+    def run(self):
+        intervalle = getattr(settings, "FINALISATION_JOB_HEARTBEAT", 30)
+        try:
+            while not self._arret.wait(intervalle):
+                try:
+                    vivant = FinalisationJob.objects.filter(
+                        pk=self.job_id, statut="running", tentatives=self.tentative
+                    ).update(date_heartbeat=timezone.now())
+                except Exception as e:
+                    # Base momentanément indisponible : on retente au battement suivant
+                    print(f"[FINALISATION] ⚠️ Heartbeat du job {self.job_id} non enregistré : {e}")
+                    continue
+                if not vivant:
+                    print(f"[FINALISATION] ⚠️ Job {self.job_id} repris par un autre worker")
+                    return
+        finally:
+            connection.close()
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+
+
+def executer_finalisation(job_id: int) -> bool:
+    # Le passage pending -> running sert de verrou : le travail lourd ne s'exécute qu'une fois
+    now = timezone.now()
+    if not FinalisationJob.objects.filter(pk=job_id, statut="pending").update(
+        statut="running", date_debut=now, date_heartbeat=now, tentatives=F("tentatives") + 1
+    ):
+        return False
+    job = FinalisationJob.objects.select_related("election").get(pk=job_id)
+    # Le statut final n'est écrit que si le job appartient encore à cette tentative
+    cette_tentative = FinalisationJob.objects.filter(pk=job_id, statut="running", tentatives=job.tentatives)
+    heartbeat = _Heartbeat(job_id, job.tentatives)
+    heartbeat.start()
+    try:
+        finaliser_resultats(job.election)
+    except SecondTourRequis as e:
+        # Rien n'est figé ni purgé : le job sera supprimé à l'ouverture du second tour
+        cette_tentative.update(statut="tour2", erreur=str(e), date_fin=timezone.now())
+        print(f"[FINALISATION] ⏸️ Élection {job.election_id} : {e}")
+        return False
+    except Exception as e:
+        cette_tentative.update(statut="failed", erreur=str(e), date_fin=timezone.now())
+        print(f"[FINALISATION] ❌ Élection {job.election_id} : {e}")
+        return False
+    finally:
+        heartbeat.arreter()
+    return bool(cette_tentative.update(statut="done", erreur="", date_fin=timezone.now()))
+
+
+def finaliser_resultats(election: Election):
+    """Fige le résultat final, génère le PDF, archive puis purge les votes.
+
+    Chaque étape peut être rejouée : un job relancé après un échec reprend là où il s'est arrêté.
+    """
+    tour_final = election.tourActuel
+    final = ResultatFinale.objects.filter(election=election).first()
+    if final is None:
+        consolider_resultats(election, tour_final)
+        if tour_final == 1 and election.type_election.deuxTours:
+            elu, qualifies = issue_du_tour(election, tour_final)
+            if elu is None and len(qualifies) >= 2:
+                raise SecondTourRequis(f"Aucune majorité absolue, candidats qualifiés : {qualifies}")
+        gagnant_res = Resultat.objects.filter(election=election, tour=tour_final).order_by("-nb_votes").first()
+        if gagnant_res is None:
+            return
+        final = ResultatFinale.objects.create(
+            election=election,
+            candidat_elu=gagnant_res.candidat,
+            nb_vote_total_obtenu=gagnant_res.nb_votes,
+            taux_participation=gagnant_res.taux_participation,
+            tour_finale=tour_final,
+            date_finalisation=timezone.now(),
+        )
+
+    if not final.archive_pdf:
+        _generer_pdf_resultats(final)
+
+    # Archive colonnaire puis purge des votes par lots bornés
+    if not final.archive_votes:
+        final.archive_votes = archiver_votes(election)
+        final.save(update_fields=["archive_votes"])
+    purger_votes(election)
+
+
+def _generer_pdf_resultats(final: ResultatFinale):
+    election = final.election
+    resultats = Resultat.objects.filter(
+        election=election, tour=final.tour_finale
+    ).select_related("candidat__id_electeur").order_by("-nb_votes")
 
-    # Génération PDF
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4)
     styles = getSampleStyleSheet()
     story = []
-    story.append(Paragraph(f"Résultats finaux de l'élection: {str(instance)}", styles["Title"]))
+    story.append(Paragraph(f"Résultats finaux de l'élection: {str(election)}", styles["Title"]))
     story.append(Paragraph(f"Date de finalisation : {timezone.now().strftime('%d/%m/%Y %H:%M')}", styles["Normal"]))
     story.append(Spacer(1, 12))
     data = [["Candidat", "Nombre de voix"]]
@@ -153,21 +399,290 @@ def finalize_results_on_election_end(sender, instance: Election, **kwargs):
                          ("GRID", (0, 0), (-1, -1), 1, colors.black),
                        ])))
     story.append(Spacer(1, 24))
-    story.append(Paragraph(f"Gagnant : {gagnant_res.candidat} avec {gagnant_res.nb_votes} voix", styles["Heading2"]))
-    story.append(Paragraph(f"Taux de participation : {float(gagnant_res.taux_participation):.2f}%", styles["Normal"]))
+    story.append(Paragraph(f"Gagnant : {final.candidat_elu} avec {final.nb_vote_total_obtenu} voix", styles["Heading2"]))
+    story.append(Paragraph(f"Taux de participation : {float(final.taux_participation):.2f}%", styles["Normal"]))
     doc.build(story)
 
     pdf_bytes = buffer.getvalue()
     buffer.close()
-    final.archive_pdf.save(f"resultat_final_{instance.pk}.pdf", ContentFile(pdf_bytes))
-
-    # Purge des votes de l’élection
-    Vote.objects.filter(election=instance).delete()
+    final.archive_pdf.save(f"resultat_final_{election.pk}.pdf", ContentFile(pdf_bytes))
 
 
 # --- Fonctions utilitaires ---
 def _compute_nb_inscrits_for_election(election: Election) -> int:
-    return Electeur.objects.count()
+    return election.get_nb_inscrits()
+
+
+def calculer_taux_participation(total_votes: int, nb_inscrits: int) -> Decimal:
+    taux = (Decimal(total_votes) * 100 / nb_inscrits) if nb_inscrits > 0 else Decimal(0)
+    return taux.quantize(Decimal("0.001"))
+
+
+def _comptabiliser_vote(vote: Vote):
+    # "verrou" = ancien décompte sérialisé (select_for_update), "shards" = compteurs répartis
+    if getattr(settings, "VOTE_TALLY_STRATEGY", "shards") == "verrou":
+        _recompute_and_update_resultats(vote.election, vote.tour, vote.candidat)
+    else:
+        _incrementer_shard(vote.election_id, vote.tour, vote.candidat_id)
+    _incrementer_compteur(
+        ResultatFokontany, election_id=vote.election_id, candidat_id=vote.candidat_id,
+        tour=vote.tour, fokontany_id=vote.electeur.fokontany_id,
+        slot=random.randrange(getattr(settings, "RESULTATS_FOKONTANY_SHARDS", 4)),
+    )
+    _incrementer_compteur(
+        ParticipationTranche, election_id=vote.election_id, tour=vote.tour,
+        region_id=_region_du_fokontany(vote.electeur.fokontany_id), debut=debut_tranche(vote.date_vote),
+        slot=random.randrange(getattr(settings, "PARTICIPATION_TRANCHE_SHARDS", 8)),
+    )
+    incrementer_version_resultats(vote.election_id)
+
+
+# fokontany -> région, mémorisé par processus (le découpage ne change pas pendant un scrutin)
+_regions_par_fokontany = {}
+
+
+def _region_du_fokontany(fokontany_id: int) -> int:
+    region_id = _regions_par_fokontany.get(fokontany_id)
+    if region_id is None:
+        region_id = Fokontany.objects.filter(pk=fokontany_id).values_list(
+            "commune__district__region_id", flat=True
+        ).first()
+        _regions_par_fokontany[fokontany_id] = region_id
+    return region_id
+
+
+def debut_tranche(moment: datetime, minutes: int = None) -> datetime:
+    pas = 60 * (minutes or getattr(settings, "PARTICIPATION_TRANCHE_MINUTES", 1))
+    return datetime.fromtimestamp(int(moment.timestamp()) // pas * pas, tz=dt_timezone.utc)
+
+
+def appliquer_decomptes_differes(vote_ids):
+    """Applique le décompte des votes ingérés en mode asynchrone (idempotent)."""
+    nb = 0
+    for vote in Vote.objects.filter(pk__in=vote_ids, decompte_applique=False).select_related("electeur"):
+        with transaction.atomic():
+            # Le flag sert de verrou : un seul worker réclame chaque vote
+            if Vote.objects.filter(pk=vote.pk, decompte_applique=False).update(decompte_applique=True):
+                _comptabiliser_vote(vote)
+                nb += 1
+    return nb
+
+
+def _incrementer_compteur(model, **cle):
+    """+1 sur la ligne de compteur identifiée par `cle`, créée au besoin. Renvoie True si créée."""
+    compteur = model.objects.filter(**cle)
+    if compteur.update(nb_votes=F("nb_votes") + 1):
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(nb_votes=1, **cle)
+    except IntegrityError:
+        # Ligne créée en parallèle par un autre vote
+        compteur.update(nb_votes=F("nb_votes") + 1)
+        return False
+    return True
+
+
+def _incrementer_shard(election_id: int, tour: int, candidat_id: int):
+    slot = random.randrange(getattr(settings, "VOTE_TALLY_SHARDS", 16))
+    cree = _incrementer_compteur(
+        ResultatShard, election_id=election_id, candidat_id=candidat_id, tour=tour, slot=slot
+    )
+    if cree:
+        # Premier vote tombant sur ce slot : on crée aussi les lignes Resultat (sans verrou global)
+        _creer_resultats_manquants(election_id, tour)
+
+
+def _creer_resultats_manquants(election_id: int, tour: int):
+    candidats = Candidat.objects.filter(election_id=election_id)
+    if tour > 1:
+        candidats = candidats.filter(estQualifieTour2=True)
+    candidat_ids = candidats.values_list("id_candidat", flat=True)
+    Resultat.objects.bulk_create(
+        [Resultat(election_id=election_id, candidat_id=cid, tour=tour) for cid in candidat_ids],
+        ignore_conflicts=True,
+    )
+
+
+def _somme_shards(**filtres):
+    return ResultatShard.objects.filter(**filtres).values("candidat", "tour").annotate(total=Sum("nb_votes"))
+
+
+def annoter_resultats(queryset):
+    """Ajoute nb_votes_live / total_votes_live (somme des shards) à un queryset de Resultat.
+
+    Sans shard (stratégie "verrou" ou aucun vote), on retombe sur les valeurs stockées.
+    """
+    par_candidat = ResultatShard.objects.filter(
+        election=OuterRef("election"), candidat=OuterRef("candidat"), tour=OuterRef("tour")
+    ).values("candidat").annotate(total=Sum("nb_votes")).values("total")
+    par_tour = ResultatShard.objects.filter(
+        election=OuterRef("election"), tour=OuterRef("tour")
+    ).values("tour").annotate(total=Sum("nb_votes")).values("total")
+    return queryset.annotate(
+        nb_votes_live=Coalesce(Subquery(par_candidat), F("nb_votes")),
+        total_votes_live=Coalesce(Subquery(par_tour), F("total_votes_election")),
+    )
+
+
+def consolider_resultats(election: Election, tour: int):
+    """Recopie la somme des shards dans les lignes Resultat (une requête d'agrégat + un bulk_update)."""
+    totaux = {row["candidat"]: row["total"] for row in _somme_shards(election=election, tour=tour)}
+    if totaux:
+        _ecrire_resultats(election, tour, totaux)
+
+
+def recalculer_resultats_depuis_votes(election: Election, tour: int):
+    """Reconstruit shards et Resultat d'un (élection, tour) à partir de la table Vote.
+
+    Utilisé après un import en masse : un agrégat GROUP BY (par candidat, puis par
+    candidat et fokontany) au lieu d'un recalcul par vote.
+    Refusé pendant le scrutin : un vote en direct compté entre l'agrégat et la réécriture
+    des compteurs serait perdu (le chemin de vote ne prend aucun verrou sur l'élection).
+    """
+    with transaction.atomic():
+        # Verrou sur l'élection : statut figé et recalculs/imports concurrents sérialisés
+        statut = Election.objects.select_for_update().values_list("status", flat=True).get(pk=election.pk)
+        if statut == "En cours":
+            raise ValidationError("Recalcul des résultats impossible pendant le scrutin.")
+        totaux = dict(
+            Vote.objects.filter(election=election, tour=tour)
+            .values("candidat").annotate(total=Count("id_vote"))
+            .values_list("candidat", "total")
+        )
+        ResultatShard.objects.filter(election=election, tour=tour).delete()
+        ResultatShard.objects.bulk_create([
+            ResultatShard(election=election, candidat_id=cid, tour=tour, slot=0, nb_votes=total)
+            for cid, total in totaux.items()
+        ])
+        _ecrire_resultats(election, tour, totaux)
+
+        par_fokontany = (
+            Vote.objects.filter(election=election, tour=tour)
+            .values("candidat", "electeur__fokontany").annotate(total=Count("id_vote"))
+        )
+        ResultatFokontany.objects.filter(election=election, tour=tour).delete()
+        ResultatFokontany.objects.bulk_create([
+            ResultatFokontany(election=election, candidat_id=row["candidat"], tour=tour,
+                              fokontany_id=row["electeur__fokontany"], nb_votes=row["total"])
+            for row in par_fokontany
+        ])
+
+        # Tranches regroupées à la minute en base, puis ramenées au pas configuré
+        tranches = {}
+        par_minute = (
+            Vote.objects.filter(election=election, tour=tour)
+            .annotate(minute=TruncMinute("date_vote"))
+            .values("minute", "electeur__fokontany__commune__district__region")
+            .annotate(total=Count("id_vote"))
+        )
+        for row in par_minute:
+            cle = (row["electeur__fokontany__commune__district__region"], debut_tranche(row["minute"]))
+            tranches[cle] = tranches.get(cle, 0) + row["total"]
+        ParticipationTranche.objects.filter(election=election, tour=tour).delete()
+        ParticipationTranche.objects.bulk_create([
+            ParticipationTranche(election=election, tour=tour, region_id=region_id, debut=debut, nb_votes=total)
+            for (region_id, debut), total in tranches.items()
+        ])
+    transaction.on_commit(lambda: bitmap.reconstruire(election.pk, tour))
+    incrementer_version_resultats(election.pk)
+
+
+class SecondTourRequis(Exception):
+    pass
+
+
+class SecondTourImpossible(Exception):
+    pass
+
+
+def issue_du_tour(election: Election, tour: int):
+    """Retourne (élu, qualifiés) à partir des totaux live du tour (une seule requête).
+
+    élu : candidat dépassant seuilMajorite % des voix exprimées, sinon None ;
+    qualifiés : les deux premiers, ex æquo inclus, quand personne n'a la majorité.
+    """
+    voix = dict(
+        annoter_resultats(Resultat.objects.filter(election=election, tour=tour))
+        .values_list("candidat_id", "nb_votes_live")
+    )
+    total = sum(voix.values())
+    if not total:
+        return None, []
+    classement = sorted(voix.items(), key=lambda item: item[1], reverse=True)
+    premier_id, premier = classement[0]
+    if premier * 100 > election.seuilMajorite * total:
+        return premier_id, []
+    seuil = classement[min(1, len(classement) - 1)][1]
+    return None, [cid for cid, nb in classement if nb >= seuil and nb > 0]
+
+
+def ouvrir_second_tour(election: Election, date_debut=None, date_fin=None):
+    """Qualifie les candidats et ouvre le tour 2 d'une élection dont le premier tour est clos.
+
+    Tout se fait en quelques requêtes ensemblistes (un agrégat, deux UPDATE, un bulk_create) ;
+    le chemin de vote n'est jamais verrouillé.
+    """
+    if election.tourActuel != 1 or election.status != "Terminée":
+        raise SecondTourImpossible("Le premier tour doit être clos (statut Terminée) pour ouvrir le second.")
+    if not election.type_election.deuxTours:
+        raise SecondTourImpossible("Ce type d'élection se joue en un seul tour.")
+    if ResultatFinale.objects.filter(election=election).exists():
+        raise SecondTourImpossible("Le résultat final de cette élection est déjà établi.")
+
+    consolider_resultats(election, 1)
+    elu, qualifies = issue_du_tour(election, 1)
+    if elu is not None:
+        raise SecondTourImpossible("Un candidat a obtenu la majorité absolue au premier tour.")
+    if len(qualifies) < 2:
+        raise SecondTourImpossible("Pas assez de candidats ayant obtenu des voix pour un second tour.")
+
+    now = timezone.now()
+    date_debut = date_debut or now
+    date_fin = date_fin or date_debut + timezone.timedelta(days=1)
+    if date_fin <= date_debut:
+        raise SecondTourImpossible("La date de fin doit être postérieure à la date de début.")
+
+    with transaction.atomic():
+        # Job de finalisation du tour 1 (en attente / arrêté sur "tour2") : il sera recréé à la fin du tour 2
+        FinalisationJob.objects.filter(election=election, statut__in=["pending", "failed", "tour2"]).delete()
+        if FinalisationJob.objects.filter(election=election).exists():
+            raise SecondTourImpossible("La finalisation de cette élection est déjà en cours.")
+
+        # UPDATE conditionnel : une seule ouverture possible même en cas d'appels concurrents
+        if not Election.objects.filter(pk=election.pk, tourActuel=1, status="Terminée").update(
+            tourActuel=F("tourActuel") + 1,
+            dateDebut=date_debut,
+            dateFin=date_fin,
+            status="En préparation" if date_debut > now else "En cours",
+        ):
+            raise SecondTourImpossible("Le second tour a déjà été ouvert.")
+
+        Candidat.objects.filter(election=election).update(
+            estQualifieTour2=Case(When(pk__in=qualifies, then=Value(True)), default=Value(False))
+        )
+        Resultat.objects.bulk_create(
+            [Resultat(election=election, candidat_id=cid, tour=2) for cid in qualifies],
+            ignore_conflicts=True,
+        )
+
+    election.refresh_from_db()
+    incrementer_version_resultats(election.pk)
+    print(f"[SECOND TOUR] Élection {election.pk} : candidats qualifiés {qualifies}")
+    return qualifies
+
+
+def _ecrire_resultats(election: Election, tour: int, totaux: dict):
+    _creer_resultats_manquants(election.pk, tour)
+    total_votes = sum(totaux.values())
+    taux = calculer_taux_participation(total_votes, _compute_nb_inscrits_for_election(election))
+
+    resultats = list(Resultat.objects.filter(election=election, tour=tour))
+    for res in resultats:
+        res.nb_votes = totaux.get(res.candidat_id, 0)
+        res.total_votes_election = total_votes
+        res.taux_participation = taux
+    Resultat.objects.bulk_update(resultats, ["nb_votes", "total_votes_election", "taux_participation"])
 
 
 def _recompute_and_update_resultats(election: Election, tour: int, voted_candidat: Candidat):
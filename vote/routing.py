@@ -0,0 +1,7 @@
+from django.urls import path
+
+from .consumers import ResultatsConsumer
+
+websocket_urlpatterns = [
+    path("ws/votes/resultats/<int:election_id>/", ResultatsConsumer.as_asgi()),
+]
@@ -2,7 +2,7 @@ from rest_framework import serializers
 from django.utils import timezone
 from django.core.exceptions import ValidationError
 
-from .models import Vote, Resultat, ResultatFinale
+from .models import Vote, Resultat, ResultatFinale, FinalisationJob, calculer_taux_participation
 from electeur_auth.models import ElecteurAuth
 
 
@@ -11,9 +11,9 @@ class VoteSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Vote
-        fields = ["id_vote", "election", "candidat", "auth_id", "date_vote"]
+        fields = ["id_vote", "election", "candidat", "auth_id", "date_vote", "recu"]
 
-        read_only_fields = ["id_vote", "date_vote"]
+        read_only_fields = ["id_vote", "date_vote", "recu"]
 
     def validate(self, data):
         auth_id = data.pop("auth_id", None)
@@ -28,10 +28,20 @@ class VoteSerializer(serializers.ModelSerializer):
         if not auth.is_valid or auth.is_expired:
             raise serializers.ValidationError({"auth_id": "Session invalide ou expirée."})
 
+        election, candidat = data.get("election"), data.get("candidat")
+        if election and candidat and election.tourActuel > 1 and not candidat.estQualifieTour2:
+            raise serializers.ValidationError({"candidat": "Ce candidat n’est pas qualifié pour le second tour."})
+
         data["electeur"] = auth.electeur
         return data
 
 
+class RecuVoteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Vote
+        fields = ["recu", "election", "tour", "date_vote", "decompte_applique"]
+
+
 class ResultatSerializer(serializers.ModelSerializer):
     candidat_nom = serializers.CharField(source="candidat.nom_candidat", read_only=True)
 
@@ -48,6 +58,17 @@ class ResultatSerializer(serializers.ModelSerializer):
             "taux_participation",
         ]
 
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        # Valeurs live annotées par annoter_resultats() (somme des shards)
+        if hasattr(instance, "nb_votes_live"):
+            data["nb_votes"] = instance.nb_votes_live
+            data["total_votes_election"] = instance.total_votes_live
+            nb_inscrits = self.context.get("nb_inscrits")
+            if nb_inscrits is not None:
+                data["taux_participation"] = str(calculer_taux_participation(instance.total_votes_live, nb_inscrits))
+        return data
+
 
 class ResultatFinaleSerializer(serializers.ModelSerializer):
     candidat_elu_nom = serializers.CharField(source="candidat_elu.nom_candidat", read_only=True)
@@ -67,3 +88,9 @@ class ResultatFinaleSerializer(serializers.ModelSerializer):
             "is_publish",  # ✅ Ajouté
         ]
         read_only_fields = ["id_resultatFinale", "date_finalisation", "archive_pdf"]
+
+
+class FinalisationJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FinalisationJob
+        fields = ["id_job", "election", "statut", "erreur", "tentatives", "date_creation", "date_debut", "date_fin"]
@@ -0,0 +1,29 @@
+from celery import shared_task
+
+from .models import Vote, FinalisationJob, appliquer_decomptes_differes, executer_finalisation, reprendre_jobs_bloques
+
+
+@shared_task
+def appliquer_decompte_vote(vote_id):
+    return appliquer_decomptes_differes([vote_id])
+
+
+@shared_task
+def appliquer_decomptes_en_attente(limite=1000):
+    vote_ids = list(
+        Vote.objects.filter(decompte_applique=False).order_by("pk").values_list("pk", flat=True)[:limite]
+    )
+    return appliquer_decomptes_differes(vote_ids)
+
+
+@shared_task
+def finaliser_election(job_id):
+    return executer_finalisation(job_id)
+
+
+@shared_task
+def finaliser_elections_en_attente():
+    # Reprend les jobs dont la tâche n'a jamais été reçue par un worker, ou dont le worker est mort
+    reprendre_jobs_bloques()
+    job_ids = list(FinalisationJob.objects.filter(statut="pending").values_list("pk", flat=True))
+    return sum(executer_finalisation(job_id) for job_id in job_ids)
@@ -1,3 +1,705 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db.models import Count, F, Sum
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from accounts.models import CustomUser
+from electeurs.models import Region, District, Commune, Fokontany, Electeur
+from electeur_auth.models import ElecteurAuth
+from elections.models import TypeElection, Election, Candidat
+
+from . import bitmap, diffusion
+from .archives import archiver_votes, charger_archive, purger_votes
+from .cache import delai_resultat_finale, delai_resultats
+from .models import (
+    Vote, Resultat, ResultatFinale, ResultatFokontany, FinalisationJob, ParticipationTranche, SecondTourImpossible,
+    annoter_resultats, appliquer_decomptes_differes, consolider_resultats, debut_tranche, executer_finalisation,
+    ouvrir_second_tour, recalculer_resultats_depuis_votes, reprendre_jobs_bloques,
+)
+
+
+# Le client de test parle à "testserver" en HTTP : ni ALLOWED_HOSTS ni redirection HTTPS de la prod
+@override_settings(ALLOWED_HOSTS=["testserver"], SECURE_SSL_REDIRECT=False, VOTE_INGESTION_ASYNC=False)
+class ScrutinTestCase(TestCase):
+    nb_electeurs = 6
+    deux_tours = True
+
+    def setUp(self):
+        # Bitmap des votants propre au processus : repartir d'un état vide à chaque test
+        bitmap._backend = None
+        region = Region.objects.create(nom_region="Analamanga")
+        district = District.objects.create(nom_district="Antananarivo", region=region)
+        commune = Commune.objects.create(nom_commune="Antananarivo I", district=district)
+        fokontany = Fokontany.objects.create(nom_fokontany="Isotry", commune=commune)
+        self.electeurs = [
+            Electeur.objects.create(
+                nom_electeur=f"Rakoto{i}", prenom_electeur="Jean", dateNaissance=date(1990, 1, 1),
+                lieuNaissance="Antananarivo", numCIN=f"{i:012d}", adresse="Lot test", profession="Test",
+                email=f"electeur{i}@example.mg", numTel=f"03{i:08d}", fokontany=fokontany,
+            )
+            for i in range(self.nb_electeurs)
+        ]
+        type_election = TypeElection.objects.create(titre="Présidentielle", deuxTours=self.deux_tours)
+        self.election = Election.objects.create(type_election=type_election,
+                                                dateDebut=timezone.now() + timedelta(days=1))
+        self.candidats = [
+            Candidat.objects.create(election=self.election, id_electeur=self.electeurs[k], numCandidat=k + 1,
+                                    biographie="Test", photo_candidat="images/candidats/test.jpg")
+            for k in range(3)
+        ]
+        self.election.dateDebut = timezone.now() - timedelta(minutes=1)
+        self.election.save()
+        expiration = timezone.now() + timedelta(minutes=15)
+        self.sessions = [
+            ElecteurAuth.objects.create(electeur=e, is_identifiant_valid=True, is_facial_valid=True,
+                                        is_valid=True, expired_at=expiration)
+            for e in self.electeurs
+        ]
+
+    def voter(self, indice, candidat, cle=None):
+        entetes = {"HTTP_IDEMPOTENCY_KEY": cle} if cle else {}
+        return self.client.post(
+            reverse("vote-create"),
+            {"election": self.election.pk, "candidat": candidat.pk, "auth_id": self.sessions[indice].pk},
+            content_type="application/json", **entetes,
+        )
+
+    def assertDecompteExact(self, tour=1):
+        attendus = dict(Vote.objects.filter(election=self.election, tour=tour).values("candidat")
+                        .annotate(n=Count("id_vote")).values_list("candidat", "n"))
+        live = dict(annoter_resultats(Resultat.objects.filter(election=self.election, tour=tour))
+                    .values_list("candidat", "nb_votes_live"))
+        consolider_resultats(self.election, tour)
+        stockes = dict(Resultat.objects.filter(election=self.election, tour=tour).values_list("candidat", "nb_votes"))
+        for candidat_id, n in attendus.items():
+            self.assertEqual(live.get(candidat_id), n)
+            self.assertEqual(stockes.get(candidat_id), n)
+        self.assertEqual(sum(stockes.values()), sum(attendus.values()))
+
+
+class DecompteTests(ScrutinTestCase):
+    def voter_tous(self):
+        for indice, rang in enumerate([0, 0, 1, 2, 0, 1]):
+            self.assertEqual(self.voter(indice, self.candidats[rang]).status_code, 201)
+
+    @override_settings(VOTE_TALLY_STRATEGY="shards")
+    def test_decompte_shards_egal_aux_votes(self):
+        self.voter_tous()
+        self.assertTrue(self.election.resultat_shards.exists())
+        self.assertDecompteExact()
+
+    @override_settings(VOTE_TALLY_STRATEGY="verrou")
+    def test_decompte_verrou_egal_aux_votes(self):
+        self.voter_tous()
+        self.assertFalse(self.election.resultat_shards.exists())
+        self.assertDecompteExact()
+
+    def test_second_vote_du_meme_electeur_refuse(self):
+        self.assertEqual(self.voter(0, self.candidats[0]).status_code, 201)
+        self.assertEqual(self.voter(0, self.candidats[1]).status_code, 409)
+        self.assertEqual(Vote.objects.filter(election=self.election).count(), 1)
+        self.assertDecompteExact()
+
+
+@override_settings(VOTE_INGESTION_ASYNC=True)
+class IngestionAsynchroneTests(ScrutinTestCase):
+    def test_decomptes_differes_appliques_une_seule_fois(self):
+        for indice in range(4):
+            self.assertEqual(self.voter(indice, self.candidats[indice % 2]).status_code, 202)
+        ids = list(Vote.objects.filter(election=self.election).values_list("pk", flat=True))
+        self.assertFalse(Vote.objects.filter(pk__in=ids, decompte_applique=True).exists())
+
+        self.assertEqual(appliquer_decomptes_differes(ids), 4)
+        # Tâche rejouée (retry, beat de rattrapage) : aucun vote compté deux fois
+        self.assertEqual(appliquer_decomptes_differes(ids), 0)
+        self.assertDecompteExact()
+
+    def test_broker_indisponible_vote_enregistre_puis_rattrape(self):
+        from .tasks import appliquer_decompte_vote, appliquer_decomptes_en_attente
+
+        with mock.patch.object(appliquer_decompte_vote, "delay", side_effect=ConnectionError("broker")), \
+                self.captureOnCommitCallbacks(execute=True):
+            reponse = self.voter(0, self.candidats[0])
+        self.assertEqual(reponse.status_code, 202)
+        self.assertTrue(Vote.objects.filter(recu=reponse.json()["recu"], decompte_applique=False).exists())
+
+        self.assertEqual(appliquer_decomptes_en_attente(), 1)
+        self.assertDecompteExact()
+
+    def test_recu_suit_l_application_du_decompte(self):
+        recu = self.voter(0, self.candidats[0]).json()["recu"]
+        url = reverse("vote-recu", args=[recu])
+        self.assertFalse(self.client.get(url).json()["decompte_applique"])
+
+        appliquer_decomptes_differes(Vote.objects.values_list("pk", flat=True))
+        etat = self.client.get(url).json()
+        self.assertTrue(etat["decompte_applique"])
+        self.assertEqual((etat["election"], etat["tour"]), (self.election.pk, 1))
+
+
+class IdempotenceTests(ScrutinTestCase):
+    def test_rejeu_de_la_meme_requete(self):
+        premiere = self.voter(0, self.candidats[0], cle="cle-0")
+        rejeu = self.voter(0, self.candidats[0], cle="cle-0")
+        self.assertEqual(premiere.status_code, 201)
+        self.assertEqual(rejeu.status_code, 201)
+        self.assertEqual(rejeu["Idempotent-Replayed"], "true")
+        self.assertEqual(rejeu.json()["recu"], premiere.json()["recu"])
+        self.assertEqual(Vote.objects.filter(election=self.election).count(), 1)
+
+    def test_cle_reutilisee_pour_un_autre_bulletin(self):
+        self.assertEqual(self.voter(0, self.candidats[0], cle="cle-0").status_code, 201)
+        self.assertEqual(self.voter(0, self.candidats[1], cle="cle-0").status_code, 422)
+
+    def test_cle_reutilisee_par_un_autre_electeur(self):
+        self.assertEqual(self.voter(0, self.candidats[0], cle="cle-0").status_code, 201)
+        reponse = self.voter(1, self.candidats[0], cle="cle-0")
+        self.assertEqual(reponse.status_code, 422)
+        self.assertNotIn("recu", reponse.json())
+        self.assertFalse(Vote.objects.filter(electeur=self.electeurs[1]).exists())
+        # Sa propre clé lui permet toujours de voter
+        self.assertEqual(self.voter(1, self.candidats[0], cle="cle-1").status_code, 201)
+
+
+class FinalisationTestCase(ScrutinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.archives = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.archives, ignore_errors=True)
+        reglages = override_settings(ARCHIVE_VOTES_DIR=self.archives, MEDIA_ROOT=self.archives)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+    def cloturer(self):
+        Election.objects.filter(pk=self.election.pk).update(status="Terminée")
+        self.election.refresh_from_db()
+        return FinalisationJob.objects.get_or_create(election=self.election)[0]
+
+
+class FinalisationTests(FinalisationTestCase):
+    def test_cloture_cree_un_job_en_attente(self):
+        Election.objects.filter(pk=self.election.pk).update(dateFin=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(Election.appliquer_transitions_statut(), 1)
+        job = FinalisationJob.objects.get(election=self.election)
+        self.assertEqual(job.statut, "pending")
+
+    def test_majorite_absolue_finalise_au_premier_tour(self):
+        for indice, rang in enumerate([0, 0, 0, 0, 1, 2]):
+            self.voter(indice, self.candidats[rang])
+        job = self.cloturer()
+
+        self.assertTrue(executer_finalisation(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.statut, job.tentatives), ("done", 1))
+        final = ResultatFinale.objects.get(election=self.election)
+        self.assertEqual(final.candidat_elu, self.candidats[0])
+        self.assertEqual(final.nb_vote_total_obtenu, 4)
+        self.assertEqual(final.tour_finale, 1)
+        self.assertTrue(final.archive_pdf)
+        # Votes archivés puis purgés ; un job terminé n'est pas rejoué
+        self.assertFalse(Vote.objects.filter(election=self.election).exists())
+        self.assertFalse(executer_finalisation(job.pk))
+        with self.assertRaises(SecondTourImpossible):
+            ouvrir_second_tour(self.election)
+
+    def test_sans_majorite_second_tour_puis_finalisation(self):
+        for indice, rang in enumerate([0, 0, 1, 1, 2]):
+            self.voter(indice, self.candidats[rang])
+        job = self.cloturer()
+
+        self.assertFalse(executer_finalisation(job.pk))
+        job.refresh_from_db()
+        self.assertEqual(job.statut, "tour2")
+        self.assertFalse(ResultatFinale.objects.filter(election=self.election).exists())
+
+        qualifies = ouvrir_second_tour(self.election)
+        self.assertEqual(sorted(qualifies), sorted([self.candidats[0].pk, self.candidats[1].pk]))
+        self.assertEqual(self.election.tourActuel, 2)
+        self.assertEqual(self.election.status, "En cours")
+        self.assertFalse(FinalisationJob.objects.filter(election=self.election).exists())
+        with self.assertRaises(SecondTourImpossible):
+            ouvrir_second_tour(self.election)
+
+        # Au second tour, seuls les qualifiés reçoivent des voix
+        self.assertEqual(self.voter(5, self.candidats[2]).status_code, 400)
+        for indice, rang in enumerate([0, 1, 1, 1, 0]):
+            self.assertEqual(self.voter(indice, self.candidats[rang]).status_code, 201)
+        self.assertDecompteExact(tour=2)
+
+        job = self.cloturer()
+        self.assertTrue(executer_finalisation(job.pk))
+        final = ResultatFinale.objects.get(election=self.election)
+        self.assertEqual((final.candidat_elu, final.tour_finale, final.nb_vote_total_obtenu),
+                         (self.candidats[1], 2, 3))
+
+    def test_job_lent_mais_vivant_non_repris(self):
+        job = self.cloturer()
+        il_y_a_une_heure = timezone.now() - timedelta(hours=1)
+        FinalisationJob.objects.filter(pk=job.pk).update(
+            statut="running", tentatives=1, date_debut=il_y_a_une_heure, date_heartbeat=timezone.now())
+        self.assertEqual(reprendre_jobs_bloques(), 0)
+
+        FinalisationJob.objects.filter(pk=job.pk).update(date_heartbeat=il_y_a_une_heure)
+        self.assertEqual(reprendre_jobs_bloques(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.statut, "pending")
+
+    def test_tentative_reprise_ne_reecrit_pas_le_statut(self):
+        for indice, rang in enumerate([0, 0, 0, 1]):
+            self.voter(indice, self.candidats[rang])
+        job = self.cloturer()
+
+        def reprise_pendant_le_calcul(election):
+            # Un autre worker a repris le job pendant cette tentative
+            FinalisationJob.objects.filter(pk=job.pk).update(tentatives=F("tentatives") + 1)
+            raise RuntimeError("worker trop lent")
+
+        with mock.patch("vote.models.finaliser_resultats", side_effect=reprise_pendant_le_calcul):
+            self.assertFalse(executer_finalisation(job.pk))
+        job.refresh_from_db()
+        self.assertEqual((job.statut, job.tentatives, job.erreur), ("running", 2, ""))
+
+
+class FinalisationUnTourTests(FinalisationTestCase):
+    deux_tours = False
+
+    def test_sans_majorite_elu_a_la_majorite_relative(self):
+        for indice, rang in enumerate([0, 0, 1, 2]):
+            self.voter(indice, self.candidats[rang])
+        job = self.cloturer()
+
+        self.assertTrue(executer_finalisation(job.pk))
+        self.assertEqual(ResultatFinale.objects.get(election=self.election).candidat_elu, self.candidats[0])
+        with self.assertRaises(SecondTourImpossible):
+            ouvrir_second_tour(self.election)
+
+
+class ImportVotesTests(ScrutinTestCase):
+    def setUp(self):
+        super().setUp()
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+
+    def importer(self, lignes):
+        import import_votes
+
+        fichier, rapport = os.path.join(self.dossier, "votes.csv"), os.path.join(self.dossier, "erreurs.csv")
+        with open(fichier, "w", newline="", encoding="utf-8") as f:
+            ecrivain = csv.writer(f)
+            ecrivain.writerow(["election_id", "electeur_id", "candidat_id", "tour"])
+            ecrivain.writerows(lignes)
+        import_votes.import_votes_bulk(fichier, rapport, batch_size=2)
+        with open(rapport, newline="", encoding="utf-8") as f:
+            return {int(row["ligne"]): row["erreur"] for row in csv.DictReader(f)}
+
+    def test_import_en_masse_puis_recalcul(self):
+        Election.objects.filter(pk=self.election.pk).update(status="Terminée")
+        el, (c1, c2, _) = self.election.pk, self.candidats
+        autre = Election.objects.create(type_election=TypeElection.objects.create(titre="Municipale"),
+                                        dateDebut=timezone.now() + timedelta(days=3))
+        hors_election = Candidat.objects.create(election=autre, id_electeur=self.electeurs[5], numCandidat=1,
+                                                biographie="Test", photo_candidat="images/candidats/test.jpg")
+        ids = [e.pk for e in self.electeurs]
+        erreurs = self.importer([
+            [el, ids[0], c1.pk, 1],
+            [el, ids[1], c1.pk, 1],
+            [el, ids[2], c2.pk, 1],
+            [el, ids[3], c1.pk, 1],
+            [el, ids[0], c2.pk, 1],            # doublon dans le fichier
+            [el, 99999, c1.pk, 1],             # électeur inconnu
+            [el, ids[4], hors_election.pk, 1],  # candidat d'une autre élection
+            [el, ids[4], c1.pk, 2],            # mauvais tour
+            [el, "x", c1.pk, 1],
+        ])
+
+        self.assertEqual(sorted(erreurs), [6, 7, 8, 9, 10])
+        self.assertEqual(erreurs[6], "Vote déjà enregistré pour cet électeur et ce tour")
+        self.assertEqual(erreurs[7], "Électeur introuvable")
+        self.assertEqual(erreurs[10], "Valeur manquante ou non numérique")
+        self.assertEqual(Vote.objects.filter(election=self.election).count(), 4)
+        self.assertDecompteExact()
+        self.assertEqual(Resultat.objects.get(election=self.election, candidat=c1, tour=1).total_votes_election, 4)
+        par_zone = ResultatFokontany.objects.filter(election=self.election).aggregate(total=Sum("nb_votes"))
+        self.assertEqual(par_zone["total"], 4)
+
+    def test_import_refuse_pendant_le_scrutin(self):
+        erreurs = self.importer([[self.election.pk, self.electeurs[0].pk, self.candidats[0].pk, 1]])
+        self.assertEqual(erreurs, {2: "Élection en cours : import possible après la clôture du scrutin"})
+        self.assertFalse(Vote.objects.exists())
+
+    def test_recalcul_refuse_pendant_le_scrutin(self):
+        self.voter(0, self.candidats[0])
+        with self.assertRaises(ValidationError):
+            recalculer_resultats_depuis_votes(self.election, 1)
+        self.assertDecompteExact()
+
+    def test_import_second_tour_reserve_aux_qualifies(self):
+        for indice, rang in enumerate([0, 0, 1, 1, 2]):
+            self.voter(indice, self.candidats[rang])
+        Election.objects.filter(pk=self.election.pk).update(status="Terminée")
+        self.election.refresh_from_db()
+        ouvrir_second_tour(self.election)
+        Election.objects.filter(pk=self.election.pk).update(status="Terminée")
+
+        el, (c1, _, c3) = self.election.pk, self.candidats
+        erreurs = self.importer([[el, self.electeurs[0].pk, c1.pk, 2], [el, self.electeurs[1].pk, c3.pk, 2]])
+        self.assertEqual(erreurs, {3: "Candidat non qualifié pour le second tour"})
+        self.assertEqual(Vote.objects.filter(election=self.election, tour=2).count(), 1)
+
+
+class CacheResultatsTests(ScrutinTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+
+    def lire_resultats(self, **params):
+        return self.client.get(reverse("resultat-list", args=[self.election.pk]), params)
+
+    def test_resultats_servis_depuis_le_cache_jusqu_au_vote_suivant(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.voter(0, self.candidats[0])
+        premiere = self.lire_resultats(tour=1).json()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.lire_resultats(tour=1).json(), premiere)
+
+        # Nouveau vote : version incrémentée après commit, la lecture suivante est recalculée
+        with self.captureOnCommitCallbacks(execute=True):
+            self.voter(1, self.candidats[0])
+        votes = {r["candidat"]: r["nb_votes"] for r in self.lire_resultats(tour=1).json()["results"]}
+        self.assertEqual(votes[self.candidats[0].pk], 2)
+
+    def test_tour_non_numerique_refuse(self):
+        self.assertEqual(self.lire_resultats(tour="1 OR 1=1").status_code, 400)
+
+    def test_resultat_final_sans_expiration_seulement_si_cache_partage(self):
+        self.assertEqual(delai_resultat_finale(), delai_resultats())
+        redis = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": "redis://x"}}
+        with override_settings(CACHES=redis):
+            self.assertIsNone(delai_resultat_finale())
+
+    def test_vote_enregistre_meme_si_le_cache_est_indisponible(self):
+        with mock.patch("vote.cache.cache.incr", side_effect=ConnectionError("redis")), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.voter(0, self.candidats[0]).status_code, 201)
+        self.assertDecompteExact()
+
+
+class BitmapVotantsTests(ScrutinTestCase):
+    def test_bits_au_format_redis(self):
+        # Bit 0 = bit de poids fort du premier octet, comme SETBIT/GETBIT
+        self.assertEqual(bitmap.construire_bits([0, 9]), bytes([0x80, 0x40]))
+        self.assertEqual(bitmap.construire_bits([]), b"")
+
+    def test_a_vote_et_nb_votants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.voter(0, self.candidats[0])
+        el = self.election.pk
+        self.assertTrue(bitmap.a_vote(el, 1, self.electeurs[0].pk))
+        self.assertFalse(bitmap.a_vote(el, 1, self.electeurs[1].pk))
+
+        # Vote enregistré par un autre processus : absent du bitmap local, trouvé en base
+        Vote.objects.bulk_create([Vote(election=self.election, electeur=self.electeurs[1],
+                                       candidat=self.candidats[1], tour=1, encrypted_candidat="enc")])
+        self.assertTrue(bitmap.a_vote(el, 1, self.electeurs[1].pk))
+        self.assertEqual(bitmap.nb_votants(el, 1), 2)
+
+    def test_nb_votants_apres_purge(self):
+        for indice in range(3):
+            self.voter(indice, self.candidats[0])
+        consolider_resultats(self.election, 1)
+        ResultatFinale.objects.create(election=self.election, candidat_elu=self.candidats[0],
+                                      nb_vote_total_obtenu=3, taux_participation=50, tour_finale=1,
+                                      archive_votes=f"election_{self.election.pk}")
+        purger_votes(self.election)
+        bitmap._backend = None
+        self.assertEqual(bitmap.nb_votants(self.election.pk, 1), 3)
+
+    def test_vote_enregistre_si_le_bitmap_est_indisponible(self):
+        with mock.patch.object(bitmap.BitmapMemoire, "marquer", side_effect=ConnectionError("redis")), \
+                self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.voter(0, self.candidats[0]).status_code, 201)
+        self.assertTrue(bitmap.a_vote(self.election.pk, 1, self.electeurs[0].pk))
+
+    def test_endpoints(self):
+        self.voter(0, self.candidats[0])
+        verif = reverse("vote-check", args=[self.election.pk, self.sessions[0].pk])
+        self.assertEqual(self.client.get(verif).json(), {"has_voted": True})
+        self.assertEqual(self.client.get(verif, {"tour": "un"}).status_code, 400)
+
+        votants = reverse("vote-votants", args=[self.election.pk])
+        reponse = self.client.get(votants).json()
+        self.assertEqual((reponse["nb_votants"], reponse["nb_inscrits"]), (1, self.nb_electeurs))
+        self.assertEqual(self.client.get(votants, {"tour": "1;"}).status_code, 400)
+
+
+class AbonneTest:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, text_data):
+        self.messages.append(json.loads(text_data))
+
+
+@override_settings(RESULTATS_PUSH_INTERVAL=0.01)
+class DiffusionTests(SimpleTestCase):
+    def setUp(self):
+        self.totaux = {(1, 10): 3, (1, 11): 1}
+        self.pannes = 0
+        patch = mock.patch.object(diffusion, "lire_totaux", side_effect=self.lire_totaux)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def lire_totaux(self, election_id):
+        if self.pannes:
+            self.pannes -= 1
+            raise RuntimeError("base indisponible")
+        return dict(self.totaux), {1: sum(self.totaux.values())}
+
+    async def attendre(self, abonne, nb_messages):
+        for _ in range(200):
+            if len(abonne.messages) >= nb_messages:
+                return
+            await asyncio.sleep(0.01)
+        self.fail(f"{nb_messages} message(s) attendu(s), reçu(s) : {abonne.messages}")
+
+    async def test_nouvel_abonne_recoit_les_totaux_courants(self):
+        premier, second = AbonneTest(), AbonneTest()
+        await diffusion.abonner(1, premier)
+        await self.attendre(premier, 2)
+        self.totaux[(1, 11)] = 2
+        await diffusion.abonner(1, second)
+        try:
+            self.assertEqual(premier.messages[0]["type"], "snapshot")
+            self.assertEqual(second.messages[0]["type"], "snapshot")
+            self.assertEqual(second.messages[0]["resultats"], [
+                {"tour": 1, "candidat": 10, "nb_votes": 3}, {"tour": 1, "candidat": 11, "nb_votes": 2},
+            ])
+            self.assertEqual(second.messages[0]["total_votes"], {"1": 5})
+        finally:
+            diffusion.desabonner(1, premier)
+            diffusion.desabonner(1, second)
+        self.assertNotIn(1, diffusion._diffuseurs)
+
+    async def test_erreur_de_lecture_ne_stoppe_pas_la_diffusion(self):
+        abonne = AbonneTest()
+        await diffusion.abonner(2, abonne)
+        try:
+            await self.attendre(abonne, 2)
+            self.pannes = 2
+            self.totaux[(1, 10)] = 4
+            await self.attendre(abonne, 3)
+            self.assertEqual(abonne.messages[-1]["type"], "delta")
+            self.assertEqual(abonne.messages[-1]["resultats"], [{"tour": 1, "candidat": 10, "nb_votes": 4}])
+            self.assertEqual(self.pannes, 0)
+        finally:
+            diffusion.desabonner(2, abonne)
+
+
+class ResultatZonesTests(ScrutinTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Cache fokontany -> région du processus : les identifiants sont réutilisés d'un test à l'autre
+        cache_regions = mock.patch.dict("vote.models._regions_par_fokontany", clear=True)
+        cache_regions.start()
+        self.addCleanup(cache_regions.stop)
+        region = Region.objects.create(nom_region="Atsinanana")
+        district = District.objects.create(nom_district="Toamasina", region=region)
+        commune = Commune.objects.create(nom_commune="Toamasina I", district=district)
+        self.fokontany_est = Fokontany.objects.create(nom_fokontany="Tanambao", commune=commune)
+        for electeur in self.electeurs[3:]:
+            electeur.fokontany = self.fokontany_est
+            electeur.save()
+
+    def zones(self, **params):
+        return self.client.get(reverse("resultat-zones", args=[self.election.pk]), params)
+
+    def test_cumul_des_slots_par_zone(self):
+        # Chaque vote sur un slot différent : la vue doit sommer les slots
+        slots = iter(range(100))
+        with mock.patch("vote.models.random.randrange", side_effect=lambda n: next(slots) % n):
+            for indice, rang in enumerate([0, 0, 1, 0, 2, 2]):
+                self.assertEqual(self.voter(indice, self.candidats[rang]).status_code, 201)
+        self.assertGreater(ResultatFokontany.objects.filter(election=self.election).count(), 4)
+
+        zones = {z["nom"]: z for z in self.zones(niveau="region").json()["zones"]}
+        self.assertEqual(zones["Analamanga"]["total_votes"], 3)
+        self.assertEqual(zones["Analamanga"]["resultats"],
+                         [{"candidat": self.candidats[0].pk, "nb_votes": 2}, {"candidat": self.candidats[1].pk, "nb_votes": 1}])
+        self.assertEqual(zones["Atsinanana"]["resultats"],
+                         [{"candidat": self.candidats[2].pk, "nb_votes": 2}, {"candidat": self.candidats[0].pk, "nb_votes": 1}])
+
+        par_fokontany = {z["zone"]: z["total_votes"] for z in self.zones(niveau="fokontany").json()["zones"]}
+        self.assertEqual(par_fokontany[self.fokontany_est.pk], 3)
+        self.assertEqual(sum(par_fokontany.values()), Vote.objects.filter(election=self.election).count())
+
+    def test_recalcul_identique_au_decompte_en_direct(self):
+        for indice, rang in enumerate([0, 1, 1, 2, 2, 0]):
+            self.voter(indice, self.candidats[rang])
+        en_direct = self.zones(niveau="commune").json()["zones"]
+        Election.objects.filter(pk=self.election.pk).update(status="Terminée")
+        recalculer_resultats_depuis_votes(self.election, 1)
+        self.assertEqual(self.zones(niveau="commune").json()["zones"], en_direct)
+
+    def test_parametres_invalides(self):
+        self.assertEqual(self.zones(niveau="pays").status_code, 400)
+        self.assertEqual(self.zones(tour="deux").status_code, 400)
+
+
+class ParticipationSerieTests(ScrutinTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.region = Region.objects.get(nom_region="Analamanga")
+
+    def serie(self, **params):
+        return self.client.get(reverse("participation-serie", args=[self.election.pk]), params)
+
+    def test_vote_compte_dans_sa_tranche(self):
+        with mock.patch.dict("vote.models._regions_par_fokontany", clear=True):
+            for indice in range(3):
+                self.voter(indice, self.candidats[0])
+        vote = Vote.objects.filter(election=self.election).latest("date_vote")
+        reponse = self.serie().json()
+        self.assertEqual(reponse["total_votes"], 3)
+        self.assertIn(debut_tranche(vote.date_vote).isoformat(), [point["debut"] for point in reponse["serie"]])
+        self.assertEqual(sum(point["nb_votes"] for point in reponse["serie"]), 3)
+
+    def test_regroupement_par_pas(self):
+        autre = Region.objects.create(nom_region="Atsinanana")
+        origine = debut_tranche(timezone.now(), 60)
+        # Minutes 0, 1 (deux slots), 4 et 7 ; une tranche dans une autre région
+        for minute, slot, region, nb in [(0, 0, self.region, 2), (1, 0, self.region, 1), (1, 3, self.region, 4),
+                                         (4, 0, self.region, 1), (7, 0, self.region, 5), (1, 0, autre, 10)]:
+            ParticipationTranche.objects.create(election=self.election, tour=1, region=region, slot=slot,
+                                                debut=origine + timedelta(minutes=minute), nb_votes=nb)
+
+        par_minute = self.serie(region=self.region.pk).json()
+        self.assertEqual([point["nb_votes"] for point in par_minute["serie"]], [2, 5, 1, 5])
+        self.assertEqual(par_minute["total_votes"], 13)
+
+        par_cinq = self.serie(pas=5).json()
+        self.assertEqual(par_cinq["serie"], [
+            {"debut": origine.isoformat(), "nb_votes": 18},
+            {"debut": (origine + timedelta(minutes=5)).isoformat(), "nb_votes": 5},
+        ])
+        self.assertEqual(self.serie(tour=2).json()["serie"], [])
+
+    @override_settings(PARTICIPATION_TRANCHE_MINUTES=5)
+    def test_pas_invalide(self):
+        self.assertEqual(self.serie(pas=7).status_code, 400)
+        self.assertEqual(self.serie(pas=1).status_code, 400)
+        self.assertEqual(self.serie(pas="cinq").status_code, 400)
+        self.assertEqual(self.serie(region="Analamanga").status_code, 400)
+        self.assertEqual(self.serie(pas=10).status_code, 200)
+
+
+class ArchiveVotesTests(FinalisationTestCase):
+    def setUp(self):
+        super().setUp()
+        # Médias publics séparés de l'archive : elle ne doit jamais y être écrite
+        self.medias = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.medias, ignore_errors=True)
+        reglages = override_settings(MEDIA_ROOT=self.medias)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        for indice, rang in enumerate([2, 0, 1, 0, 0, 0]):
+            self.voter(indice, self.candidats[rang])
+
+    def en_tete_admin(self):
+        admin = CustomUser.objects.create_user("admin@example.mg", "secret", pseudo_admin="admin",
+                                               nom_admin="Admin", prenom_admin="Test", is_staff=True)
+        return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(admin).access_token}"}
+
+    def test_archive_triee_et_sans_horodatage_precis(self):
+        relatif = archiver_votes(self.election, taille_lot=4)
+        self.assertEqual(sorted(os.listdir(self.archives)), [relatif])
+        self.assertEqual(os.listdir(self.medias), [])
+
+        archive = charger_archive(relatif)
+        self.assertEqual(sorted(archive), ["candidat", "date_vote", "fokontany", "tour"])
+        cles = list(zip(archive["tour"].tolist(), archive["fokontany"].tolist(), archive["candidat"].tolist()))
+        self.assertEqual(cles, sorted(cles))
+        self.assertEqual(sorted(archive["candidat"].tolist()),
+                         sorted(Vote.objects.filter(election=self.election).values_list("candidat", flat=True)))
+        self.assertEqual(archive["date_vote"].dtype, np.dtype("datetime64[h]"))
+
+    def test_purge_par_lots(self):
+        archiver_votes(self.election)
+        self.assertEqual(purger_votes(self.election, taille_lot=4), 6)
+        self.assertFalse(Vote.objects.filter(election=self.election).exists())
+
+    def test_audit_reserve_aux_admins(self):
+        self.assertTrue(executer_finalisation(self.cloturer().pk))
+        audit = reverse("audit-archive", args=[self.election.pk])
+        self.assertEqual(self.client.get(audit).status_code, 401)
+
+        entete = self.en_tete_admin()
+        reponse = self.client.get(audit, **entete).json()
+        self.assertEqual(reponse["resultats"], [
+            {"candidat": self.candidats[0].pk, "nb_votes": 4},
+            {"candidat": self.candidats[1].pk, "nb_votes": 1},
+            {"candidat": self.candidats[2].pk, "nb_votes": 1},
+        ])
+        par_heure = self.client.get(audit, {"par": "heure", "tour": 1}, **entete).json()["resultats"]
+        self.assertEqual(sum(ligne["nb_votes"] for ligne in par_heure), 6)
+        self.assertTrue(all(ligne["heure"].endswith(":00Z") for ligne in par_heure))
+        self.assertEqual(self.client.get(audit, {"par": "electeur"}, **entete).status_code, 400)
+        self.assertEqual(self.client.get(audit, {"tour": "un"}, **entete).status_code, 400)
+
+
+class BenchmarkVotesTests(TransactionTestCase):
+    def setUp(self):
+        # La commande crée sa propre base jetable : ici, elle réutilise la base de test
+        for methode in ("create_test_db", "destroy_test_db"):
+            patch = mock.patch.object(connection.creation, methode)
+            patch.start()
+            self.addCleanup(patch.stop)
+        reglages = mock.patch.dict(connection.settings_dict["TEST"])
+        reglages.start()
+        self.addCleanup(reglages.stop)
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier, ignore_errors=True)
+        self.rapport = os.path.join(dossier, "rapport.json")
+        bitmap._backend = None
+        cache.clear()
+
+    def lancer(self, **options):
+        # Un seul client : la base de test SQLite en mémoire refuse les écritures concurrentes
+        call_command("benchmark_votes", electeurs=12, candidats=3, fokontany=2, concurrence=1,
+                     json=self.rapport, stdout=StringIO(), **options)
+        with open(self.rapport, encoding="utf-8") as f:
+            return json.load(f)
+
+    def test_rapport_par_strategie(self):
+        rapports = self.lancer()
+        self.assertEqual([r["strategie"] for r in rapports], ["shards", "verrou"])
+        for rapport in rapports:
+            self.assertEqual((rapport["votes_envoyes"], rapport["votes_acceptes"], rapport["total_resultats"]),
+                             (12, 12, 12))
+            self.assertTrue(rapport["decompte_exact"])
+            self.assertGreater(rapport["requetes_par_vote"]["moyenne"], 0)
+
+    def test_decompte_incoherent_fait_echouer_la_commande(self):
+        with mock.patch("vote.management.commands.benchmark_votes.consolider_resultats"), \
+                self.assertRaises(CommandError):
+            self.lancer(strategie="shards")
+        with open(self.rapport, encoding="utf-8") as f:
+            rapport, = json.load(f)
+        self.assertFalse(rapport["decompte_exact"])
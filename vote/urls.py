@@ -1,10 +1,16 @@
 from django.urls import path
-from .views import VoteCreateView, ResultatListView, ResultatFinaleDetailView, ResultatFinalePublishView, check_if_voted
+from .views import VoteCreateView, RecuVoteView, ResultatListView, ResultatZonesView, ParticipationSerieView, ResultatFinaleDetailView, ResultatFinalePublishView, FinalisationJobView, AuditArchiveView, check_if_voted, nombre_votants
 
 urlpatterns = [
     path("voter/", VoteCreateView.as_view(), name="vote-create"),
+    path("recu/<uuid:recu>/", RecuVoteView.as_view(), name="vote-recu"),
     path("resultats/<int:election_id>/", ResultatListView.as_view(), name="resultat-list"),
+    path("resultats/<int:election_id>/zones/", ResultatZonesView.as_view(), name="resultat-zones"),
+    path("participation/<int:election_id>/", ParticipationSerieView.as_view(), name="participation-serie"),
     path("resultat-finale/<int:election_id>/", ResultatFinaleDetailView.as_view(), name="resultat-finale-detail"),
     path("resultat-finale/<int:election_id>/publish/", ResultatFinalePublishView.as_view(), name="resultat-finale-publish"),
+    path("finalisation/<int:election_id>/", FinalisationJobView.as_view(), name="finalisation-job"),
+    path("audit/<int:election_id>/", AuditArchiveView.as_view(), name="audit-archive"),
     path("check/<int:election_id>/<int:auth_id>/", check_if_voted, name="vote-check"),
+    path("votants/<int:election_id>/", nombre_votants, name="vote-votants"),
 ]
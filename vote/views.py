@@ -3,19 +3,96 @@ from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.db.models import Sum
+from django.utils import timezone
 
-from .models import Vote, Resultat, ResultatFinale
-from .serializers import VoteSerializer, ResultatSerializer, ResultatFinaleSerializer
+from .models import (Vote, Resultat, ResultatFokontany, ParticipationTranche, ResultatFinale, FinalisationJob,
+                     annoter_resultats, calculer_taux_participation, lancer_finalisation, reprendre_jobs_bloques,
+                     debut_tranche, _compute_nb_inscrits_for_election)
+from . import bitmap
+from .archives import AUDITS, charger_archive
+from .cache import (cle_resultats, cle_resultat_finale, delai_resultats, delai_resultat_finale, lire_ou_calculer,
+                    version_resultats)
+from .serializers import (VoteSerializer, RecuVoteSerializer, ResultatSerializer, ResultatFinaleSerializer,
+                          FinalisationJobSerializer)
 
 from rest_framework.decorators import api_view
 from electeurs.models import Electeur
 from electeur_auth.models import ElecteurAuth
+from elections.models import Election
 
 # ✅ Enregistrer un vote
 class VoteCreateView(generics.CreateAPIView):
     queryset = Vote.objects.all()
     serializer_class = VoteSerializer
 
+    def create(self, request, *args, **kwargs):
+        cle = request.headers.get("Idempotency-Key")
+        empreinte = None
+        if cle:
+            if len(cle) > 64:
+                return Response({"Idempotency-Key": "64 caractères maximum."}, status=status.HTTP_400_BAD_REQUEST)
+            # La clé n'est rejouée que pour l'électeur de la session, avec la même requête
+            electeur_id = ElecteurAuth.objects.filter(
+                pk=request.data.get("auth_id") or None, is_valid=True, expired_at__gt=timezone.now()
+            ).values_list("electeur_id", flat=True).first()
+            if electeur_id is not None:
+                empreinte = Vote.empreinte(electeur_id, request.data.get("election"), request.data.get("candidat"))
+                existant = Vote.objects.filter(idempotency_key=cle).first()
+                if existant is not None:
+                    return self._rejouer(existant, empreinte)
+
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            with transaction.atomic():
+                self.perform_create(serializer, cle)
+        except IntegrityError:
+            existant = Vote.objects.filter(idempotency_key=cle).first() if cle else None
+            if existant is not None:
+                return self._rejouer(existant, empreinte)
+            return Response(
+                {"detail": "Un vote a déjà été enregistré pour cet électeur à ce tour."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=self._status_creation(), headers=headers)
+
+    def perform_create(self, serializer, cle=None):
+        data = serializer.validated_data
+        serializer.save(
+            idempotency_key=cle or None,
+            idempotency_empreinte=Vote.empreinte(data["electeur"].pk, data["election"].pk, data["candidat"].pk)
+            if cle else "",
+            decompte_applique=not getattr(settings, "VOTE_INGESTION_ASYNC", False),
+        )
+
+    def _status_creation(self):
+        if getattr(settings, "VOTE_INGESTION_ASYNC", False):
+            # Vote enregistré, décompte appliqué plus tard par le worker
+            return status.HTTP_202_ACCEPTED
+        return status.HTTP_201_CREATED
+
+    def _rejouer(self, vote, empreinte):
+        if empreinte is None or vote.idempotency_empreinte != empreinte:
+            # Clé déjà utilisée par un autre électeur ou pour un autre bulletin : rien n'est divulgué
+            return Response(
+                {"Idempotency-Key": "Clé déjà utilisée pour une autre requête."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        response = Response(self.get_serializer(vote).data, status=self._status_creation())
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+
+# ✅ Consulter l'état d'un vote à partir de son reçu
+class RecuVoteView(generics.RetrieveAPIView):
+    queryset = Vote.objects.all()
+    serializer_class = RecuVoteSerializer
+    lookup_field = "recu"
+
 
 # ✅ Lister les résultats d'une élection
 class ResultatListView(generics.ListAPIView):
@@ -23,17 +100,173 @@ class ResultatListView(generics.ListAPIView):
 
     def get_queryset(self):
         election_id = self.kwargs["election_id"]
-        return Resultat.objects.filter(election_id=election_id).order_by("-nb_votes")
+        # Décompte exact lu depuis les shards (aucun verrou côté vote)
+        queryset = Resultat.objects.filter(election_id=election_id).select_related("candidat")
+        tour = self.request.query_params.get("tour")
+        if tour:
+            queryset = queryset.filter(tour=tour)
+        return annoter_resultats(queryset).order_by("-nb_votes_live")
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        election = Election.objects.filter(pk=self.kwargs["election_id"]).first()
+        if election is not None:
+            context["nb_inscrits"] = _compute_nb_inscrits_for_election(election)
+        return context
+
+    def list(self, request, *args, **kwargs):
+        # Cache par (élection, tour, version) : reconstruit une seule fois par version
+        election_id = self.kwargs["election_id"]
+        tour = request.query_params.get("tour")
+        if tour and not tour.isdigit():
+            return Response({"tour": "Doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+        cle = cle_resultats(election_id, tour, version_resultats(election_id))
+        data = lire_ou_calculer(
+            cle, lambda: list(self.get_serializer(self.get_queryset(), many=True).data), delai_resultats()
+        )
+        page = self.paginate_queryset(data)
+        if page is not None:
+            return self.get_paginated_response(page)
+        return Response(data)
+
+
+# Niveau géographique -> (clé de regroupement, nom) depuis ResultatFokontany
+NIVEAUX_ZONES = {
+    "fokontany": ("fokontany_id", "fokontany__nom_fokontany"),
+    "commune": ("fokontany__commune_id", "fokontany__commune__nom_commune"),
+    "district": ("fokontany__commune__district_id", "fokontany__commune__district__nom_district"),
+    "region": ("fokontany__commune__district__region_id", "fokontany__commune__district__region__nom_region"),
+}
+
+
+# ✅ Résultats d'une élection par fokontany / commune / district / région
+class ResultatZonesView(APIView):
+    def get(self, request, election_id):
+        niveau = request.query_params.get("niveau", "region")
+        if niveau not in NIVEAUX_ZONES:
+            return Response(
+                {"niveau": f"Valeurs possibles : {', '.join(NIVEAUX_ZONES)}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        election = get_object_or_404(Election, pk=election_id)
+        try:
+            tour = int(request.query_params.get("tour") or election.tourActuel)
+        except ValueError:
+            return Response({"tour": "Doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+
+        def calcul():
+            cle_zone, cle_nom = NIVEAUX_ZONES[niveau]
+            lignes = (
+                ResultatFokontany.objects.filter(election_id=election_id, tour=tour)
+                .values(cle_zone, cle_nom, "candidat")
+                .annotate(total=Sum("nb_votes"))
+                .order_by(cle_zone, "-total")
+            )
+            zones = {}
+            for ligne in lignes:
+                zone = zones.setdefault(ligne[cle_zone], {
+                    "zone": ligne[cle_zone], "nom": ligne[cle_nom], "total_votes": 0, "resultats": [],
+                })
+                zone["resultats"].append({"candidat": ligne["candidat"], "nb_votes": ligne["total"]})
+                zone["total_votes"] += ligne["total"]
+            return {"election": election.pk, "tour": tour, "niveau": niveau, "zones": list(zones.values())}
+
+        cle = f"zones:{election_id}:{niveau}:{tour}:{version_resultats(election_id)}"
+        return Response(lire_ou_calculer(cle, calcul, delai_resultats()))
+
+
+# ✅ Série temporelle de la participation (votes par tranche de temps)
+class ParticipationSerieView(APIView):
+    def get(self, request, election_id):
+        election = get_object_or_404(Election, pk=election_id)
+        tranche = getattr(settings, "PARTICIPATION_TRANCHE_MINUTES", 1)
+        try:
+            tour = int(request.query_params.get("tour") or election.tourActuel)
+            region = request.query_params.get("region")
+            region = int(region) if region else None
+            pas = int(request.query_params.get("pas") or tranche)
+        except ValueError:
+            return Response({"detail": "tour, region et pas doivent être des entiers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if pas < tranche or pas % tranche:
+            return Response({"pas": f"Doit être un multiple de {tranche} minute(s)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        def calcul():
+            tranches = ParticipationTranche.objects.filter(election_id=election_id, tour=tour)
+            if region is not None:
+                tranches = tranches.filter(region_id=region)
+            serie = {}
+            for debut, total in tranches.values("debut").annotate(total=Sum("nb_votes")).values_list("debut", "total"):
+                cle = debut_tranche(debut, pas)
+                serie[cle] = serie.get(cle, 0) + total
+            return {
+                "election": election.pk, "tour": tour, "region": region, "pas_minutes": pas,
+                "total_votes": sum(serie.values()),
+                "serie": [{"debut": debut.isoformat(), "nb_votes": nb} for debut, nb in sorted(serie.items())],
+            }
+
+        cle = f"participation:{election_id}:{tour}:{region}:{pas}:{version_resultats(election_id)}"
+        return Response(lire_ou_calculer(cle, calcul, delai_resultats()))
 
 
 # ✅ Consulter le résultat final d’une élection
 class ResultatFinaleDetailView(APIView):
     def get(self, request, election_id):
-        resultat_final = get_object_or_404(ResultatFinale, election_id=election_id)
+        # Figé après finalisation : invalidé à la publication / à l'archivage du PDF,
+        # avec une expiration de secours quand le cache est local au processus
+        def calcul():
+            resultat_final = get_object_or_404(ResultatFinale, election_id=election_id)
+            return ResultatFinaleSerializer(resultat_final).data
+
+        data = lire_ou_calculer(cle_resultat_finale(election_id), calcul, delai_resultat_finale())
+        return Response(data, status=status.HTTP_200_OK)
+
+
+# ✅ Suivre (GET) ou relancer après échec (POST, admin) la finalisation d’une élection
+class FinalisationJobView(APIView):
+    def get_permissions(self):
+        if self.request.method == "POST":
+            return [IsAdminUser()]
+        return super().get_permissions()
+
+    def get(self, request, election_id):
+        job = get_object_or_404(FinalisationJob, election_id=election_id)
+        return Response(FinalisationJobSerializer(job).data)
 
+    def post(self, request, election_id):
+        job = get_object_or_404(FinalisationJob, election_id=election_id)
+        # Un job "running" sans signe de vie depuis FINALISATION_JOB_TIMEOUT (worker disparu) est aussi relançable
+        reprendre_jobs_bloques(election_id)
+        if not FinalisationJob.objects.filter(pk=job.pk, statut__in=["failed", "pending"]).update(
+            statut="pending", erreur=""
+        ):
+            return Response({"detail": "Seul un job en échec ou bloqué peut être relancé."},
+                            status=status.HTTP_409_CONFLICT)
+        transaction.on_commit(lambda: lancer_finalisation(job.pk))
+        job.refresh_from_db()
+        return Response(FinalisationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
 
-        serializer = ResultatFinaleSerializer(resultat_final)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+# ✅ Audit d’une élection finalisée, calculé sur l’archive des bulletins (admin)
+class AuditArchiveView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, election_id):
+        resultat_final = get_object_or_404(ResultatFinale, election_id=election_id)
+        if not resultat_final.archive_votes:
+            return Response({"detail": "Aucune archive de votes pour cette élection."}, status=status.HTTP_404_NOT_FOUND)
+        par = request.query_params.get("par", "candidat")
+        if par not in AUDITS:
+            return Response({"par": f"Valeurs possibles : {', '.join(AUDITS)}."}, status=status.HTTP_400_BAD_REQUEST)
+        tour = request.query_params.get("tour")
+        try:
+            tour = int(tour) if tour else None
+        except ValueError:
+            return Response({"tour": "Doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+
+        archive = charger_archive(resultat_final.archive_votes)
+        return Response({"election": election_id, "par": par, "tour": tour, "resultats": AUDITS[par](archive, tour)})
 
 
 # ✅ Endpoint pour publier/dépublier un résultat final (admin uniquement)
@@ -50,17 +283,41 @@ class ResultatFinalePublishView(generics.UpdateAPIView):
 
 @api_view(["GET"])
 def check_if_voted(request, election_id, auth_id):
-    try:
-        # récupérer l'électeur à partir de sa session auth
-        session = ElecteurAuth.objects.get(id=auth_id, is_valid=True)
-        electeur = session.electeur
-    except ElecteurAuth.DoesNotExist:
+    # récupérer l'électeur à partir de sa session auth
+    electeur_id = ElecteurAuth.objects.filter(id=auth_id, is_valid=True).values_list("electeur_id", flat=True).first()
+    if electeur_id is None:
         return Response({"error": "Session invalide"}, status=401)
 
-    has_voted = Vote.objects.filter(election_id=election_id, electeur=electeur).exists()
+    tour = request.query_params.get("tour") or Election.objects.filter(pk=election_id).values_list(
+        "tourActuel", flat=True
+    ).first()
+    if tour is None:
+        return Response({"error": "Élection introuvable"}, status=404)
+    if not str(tour).isdigit():
+        return Response({"tour": "Doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+
+    has_voted = bitmap.a_vote(election_id, int(tour), electeur_id)
     return Response({"has_voted": has_voted})
 
 
+@api_view(["GET"])
+def nombre_votants(request, election_id):
+    # Participation = popcount du bitmap des votants / électeurs aptes figés à l'ouverture
+    election = get_object_or_404(Election, pk=election_id)
+    tour = request.query_params.get("tour") or str(election.tourActuel)
+    if not tour.isdigit():
+        return Response({"tour": "Doit être un entier."}, status=status.HTTP_400_BAD_REQUEST)
+    nb = bitmap.nb_votants(election.pk, int(tour))
+    nb_inscrits = _compute_nb_inscrits_for_election(election)
+    return Response({
+        "election": election.pk,
+        "tour": tour,
+        "nb_votants": nb,
+        "nb_inscrits": nb_inscrits,
+        "taux_participation": str(calculer_taux_participation(nb, nb_inscrits)),
+    })
+
+
 
 # from rest_framework import generics, status
 # from rest_framework.response import Response